@@ -0,0 +1,164 @@
+# archive.py
+# Política de retenção do histórico de vencidos e arquivos de arquivamento/exportação (JSONL ou CSV, gzip).
+# Não importa Kivy: é usado pelo ClientStore e pode rodar em scripts de manutenção.
+
+import csv
+import datetime
+import gzip
+import json
+import os
+
+from models import DEFAULT_PLAN, Client
+
+
+ARCHIVE_FIELDS = ('id', 'mac', 'senha', 'nome', 'creation_time', 'deadline',
+                  'status', 'calendar_event_created', 'ended_at', 'reminder_status', 'plan', 'duration')
+ARCHIVE_DATETIME_FIELDS = ('creation_time', 'deadline', 'ended_at')
+ARCHIVE_FORMATS = ('jsonl', 'csv')
+
+
+class RetentionPolicy:
+    """Quanto do histórico de vencidos/excluídos fica no banco.
+
+    `max_age`: clientes que saíram da lista ativa há mais tempo que isso são arquivados.
+    `max_count`: limite de vencidos no banco; ao ultrapassá-lo, o histórico é arquivado até
+    `low_water` * max_count (ex.: 2000 -> 1600), para que cada arquivo junte muitos clientes em vez
+    de um por expiração. Qualquer um dos dois pode ser None.
+    Clientes com lembrete ainda 'pending' nunca são arquivados.
+    """
+    def __init__(self, max_age=None, max_count=None, low_water=0.8):
+        self.max_age = max_age
+        self.max_count = max_count
+        self.low_water = low_water
+
+    def __repr__(self):
+        return (f"RetentionPolicy(max_age={self.max_age!r}, max_count={self.max_count!r}, "
+                f"low_water={self.low_water!r})")
+
+    def exceeds_count(self, count):
+        return self.max_count is not None and count > self.max_count
+
+    def select(self, ended_clients, total, now):
+        """Escolhe os vencidos a arquivar percorrendo `ended_clients` do mais antigo ao mais recente.
+
+        `total` é a quantidade de vencidos; a leitura para no primeiro cliente que a política mantém
+        (todos os seguintes são mais recentes), então o custo é proporcional ao que será arquivado.
+        """
+        overflow = total - int(self.max_count * self.low_water) if self.exceeds_count(total) else 0
+        cutoff = now - self.max_age if self.max_age is not None else None
+
+        selected = []
+        for position, client in enumerate(ended_clients):
+            too_old = cutoff is not None and client.ended_at is not None and client.ended_at < cutoff
+            if not too_old and position >= overflow:
+                break
+            if client.reminder_status != 'pending':
+                selected.append(client)
+        return selected
+
+
+def archive_record(client):
+    """Converte um Client no registro completo do arquivo (datas em ISO 8601)."""
+    record = {field: getattr(client, field) for field in ARCHIVE_FIELDS}
+    for field in ARCHIVE_DATETIME_FIELDS:
+        value = record[field]
+        record[field] = value.isoformat() if isinstance(value, datetime.datetime) else None
+    record['duration'] = int(client.duration.total_seconds()) # Em segundos
+    return record
+
+
+def _open_text(path, mode, compressed):
+    if compressed:
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def archive_format(path):
+    """Deduz o formato ('jsonl' ou 'csv') pela extensão, ignorando o .gz."""
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = os.path.splitext(name)[1].lower().lstrip('.')
+    if extension not in ARCHIVE_FORMATS:
+        raise ValueError(f"Formato de arquivo não suportado: {path} (use .jsonl, .csv, .jsonl.gz ou .csv.gz)")
+    return extension
+
+
+def _sync_directory(directory):
+    """Grava no disco a entrada do diretório (a renomeação); sem efeito onde não há fsync de pasta (Windows)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_archive(path, clients):
+    """Grava os clientes em fluxo, um registro por vez, e retorna quantos foram gravados.
+
+    O arquivo é escrito ao lado com sufixo .tmp, forçado para o disco (fsync) e só então renomeado:
+    um arquivo com o nome final está sempre completo, mesmo após queda de energia (e só depois
+    disso os clientes podem sair do banco). Se a gravação falhar, o .tmp é apagado.
+    """
+    fmt = archive_format(path)
+    temp_path = path + '.tmp'
+    count = 0
+    try:
+        with _open_text(temp_path, 'w', path.endswith('.gz')) as f:
+            if fmt == 'csv':
+                writer = csv.DictWriter(f, fieldnames=ARCHIVE_FIELDS)
+                writer.writeheader()
+                for client in clients:
+                    writer.writerow(archive_record(client))
+                    count += 1
+            else:
+                for client in clients:
+                    f.write(json.dumps(archive_record(client), separators=(',', ':'), ensure_ascii=False))
+                    f.write('\n')
+                    count += 1
+        # O gzip só termina de escrever ao fechar: o fsync vem depois, por um novo descritor do mesmo arquivo
+        with open(temp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    _sync_directory(os.path.dirname(os.path.abspath(path)))
+    return count
+
+
+def read_archive(path):
+    """Lê um arquivo gravado por write_archive e gera os Clients de volta (para recuperar o histórico)."""
+    fmt = archive_format(path)
+    with _open_text(path, 'r', path.endswith('.gz')) as f:
+        if fmt == 'csv':
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            for field in ARCHIVE_DATETIME_FIELDS:
+                row[field] = datetime.datetime.fromisoformat(row[field]) if row.get(field) else None
+            calendar_event_created = row.get('calendar_event_created')
+            if isinstance(calendar_event_created, str):
+                calendar_event_created = calendar_event_created == 'True'
+            yield Client(row['mac'], row['senha'], row['nome'],
+                         creation_time=row['creation_time'], deadline=row['deadline'],
+                         status=row.get('status') or 'expired',
+                         calendar_event_created=bool(calendar_event_created),
+                         ended_at=row['ended_at'], reminder_status=row.get('reminder_status') or None,
+                         id=row.get('id') or None, plan=row.get('plan') or DEFAULT_PLAN,
+                         duration=datetime.timedelta(seconds=int(row['duration'])) if row.get('duration') else None)
+
+
+def archive_file_name(now, prefix='expired', fmt='jsonl', sequence=None):
+    """Nome do arquivo de arquivamento, ordenável pela data (ex.: expired-20240101-083000.jsonl.gz)."""
+    stamp = now.strftime('%Y%m%d-%H%M%S')
+    if sequence is not None:
+        stamp += f"-{sequence}"
+    return f"{prefix}-{stamp}.{fmt}.gz"
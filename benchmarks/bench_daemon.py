@@ -0,0 +1,115 @@
+# bench_daemon.py
+# Mede o daemon de expiração (daemon.ExpiryDaemon) contra um servidor HTTP local de teste:
+# N clientes vencem juntos e cada um dispara o webhook e o arquivo na pasta, em paralelo e com timeout.
+# Também confere que um endpoint lento é cortado pelo timeout sem atrasar as demais ações.
+#
+# Uso: python benchmarks/bench_daemon.py [quantidade_de_clientes ...]
+
+import asyncio
+import http.server
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from daemon import ExpiryDaemon, FileDropAction, WebhookAction
+from storage import ClientDatabase
+from testing import ManualClock
+
+
+class StubServer(http.server.ThreadingHTTPServer):
+    """Servidor de teste: guarda o id de cada POST recebido; /slow demora `slow_seconds` para responder."""
+    daemon_threads = True
+    slow_seconds = 2.0
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.received = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if self.path == '/slow':
+            time.sleep(self.server.slow_seconds)
+        with self.server.lock:
+            self.server.received.append(body['client']['id'])
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench_size(count, tmp, server):
+    clock = ManualClock()
+    database = ClientDatabase(os.path.join(tmp, f'daemon_{count}.db'))
+    drop_dir = os.path.join(tmp, f'drop_{count}')
+    daemon = ExpiryDaemon(database, [WebhookAction(server.url + '/hook'), FileDropAction(drop_dir)],
+                          clock=clock, action_timeout=1.0)
+    for i in range(count):
+        daemon.engine.add_client(f"AA:BB:CC:{i >> 16 & 255:02X}:{i >> 8 & 255:02X}:{i & 255:02X}",
+                                 f"senha{i}", f"Cliente {i}")
+    database.commit()
+    daemon.reload()
+
+    server.received.clear()
+    clock.advance(days=1)
+    start = time.perf_counter()
+    due = asyncio.run(daemon.process_due())
+    seconds = time.perf_counter() - start
+    ok = len(server.received) == count and len(os.listdir(drop_dir)) == count
+    database.close()
+    return seconds, len(due), ok
+
+
+def bench_timeout(tmp, server):
+    """Um webhook lento (2 s) com timeout de 0,2 s: a expiração não pode esperar por ele."""
+    clock = ManualClock()
+    database = ClientDatabase(os.path.join(tmp, 'daemon_timeout.db'))
+    daemon = ExpiryDaemon(database, [WebhookAction(server.url + '/slow'), WebhookAction(server.url + '/hook')],
+                          clock=clock, action_timeout=0.2)
+    daemon.engine.add_client('AA:BB:CC:00:00:01', 'senha', 'Lento')
+    database.commit()
+    clock.advance(days=1)
+
+    async def expire():
+        # Medido dentro do loop: asyncio.run ainda espera a thread do POST lento terminar ao fechar o executor
+        start = time.perf_counter()
+        errors = await daemon.fire_actions(daemon.engine.take_due()[0])
+        return time.perf_counter() - start, errors
+    seconds, errors = asyncio.run(expire())
+    database.close()
+    return seconds, sum(len(client_errors) for client_errors in errors.values())
+
+
+def main():
+    logging.getLogger('applembrete').setLevel(logging.WARNING) # Uma linha por cliente atrapalharia a medição
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100, 1_000]
+    server = StubServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for count in sizes:
+                seconds, expired, ok = bench_size(count, tmp, server)
+                rate = expired / seconds if seconds > 0 else float('inf')
+                print(f"{count:>7} clientes  {seconds * 1000:9.1f} ms  {rate:9.0f} clientes/s  "
+                      f"{'ok' if ok else 'FALHOU: ações faltando'}")
+            seconds, failures = bench_timeout(tmp, server)
+            print(f"timeout  {seconds * 1000:9.1f} ms  {failures} ação(ões) cortada(s) pelo timeout")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
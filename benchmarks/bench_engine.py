@@ -0,0 +1,81 @@
+# bench_engine.py
+# Mede a vazão do núcleo sem interface (engine.ClientStore + TimerEngine) com um relógio manual:
+# cadastro, exclusão manual, expiração, carga e gravação para 1k, 10k e 100k clientes.
+#
+# Uso: python benchmarks/bench_engine.py [quantidade_de_clientes ...]
+
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from engine import ClientStore, TimerEngine
+from storage import ClientDatabase
+from testing import ManualClock
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def bench_size(count, tmp):
+    path = os.path.join(tmp, f'bench_{count}.db')
+    clock = ManualClock()
+    database = ClientDatabase(path)
+    store = ClientStore(database, clock=clock)
+    engine = TimerEngine(store)
+    results = []
+
+    def add_all():
+        for i in range(count):
+            # Um segundo entre cadastros: prazos distintos, como no uso real
+            clock.advance(seconds=1)
+            engine.add_client(f"AA:BB:CC:{i >> 16 & 255:02X}:{i >> 8 & 255:02X}:{i & 255:02X}",
+                              f"senha{i}", f"Cliente {i}")
+    seconds, _ = timed(add_all)
+    results.append(("add", seconds, count))
+
+    seconds, _ = timed(store.save)
+    results.append(("save (commit)", seconds, count))
+
+    # Exclusão manual de 10% dos clientes, espalhados pela lista
+    to_delete = list(store.active_clients.values())[::10]
+    seconds, _ = timed(lambda: [engine.delete_manual(client) for client in to_delete])
+    results.append(("delete", seconds, len(to_delete)))
+    store.save()
+
+    # Metade dos prazos vence de uma vez
+    clock.now = store.clock() - datetime.timedelta(seconds=count // 2) + store.duration
+    seconds, due = timed(engine.expire_due)
+    results.append(("expire", seconds, len(due)))
+    store.save()
+
+    database.close()
+
+    reloaded_database = ClientDatabase(path)
+    reloaded = ClientStore(reloaded_database, clock=clock)
+    reloaded_engine = TimerEngine(reloaded)
+    seconds, _ = timed(lambda: (reloaded.load(), reloaded_engine.rebuild()))
+    results.append(("load + rebuild", seconds, reloaded_database.count()))
+    reloaded_database.close()
+
+    return results
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in sizes:
+            print(f"{count} clientes")
+            for name, seconds, operations in bench_size(count, tmp):
+                rate = operations / seconds if seconds > 0 else float('inf')
+                print(f"  {name:<20} {seconds * 1000:9.1f} ms  {operations:8d} ops  {rate:12.0f} ops/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# bench_json.py
+# Compara o tempo de carga do client_data.json: object_hook antigo (datetime_decoder em toda string)
+# contra a decodificação guiada pelo esquema (só creation_time), nos formatos indentado e compacto.
+#
+# Uso: python benchmarks/bench_json.py [quantidade_de_clientes]
+
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models import Client
+from storage import CLIENT_DATETIME_FIELDS, read_legacy_json
+
+
+def legacy_datetime_decoder(json_object):
+    """Decoder antigo: tenta converter TODA string de TODO objeto em datetime."""
+    for key, value in json_object.items():
+        if isinstance(value, str):
+            try:
+                json_object[key] = datetime.datetime.fromisoformat(value)
+            except ValueError:
+                pass
+    return json_object
+
+
+def encode_client(client):
+    """Converte um Client no objeto JSON do formato client_data.json (datas em ISO 8601)."""
+    json_object = client.to_dict()
+    for field in CLIENT_DATETIME_FIELDS:
+        value = json_object[field]
+        json_object[field] = value.isoformat() if isinstance(value, datetime.datetime) else None
+    return json_object
+
+
+def write_clients_json(path, active, expired, compact=True):
+    """Grava os clientes no formato client_data.json; `compact=False` reproduz o antigo arquivo com indent=4."""
+    data_to_save = {
+        'active': [encode_client(client) for client in active],
+        'expired': [encode_client(client) for client in expired],
+    }
+    with open(path, 'w') as f:
+        if compact:
+            json.dump(data_to_save, f, separators=(',', ':'))
+        else:
+            json.dump(data_to_save, f, indent=4)
+
+
+def make_clients(count):
+    now = datetime.datetime.now()
+    duration = datetime.timedelta(hours=23, minutes=55)
+    clients = []
+    for i in range(count):
+        creation_time = now - datetime.timedelta(seconds=i)
+        clients.append(Client(mac=f"AA:BB:CC:{i >> 16 & 255:02X}:{i >> 8 & 255:02X}:{i & 255:02X}",
+                              senha=f"senha{i}", nome=f"Cliente {i}",
+                              creation_time=creation_time, deadline=creation_time + duration,
+                              status='active' if i % 3 else 'expired'))
+    return clients
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    clients = make_clients(count)
+    active = [client for client in clients if client.status == 'active']
+    expired = [client for client in clients if client.status != 'active']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        indented_path = os.path.join(tmp, 'indented.json')
+        compact_path = os.path.join(tmp, 'compact.json')
+
+        save_indented = best_of(3, lambda: write_clients_json(indented_path, active, expired, compact=False))
+        save_compact = best_of(3, lambda: write_clients_json(compact_path, active, expired, compact=True))
+
+        def legacy_load():
+            with open(indented_path, 'r') as f:
+                json.load(f, object_hook=legacy_datetime_decoder)
+
+        results = [
+            ("save indent=4", save_indented, os.path.getsize(indented_path)),
+            ("save compacto", save_compact, os.path.getsize(compact_path)),
+            ("load indent=4 + datetime_decoder (antigo)", best_of(3, legacy_load), os.path.getsize(indented_path)),
+            ("load indent=4 + esquema", best_of(3, lambda: read_legacy_json(indented_path)), os.path.getsize(indented_path)),
+            ("load compacto + esquema", best_of(3, lambda: read_legacy_json(compact_path)), os.path.getsize(compact_path)),
+        ]
+
+    print(f"{count} clientes")
+    for name, seconds, size in results:
+        print(f"  {name:<45} {seconds * 1000:9.1f} ms  {size / 1024:9.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# bench_startup.py
+# Mede a inicialização a frio do app (Kivy) com bancos de 0, 1k, 10k e 100k clientes:
+# importação do main, build() até a tela principal existir e o tempo até a lista ATIVA estar carregada.
+# Cada medição roda num processo novo, para que os imports não venham do cache do interpretador.
+#
+# Uso: python benchmarks/bench_startup.py [quantidade_de_clientes ...]
+
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+
+def populate(directory, count):
+    """Cria client_data.db com `count` clientes: metade ativos, metade já vencidos."""
+    from engine import ClientStore, TimerEngine
+    from storage import ClientDatabase
+
+    now = datetime.datetime.now()
+    clock = lambda: now
+    database = ClientDatabase(os.path.join(directory, 'client_data.db'))
+    store = ClientStore(database, clock=clock)
+    engine = TimerEngine(store)
+    for i in range(count):
+        now = datetime.datetime.now() - datetime.timedelta(hours=23) * (i % 2)
+        engine.add_client(f"AA:BB:CC:{i >> 16 & 255:02X}:{i >> 8 & 255:02X}:{i & 255:02X}",
+                          f"senha{i}", f"Cliente {i}")
+    now = datetime.datetime.now() + datetime.timedelta(hours=1)
+    engine.expire_due()
+    store.save()
+    database.close()
+
+
+def child(directory):
+    """Executado no processo filho: inicia o app e imprime os tempos em JSON."""
+    os.environ.setdefault('KIVY_NO_ARGS', '1')
+    os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+    import logging
+    logging.getLogger('applembrete').setLevel(logging.WARNING)
+
+    start = time.perf_counter()
+    import main
+    from kivy.clock import Clock
+    from instrumentation import stats
+    imported = time.perf_counter()
+
+    class BenchApp(main.MobileApp):
+        @property
+        def user_data_dir(self):
+            return directory
+
+    app = BenchApp()
+    app.root = app.build()
+    built = time.perf_counter()
+    while not app.data_loaded:
+        Clock.tick()
+    loaded = time.perf_counter()
+    app.on_stop()
+
+    print(json.dumps({'import': imported - start, 'build': built - imported, 'data': loaded - built,
+                      'total': loaded - start, 'load_data': stats.last_ms('load_data') / 1000,
+                      'active': len(app.active_clients)}))
+
+
+def main():
+    if sys.argv[1:2] == ['--child']:
+        child(sys.argv[2])
+        return
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or [0, 1_000, 10_000, 100_000]
+    print(f"{'clientes':>9} {'import':>10} {'build':>10} {'até dados':>10} {'load_data':>10} {'total':>10}")
+    for count in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            populate(tmp, count)
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', tmp],
+                                    cwd=ROOT, capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{count:>9} " + ' '.join(f"{result[key] * 1000:8.1f}ms"
+                                            for key in ('import', 'build', 'data', 'load_data', 'total')))
+
+
+if __name__ == '__main__':
+    main()
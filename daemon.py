@@ -0,0 +1,328 @@
+# daemon.py
+# Expiração sem interface: roda o mesmo TimerEngine num loop asyncio, dormindo até o próximo prazo,
+# e dispara ações plugáveis (comando, webhook HTTP local, arquivo numa pasta) para cada cliente vencido.
+# Não importa Kivy: pode rodar como serviço (systemd, Termux, serviço Android) com o app fechado.
+#
+# Uso: python daemon.py --db CAMINHO/client_data.db [--webhook URL] [--command "CMD ARGS"] [--drop-dir PASTA]
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import shlex
+import signal
+import sys
+import urllib.request
+
+from archive import archive_record
+from engine import ClientStore, TimerEngine
+from instrumentation import get_logger, stats
+from storage import ClientDatabase
+
+log = get_logger('daemon')
+
+
+def expiry_payload(client, event='expired'):
+    """Corpo entregue às ações: o evento e o registro completo do cliente (datas em ISO 8601)."""
+    return {'event': event, 'client': archive_record(client)}
+
+
+# --- Ações plugáveis: qualquer objeto com `name` e `async run(client, payload)` serve ---
+class ExpiryAction:
+    """Base das ações disparadas quando um cliente vence; `run` deve levantar exceção em caso de falha."""
+    name = 'action'
+
+    async def run(self, client, payload):
+        raise NotImplementedError
+
+
+class CommandAction(ExpiryAction):
+    """Executa um comando com o payload JSON na entrada padrão e CLIENT_ID/CLIENT_MAC/... no ambiente.
+
+    Saída diferente de zero conta como falha; no timeout o processo é encerrado.
+    """
+    name = 'command'
+
+    def __init__(self, argv):
+        self.argv = list(argv)
+
+    async def run(self, client, payload):
+        env = dict(os.environ, CLIENT_ID=client.id, CLIENT_MAC=client.mac or '', CLIENT_NOME=client.nome or '',
+                   CLIENT_PLAN=client.plan, CLIENT_STATUS=client.status)
+        process = await asyncio.create_subprocess_exec(
+            *self.argv, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE, env=env)
+        try:
+            _, stderr = await process.communicate(json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            raise RuntimeError(f"{self.argv[0]} saiu com código {process.returncode}: "
+                               f"{stderr.decode('utf-8', 'replace').strip()[:200]}")
+
+
+class WebhookAction(ExpiryAction):
+    """Faz POST do payload JSON para `url` (ex.: o controlador do hotspot na rede local); status >= 400 é falha."""
+    name = 'webhook'
+
+    def __init__(self, url, timeout=10.0):
+        self.url = url
+        self.timeout = timeout
+
+    def _post(self, body):
+        request = urllib.request.Request(self.url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.status
+
+    async def run(self, client, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        # urllib bloqueia: roda no executor padrão para não parar o loop (as outras ações seguem em paralelo)
+        await asyncio.get_running_loop().run_in_executor(None, self._post, body)
+
+
+class FileDropAction(ExpiryAction):
+    """Grava o payload em `directory` como <AAAAMMDD-HHMMSS>-<id>.json (via .tmp + renomeação) para outro processo consumir."""
+    name = 'file'
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _write(self, client, payload):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.directory, f"{stamp}-{client.id}.json")
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        return path
+
+    async def run(self, client, payload):
+        await asyncio.get_running_loop().run_in_executor(None, self._write, client, payload)
+
+
+# --- Daemon ---
+class ExpiryDaemon:
+    """Mantém os clientes ATIVOS do banco num TimerEngine, expira cada um no prazo e dispara as ações.
+
+    O app e o daemon podem usar o mesmo banco: mudanças feitas pelo app (cadastros, renovações)
+    são percebidas pelo `PRAGMA data_version` a cada `poll_interval` segundos e recarregadas.
+    As ações ficam presas à passagem para 'expired', não a quem a fez: a mesma escrita que marca o
+    cliente como vencido (aqui ou no app) grava `action_status = 'pending'` e o daemon dispara as
+    ações de todo vencido pendente, marcando 'done' só os que deram certo. Nada é escrito no banco
+    enquanto as ações rodam (uma ação lenta não segura o lock de escrita do SQLite); se o processo
+    morrer no meio, as ações continuam pendentes e rodam de novo ao reiniciar. Um cliente com alguma
+    ação falha é tentado de novo com backoff (`retry_delay`) enquanto a linha estiver pendente:
+    a nova tentativa só é descartada se o cliente for apagado ou renovado.
+    """
+    retry_base = 5.0 # Segundos até a primeira nova tentativa; dobra a cada falha...
+    retry_max = 300.0 # ...até este limite
+
+    def __init__(self, database, actions, clock=datetime.datetime.now, poll_interval=5.0,
+                 action_timeout=10.0, max_concurrency=20):
+        self.database = database
+        self.actions = list(actions)
+        self.clock = clock
+        self.store = ClientStore(database, clock=clock)
+        self.engine = TimerEngine(self.store)
+        self.poll_interval = poll_interval
+        self.action_timeout = action_timeout
+        self.max_concurrency = max_concurrency
+        self._retries = {} # client.id -> (falhas seguidas, instante da próxima tentativa)
+        self._actions_changed = True # A fila de ações pode ter mudado desde a última leitura
+        self._data_version = None
+        self._stop = None
+
+    def retry_delay(self, attempts):
+        """Espera antes da tentativa seguinte à `attempts`-ésima falha (backoff exponencial)."""
+        return datetime.timedelta(seconds=min(self.retry_base * 2 ** (attempts - 1), self.retry_max))
+
+    def reload(self):
+        """Relê os clientes ATIVOS e remonta o agendamento (mantendo as novas tentativas pendentes)."""
+        self.store.load()
+        self.engine.rebuild()
+        self._actions_changed = True
+        self._data_version = self.database.data_version()
+        log.info('daemon_loaded', f"Loaded {len(self.store.active_clients)} active client(s)",
+                 active=len(self.store.active_clients))
+
+    def reload_if_changed(self):
+        if self.database.data_version() != self._data_version:
+            self.reload()
+            return True
+        return False
+
+    async def _run_action(self, action, client, payload, semaphore):
+        """Executa uma ação com timeout; retorna None se deu certo ou a exceção."""
+        async with semaphore:
+            start = stats.clock()
+            try:
+                await asyncio.wait_for(action.run(client, payload), self.action_timeout)
+            except asyncio.TimeoutError as e:
+                log.error('action_timeout', f"Action {action.name} timed out for {client.id} after {self.action_timeout}s",
+                          action=action.name, client_id=client.id)
+                stats.increment(f"action_{action.name}_failed")
+                return e
+            except Exception as e:
+                log.error('action_failed', f"Action {action.name} failed for {client.id}: {e}",
+                          action=action.name, client_id=client.id, error=str(e))
+                stats.increment(f"action_{action.name}_failed")
+                return e
+            finally:
+                stats.record(f"action_{action.name}", stats.clock() - start)
+        log.debug('action_ok', f"Action {action.name} done for {client.id}", action=action.name, client_id=client.id)
+        return None
+
+    async def fire_actions(self, clients):
+        """Dispara todas as ações de todos os clientes em paralelo; retorna {client.id: [erros]}."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        jobs = [(client, action) for client in clients for action in self.actions]
+        results = await asyncio.gather(*(self._run_action(action, client, expiry_payload(client), semaphore)
+                                         for client, action in jobs))
+        errors = {client.id: [] for client in clients}
+        for (client, action), error in zip(jobs, results):
+            if error is not None:
+                errors[client.id].append((action.name, error))
+        return errors
+
+    async def process_due(self):
+        """Relê o banco se outra conexão o mudou, grava como expirados (numa transação curta) os clientes
+        cujo prazo passou e dispara as ações pendentes; retorna os clientes expirados nesta chamada.
+        """
+        self.reload_if_changed()
+        with self.database.lock:
+            expired = self.engine.expire_due()
+            self.database.commit()
+        if expired:
+            self._actions_changed = True
+            for client in expired:
+                log.info('client_expired', f"Client {client.nome} ({client.mac}) expired", client_id=client.id)
+            stats.increment('clients_expired', len(expired))
+        await self.drain_actions()
+        return expired
+
+    def _retry_due(self, now):
+        return any(retry_at <= now for _, retry_at in self._retries.values())
+
+    async def drain_actions(self):
+        """Dispara as ações dos vencidos pendentes no banco (fora os que esperam a nova tentativa) e marca
+        como concluídos os que deram certo; retorna esses clientes. Os que falharam ganham uma nova tentativa.
+        """
+        now = self.clock()
+        if not self._actions_changed and not self._retry_due(now):
+            return []
+        self._actions_changed = False
+        pending = self.database.load_pending_actions()
+        pending_ids = {client.id for client in pending}
+        for client_id in list(self._retries):
+            if client_id not in pending_ids:
+                del self._retries[client_id] # Apagado, renovado ou concluído: não há mais o que tentar
+        due = [client for client in pending if client.id not in self._retries or self._retries[client.id][1] <= now]
+        if not due:
+            return []
+        errors = await self.fire_actions(due)
+        now = self.clock()
+        done = []
+        for client in due:
+            client_errors = errors[client.id]
+            if not client_errors:
+                self._retries.pop(client.id, None)
+                done.append(client)
+                continue
+            attempts = self._retries.get(client.id, (0, None))[0] + 1
+            delay = self.retry_delay(attempts)
+            self._retries[client.id] = (attempts, now + delay)
+            actions = ', '.join(name for name, _ in client_errors)
+            log.warning('client_actions_failed',
+                        f"Client {client.id}: {actions} failed (attempt {attempts}), retrying in {delay.total_seconds():.0f}s",
+                        client_id=client.id, actions=actions, attempts=attempts, retry_in=delay.total_seconds())
+        if done:
+            with self.database.lock:
+                self.database.finish_actions(done)
+                self.database.commit()
+            stats.increment('client_actions_done', len(done))
+        if len(done) < len(due):
+            stats.increment('clients_retried', len(due) - len(done))
+        return done
+
+    def next_wakeup(self):
+        """Segundos até acordar: o próximo prazo ou a próxima nova tentativa, limitado por `poll_interval`
+        (mudanças no banco, saltos do relógio).
+        """
+        delays = [self.poll_interval]
+        delay = self.engine.seconds_until_next_deadline()
+        if delay is not None:
+            delays.append(delay)
+        if self._retries:
+            retry_at = min(retry_at for _, retry_at in self._retries.values())
+            delays.append(max((retry_at - self.clock()).total_seconds(), 0.0))
+        return min(delays)
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+
+    async def run(self):
+        """Loop principal: verifica o banco, expira, dispara as ações e dorme até o próximo prazo (ou até `stop()`)."""
+        self._stop = asyncio.Event()
+        self.reload()
+        while not self._stop.is_set():
+            await self.process_due()
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.next_wakeup())
+            except asyncio.TimeoutError:
+                pass
+        log.info('daemon_stopped', "Expiry daemon stopped.")
+
+
+def build_actions(args):
+    actions = []
+    for command in args.command or ():
+        actions.append(CommandAction(shlex.split(command)))
+    for url in args.webhook or ():
+        actions.append(WebhookAction(url, timeout=args.timeout))
+    for directory in args.drop_dir or ():
+        actions.append(FileDropAction(directory))
+    return actions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Expira os clientes do AppLembrete sem a interface gráfica.")
+    parser.add_argument('--db', required=True, help="caminho do client_data.db do app")
+    parser.add_argument('--command', action='append', help="comando executado para cada cliente vencido (payload JSON na entrada)")
+    parser.add_argument('--webhook', action='append', help="URL que recebe um POST JSON para cada cliente vencido")
+    parser.add_argument('--drop-dir', action='append', help="pasta onde é gravado um arquivo JSON por cliente vencido")
+    parser.add_argument('--timeout', type=float, default=10.0, help="tempo máximo de cada ação, em segundos")
+    parser.add_argument('--poll', type=float, default=5.0, help="intervalo de verificação de mudanças no banco, em segundos")
+    args = parser.parse_args(argv)
+
+    database = ClientDatabase(args.db)
+    database.start_background_checkpoints()
+    daemon = ExpiryDaemon(database, build_actions(args), poll_interval=args.poll, action_timeout=args.timeout)
+    if not daemon.actions:
+        log.warning('daemon_no_actions', "No actions configured: clients will only be marked as expired.")
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signal_number, daemon.stop)
+            except (NotImplementedError, RuntimeError): # Windows
+                pass
+        await daemon.run()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        database.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,987 @@
+# engine.py
+# Núcleo sem interface gráfica: estado dos clientes, índice de duplicidade e agendamento da expiração.
+# Não importa Kivy, então pode ser usado por benchmarks, testes de carga e outros pontos de entrada.
+
+import bisect
+import datetime
+import itertools
+import json
+import os
+
+from archive import archive_file_name, write_archive
+from instrumentation import get_logger
+from models import DEFAULT_PLAN, PLANS, Client, normalize_mac
+from storage import read_legacy_json
+
+
+log = get_logger('engine')
+
+DEFAULT_TIMER_DURATION = PLANS[DEFAULT_PLAN].duration
+
+
+# --- Roda de tempo hierárquica: todos os eventos com hora marcada (expiração e avisos) ---
+_WHEEL_EPOCH = datetime.datetime(2000, 1, 1)
+_WHEEL_TICK = datetime.timedelta(seconds=1)
+
+
+class TimingWheel:
+    """Roda de tempo hierárquica com resolução de 1 s para eventos identificados por uma chave.
+
+    Cada nível tem 2**slot_bits posições; o nível L cobre blocos de 2**(slot_bits*L) segundos.
+    Um evento fica no nível do dígito mais alto em que seu instante difere do instante atual e
+    desce um nível (cascata) quando a roda chega ao bloco dele. Agendar e cancelar custam O(1)
+    (cada posição é um dict); avançar custa O(k) amortizado para k eventos vencidos, pulando
+    direto para a próxima posição ocupada. Eventos além do último nível ficam em `_overflow`.
+
+    O próximo evento (`next_time`) está sempre na primeira posição ocupada do menor nível com
+    eventos (ou em `_ready`): achá-la custa no máximo níveis + posições de um nível, e o evento mais
+    cedo de cada posição fica guardado em `_minimum` até sair dela. Só quando esse evento é
+    cancelado (ou a posição é redistribuída) a posição é percorrida de novo, uma vez.
+    """
+    def __init__(self, now, slot_bits=6, levels=4):
+        self._bits = slot_bits
+        self._mask = (1 << slot_bits) - 1
+        self._levels = [[{} for _ in range(1 << slot_bits)] for _ in range(levels)]
+        self._counts = [0] * levels
+        self._overflow = {}
+        self._ready = {} # Eventos cujo segundo já foi alcançado (aguardando o instante exato)
+        self._entries = {} # chave -> [tick, instante, chave, payload, nível, posição (dict)]
+        self._minimum = {} # id(posição) -> entrada mais cedo dela; ausente = ainda não calculada
+        self._tick = self.tick_of(now)
+
+    @staticmethod
+    def tick_of(when):
+        return (when - _WHEEL_EPOCH) // _WHEEL_TICK
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def clear(self):
+        for level in self._levels:
+            for slot in level:
+                slot.clear()
+        self._counts = [0] * len(self._levels)
+        self._overflow = {}
+        self._ready = {}
+        self._entries = {}
+        self._minimum = {}
+
+    def _place(self, key, entry):
+        tick = entry[0]
+        if tick <= self._tick:
+            level, slot = -1, self._ready
+        else:
+            level = ((tick ^ self._tick).bit_length() - 1) // self._bits
+            if level < len(self._levels):
+                slot = self._levels[level][(tick >> (self._bits * level)) & self._mask]
+                self._counts[level] += 1
+            else:
+                slot = self._overflow
+        entry[4] = level
+        entry[5] = slot
+        slot[key] = entry
+        minimum = self._minimum.get(id(slot))
+        if minimum is not None:
+            if entry[1] < minimum[1]:
+                self._minimum[id(slot)] = entry
+        elif len(slot) == 1:
+            self._minimum[id(slot)] = entry
+
+    def _forget_minimum(self, slot, entry):
+        """Descarta o mínimo guardado da posição se for a entrada que está saindo dela."""
+        if self._minimum.get(id(slot)) is entry:
+            del self._minimum[id(slot)]
+
+    def _slot_minimum(self, slot):
+        """Entrada mais cedo de uma posição não vazia (percorre a posição só se o mínimo não estiver guardado)."""
+        entry = self._minimum.get(id(slot))
+        if entry is None:
+            entry = self._minimum[id(slot)] = min(slot.values(), key=lambda entry: entry[1])
+        return entry
+
+    def schedule(self, key, when, payload):
+        """Agenda (ou reagenda) o evento `key` para o instante `when`."""
+        self.cancel(key)
+        entry = [self.tick_of(when), when, key, payload, None, None]
+        self._entries[key] = entry
+        self._place(key, entry)
+
+    def cancel(self, key):
+        """Remove o evento, se estiver agendado; retorna o payload ou None."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        del entry[5][key]
+        self._forget_minimum(entry[5], entry)
+        if 0 <= entry[4] < len(self._levels):
+            self._counts[entry[4]] -= 1
+        return entry[3]
+
+    def _lowest_level(self):
+        """Menor nível com eventos (len(níveis) = overflow) ou None se a roda está vazia."""
+        for level, count in enumerate(self._counts):
+            if count:
+                return level
+        return len(self._levels) if self._overflow else None
+
+    def _next_slot(self, level):
+        """Primeira posição ocupada do nível depois da atual (há sempre uma: ver _place)."""
+        slots = self._levels[level]
+        current = (self._tick >> (self._bits * level)) & self._mask
+        for index in range(current + 1, self._mask + 1):
+            if slots[index]:
+                return index, slots[index]
+        raise AssertionError("TimingWheel: contagem do nível inconsistente")
+
+    def _cascade(self, slot, level=None):
+        """Redistribui os eventos de uma posição pelos níveis inferiores (relativos ao tick atual)."""
+        moved = list(slot.items())
+        slot.clear()
+        self._minimum.pop(id(slot), None)
+        if level is not None:
+            self._counts[level] -= len(moved)
+        for key, entry in moved:
+            self._place(key, entry)
+
+    def advance(self, now, limit=None):
+        """Avança a roda até `now` e retira os eventos vencidos, em ordem de instante: [(chave, payload)].
+
+        Com `limit`, retira só os `limit` mais antigos; os demais continuam vencidos para a próxima chamada.
+        """
+        target = self.tick_of(now)
+        span = self._bits
+        while self._tick < target:
+            level = self._lowest_level()
+            if level is None:
+                self._tick = target
+                break
+            if level < len(self._levels):
+                index, _ = self._next_slot(level)
+                block = self._tick >> (span * (level + 1)) << (span * (level + 1))
+                tick = block + (index << (span * level))
+            else: # Só há eventos além do último nível: pula direto para o bloco do mais próximo
+                tick = self._slot_minimum(self._overflow)[0] >> (span * level) << (span * level)
+            if tick > target:
+                self._tick = target
+                break
+            self._tick = tick
+            if tick & ((1 << (span * len(self._levels))) - 1) == 0 and self._overflow:
+                self._cascade(self._overflow)
+            for upper in range(len(self._levels) - 1, -1, -1):
+                if tick & ((1 << (span * upper)) - 1) == 0:
+                    self._cascade(self._levels[upper][(tick >> (span * upper)) & self._mask], upper)
+        due = [entry for entry in self._ready.values() if entry[1] <= now]
+        due.sort(key=lambda entry: entry[1])
+        if limit is not None:
+            del due[limit:]
+        for entry in due:
+            del self._ready[entry[2]]
+            del self._entries[entry[2]]
+            self._forget_minimum(self._ready, entry)
+        return [(entry[2], entry[3]) for entry in due]
+
+    def next_time(self):
+        """Instante do próximo evento ou None se a roda está vazia.
+
+        Os eventos em `_ready` (segundo já alcançado) vêm antes de todos os dos níveis, e num nível
+        cada posição cobre um bloco de tempo posterior ao das anteriores.
+        """
+        if self._ready:
+            return self._slot_minimum(self._ready)[1]
+        level = self._lowest_level()
+        if level is None:
+            return None
+        slot = self._next_slot(level)[1] if level < len(self._levels) else self._overflow
+        return self._slot_minimum(slot)[1]
+
+
+# --- Índice de duplicidade: (MAC, senha) normalizados -> cliente ATIVO ---
+class ClientIndex:
+    """Índice em memória dos clientes ATIVOS por par (MAC, senha) normalizado.
+
+    Verificar duplicidade custa O(1). O histórico de vencidos
+    não fica em memória: o ClientStore completa a verificação no banco (índice idx_clients_key).
+    """
+    def __init__(self, clients=()):
+        self._by_key = {} # (mac normalizado, senha) -> cliente
+        for client in clients:
+            self.add(client)
+
+    def __len__(self):
+        return len(self._by_key)
+
+    @staticmethod
+    def key_for(mac, senha):
+        return (normalize_mac(mac), senha.strip())
+
+    def add(self, client):
+        key = self.key_for(client.mac, client.senha)
+        self._by_key[key] = client
+
+    def remove(self, client):
+        key = self.key_for(client.mac, client.senha)
+        if self._by_key.get(key) is client:
+            del self._by_key[key]
+
+    def find(self, mac, senha):
+        """Retorna o cliente já cadastrado com este MAC e senha, ou None."""
+        return self._by_key.get(self.key_for(mac, senha))
+
+
+# --- Índice de busca: prefixo do nome (array ordenado) e trecho do MAC (trigramas) ---
+class SearchIndex:
+    """Índice incremental para a busca das listas: prefixo do nome, trecho do MAC e status.
+
+    Guarda só chaves compactas por client.id (não os clientes): um array ordenado de nomes
+    normalizados, percorrido com bisect, e um mapa trigrama -> ids do MAC normalizado.
+    Inserir/remover custa O(log n) + deslocamento do array; uma busca custa o tamanho do resultado.
+    Os clientes devem ser adicionados na ordem de `order` (cadastro ou saída da lista ativa):
+    resultados grandes saem nessa ordem sem precisar ordenar. `order` é única por cliente, então
+    os dois caminhos da busca dão sempre a mesma ordem (no histórico, (ended_at, rowid), como nas páginas);
+    se um cliente chegar fora de ordem (ex.: relógio atrasado), os resultados grandes passam a ser ordenados.
+    """
+    GRAM = 3
+
+    def __init__(self):
+        self._entries = {} # client.id -> (nome normalizado, mac normalizado, status, chave de ordem)
+        self._names = [] # (nome normalizado, client.id), ordenado
+        self._grams = {} # trigrama do MAC -> {client.id}
+        self._last_order = None # Maior `order` já inserida
+        self._in_order = True # _entries está na ordem de `order`?
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, client_id):
+        return client_id in self._entries
+
+    @staticmethod
+    def normalize_name(nome):
+        return ' '.join(nome.split()).casefold()
+
+    def _mac_grams(self, mac_key):
+        return {mac_key[i:i + self.GRAM] for i in range(len(mac_key) - self.GRAM + 1)}
+
+    def add(self, client_id, nome, mac, status, order):
+        """Indexa (ou reindexa) um cliente; `order` define a ordem dos resultados."""
+        self.remove(client_id)
+        name_key = self.normalize_name(nome)
+        mac_key = normalize_mac(mac)
+        self._entries[client_id] = (name_key, mac_key, status, order)
+        if self._last_order is not None and order < self._last_order:
+            self._in_order = False
+        else:
+            self._last_order = order
+        bisect.insort(self._names, (name_key, client_id))
+        for gram in self._mac_grams(mac_key):
+            self._grams.setdefault(gram, set()).add(client_id)
+
+    def remove(self, client_id):
+        entry = self._entries.pop(client_id, None)
+        if entry is None:
+            return
+        name_key, mac_key = entry[0], entry[1]
+        position = bisect.bisect_left(self._names, (name_key, client_id))
+        del self._names[position]
+        for gram in self._mac_grams(mac_key):
+            ids = self._grams[gram]
+            ids.discard(client_id)
+            if not ids:
+                del self._grams[gram]
+
+    def _ids_with_name_prefix(self, prefix):
+        start = bisect.bisect_left(self._names, (prefix,))
+        end = bisect.bisect_left(self._names, (prefix + '\U0010ffff',))
+        return {client_id for _, client_id in self._names[start:end]}
+
+    def _ids_with_mac_fragment(self, fragment):
+        if len(fragment) < self.GRAM:
+            # Trecho curto demais para os trigramas: compara direto (só nas primeiras teclas)
+            return {client_id for client_id, entry in self._entries.items() if fragment in entry[1]}
+        candidates = None
+        for gram in sorted(self._mac_grams(fragment), key=lambda gram: len(self._grams.get(gram, ()))):
+            ids = self._grams.get(gram)
+            if not ids:
+                return set()
+            candidates = set(ids) if candidates is None else candidates & ids
+        # Os trigramas podem aparecer fora de ordem: confirma o trecho inteiro
+        return {client_id for client_id in candidates if fragment in self._entries[client_id][1]}
+
+    def matches(self, client_id, text, status=None):
+        """Diz se um cliente indexado atende à busca (usado para inserir linhas com o filtro ativo)."""
+        entry = self._entries.get(client_id)
+        if entry is None or (status is not None and entry[2] != status):
+            return False
+        name_prefix = self.normalize_name(text)
+        mac_fragment = normalize_mac(text)
+        return (not name_prefix or entry[0].startswith(name_prefix)
+                or bool(mac_fragment) and mac_fragment in entry[1])
+
+    def search(self, text, status=None, reverse=False):
+        """Retorna os ids cujo nome começa com `text` ou cujo MAC contém `text`, na ordem de `order`."""
+        name_prefix = self.normalize_name(text)
+        if name_prefix:
+            ids = self._ids_with_name_prefix(name_prefix)
+            mac_fragment = normalize_mac(text)
+            if mac_fragment:
+                ids |= self._ids_with_mac_fragment(mac_fragment)
+        elif status is None and self._in_order:
+            result = list(self._entries)
+            if reverse:
+                result.reverse()
+            return result
+        else:
+            ids = self._entries.keys()
+        entries = self._entries
+        if len(ids) * 8 > len(entries) and self._in_order:
+            # Resultado grande: percorre as entradas, que já estão na ordem de `order`
+            result = [client_id for client_id, entry in entries.items()
+                      if client_id in ids and (status is None or entry[2] == status)]
+        else:
+            result = sorted((client_id for client_id in ids if status is None or entries[client_id][2] == status),
+                            key=lambda client_id: entries[client_id][3])
+        if reverse:
+            result.reverse()
+        return result
+
+
+# --- Ordem de exibição da lista ATIVA: grupos com chaves ordenadas (bisect) ---
+class GroupedOrder:
+    """Ordem de exibição dos clientes: grupos em ordem crescente e, dentro de cada grupo,
+    pares (chave de ordenação, client.id) mantidos ordenados com bisect.
+
+    As posições retornadas são as da lista "achatada" mostrada na tela, em que cada grupo não
+    vazio começa por uma linha de cabeçalho (sem `group_of` há um único grupo, sem cabeçalho).
+    Inserir, remover e reposicionar custam O(log n) na busca mais O(g) para somar os g grupos
+    anteriores; o tempo restante não exige reordenar: os prazos não mudam com o relógio.
+    """
+    def __init__(self, sort_key, group_of=None, clients=()):
+        self.sort_key = sort_key
+        self.group_of = group_of
+        self._header = 1 if group_of is not None else 0
+        self._groups = {} # grupo -> [(chave, client.id)], ordenado
+        self._group_order = [] # grupos não vazios, ordenados
+        self._placed = {} # client.id -> (grupo, chave) com que o cliente foi inserido
+        for client in clients:
+            group, key = self._place_of(client)
+            self._groups.setdefault(group, []).append(key)
+            self._placed[client.id] = (group, key)
+        for items in self._groups.values():
+            items.sort()
+        self._group_order = sorted(self._groups)
+
+    def __len__(self):
+        return len(self._placed)
+
+    def __contains__(self, client_id):
+        return client_id in self._placed
+
+    def _place_of(self, client):
+        group = self.group_of(client) if self.group_of is not None else None
+        return group, (self.sort_key(client), client.id)
+
+    def _group_start(self, group):
+        """Posição (na lista achatada) do primeiro cliente do grupo."""
+        start = 0
+        for other in self._group_order:
+            if other == group:
+                break
+            start += self._header + len(self._groups[other])
+        return start + self._header
+
+    def add(self, client):
+        """Insere o cliente; retorna (posição do cliente, posição do cabeçalho criado ou None)."""
+        group, key = self._place_of(client)
+        items = self._groups.get(group)
+        new_group = items is None
+        if new_group:
+            items = self._groups[group] = []
+            bisect.insort(self._group_order, group)
+        position = bisect.bisect_left(items, key)
+        items.insert(position, key)
+        self._placed[client.id] = (group, key)
+        start = self._group_start(group)
+        return start + position, (start - 1 if new_group and self._header else None)
+
+    def remove(self, client_id):
+        """Remove o cliente; retorna (posição que ele ocupava, posição do cabeçalho removido ou None),
+        ou None se ele não estava na ordem. Ao aplicar na tela, remova primeiro o cliente.
+        """
+        placed = self._placed.pop(client_id, None)
+        if placed is None:
+            return None
+        group, key = placed
+        items = self._groups[group]
+        start = self._group_start(group)
+        position = bisect.bisect_left(items, key)
+        del items[position]
+        header_index = None
+        if not items:
+            del self._groups[group]
+            self._group_order.remove(group)
+            header_index = start - 1 if self._header else None
+        return start + position, header_index
+
+    def changed(self, client):
+        """O grupo ou a chave do cliente mudou desde que ele foi inserido (ex.: renovação, aviso)?"""
+        placed = self._placed.get(client.id)
+        return placed is not None and placed != self._place_of(client)
+
+    def group_at(self, index):
+        """Grupo e número de ordem (1, 2, ...) do cliente na posição `index` da lista achatada."""
+        start = 0
+        number = 0
+        for group in self._group_order:
+            size = len(self._groups[group])
+            if index < start + self._header + size:
+                return group, number + index - start - self._header + 1
+            start += self._header + size
+            number += size
+        raise IndexError(index)
+
+    def entries(self):
+        """Percorre a lista achatada: (grupo, None) para cabeçalhos e (grupo, client.id) para clientes."""
+        for group in self._group_order:
+            if self._header:
+                yield group, None
+            for _, client_id in self._groups[group]:
+                yield group, client_id
+
+
+# --- Regras de status para clientes do antigo client_data.json ---
+def normalize_legacy_clients(active, expired, duration, now):
+    """Completa os campos que faltavam em clientes antigos (dicts) e deduz o status dos vencidos."""
+    # Garante flags para clientes antigos que não tinham status/calendar_event_created
+    for client in active:
+         if 'calendar_event_created' not in client:
+              client['calendar_event_created'] = False
+         if 'status' not in client: # Garante status para clientes antigos
+              client['status'] = 'active'
+
+    # Garante flags para clientes antigos em expirados
+    for client in expired:
+         if 'calendar_event_created' not in client:
+              client['calendar_event_created'] = False
+         if 'status' not in client:
+             # Tenta deduzir o status para clientes antigos sem o campo
+             if client.get('creation_time') is not None and isinstance(client.get('creation_time'), datetime.datetime):
+                  # Se tem creation_time e é um datetime, tenta ver se já passou do timer total
+                  try:
+                       if now - client['creation_time'] > duration:
+                            client['status'] = 'expired'
+                       else: # Se creation_time existe mas não expirou (o que não deveria acontecer em 'expired_clients_list'), assume manual
+                            client['status'] = 'deleted_manual'
+                  except TypeError: # Catch error if creation_time is not a datetime object for some reason
+                       client['status'] = 'deleted_manual'
+             else: # Se não tem creation_time, assume que foi deletado manualmente (pode não ser preciso)
+                  client['status'] = 'deleted_manual'
+
+
+def _to_order_key(ended_at, rowid):
+    """Chave de ordem do histórico: (ended_at em ISO 8601, rowid), a mesma das páginas lidas do banco."""
+    return (ended_at.isoformat() if ended_at is not None else '', rowid)
+
+
+# --- Estado dos clientes ---
+class ClientStore:
+    """Clientes ATIVOS em memória, com o índice de duplicidade e a gravação no banco.
+
+    O histórico de vencidos/excluídos fica apenas no banco e é lido por páginas (`ended_page`);
+    em memória só há a sua contagem, usada pela política de retenção.
+
+    `clock` é uma função sem argumentos que retorna o datetime atual; benchmarks e testes
+    injetam um relógio manual para tornar a expiração determinística.
+    """
+    def __init__(self, database, duration=DEFAULT_TIMER_DURATION, clock=datetime.datetime.now):
+        self.database = database
+        self.duration = duration
+        self.clock = clock
+        self.active_clients = {} # client.id -> Client ATIVO (na ordem de cadastro)
+        self.ended_count = 0 # Vencidos/excluídos no banco
+        self.index = ClientIndex()
+        self.active_search = SearchIndex()
+        self.ended_search = None # SearchIndex do histórico, montado na primeira busca na tela de vencidos
+        self._active_order = itertools.count()
+
+    def load(self, legacy_json_path=None):
+        """Carrega os clientes do banco, migrando o antigo client_data.json se o banco estiver vazio."""
+        if legacy_json_path and os.path.exists(legacy_json_path) and self.database.count() == 0:
+            self.migrate_legacy_json(legacy_json_path)
+
+        active = self.database.load_active_clients()
+        self.active_clients = {client.id: client for client in active}
+        self.ended_count = self.database.count_ended()
+        self.index = ClientIndex(active)
+        self.active_search = SearchIndex()
+        self.ended_search = None
+        for client in active:
+            self._index_active(client)
+
+    def _index_active(self, client):
+        self.active_search.add(client.id, client.nome, client.mac, client.status, next(self._active_order))
+
+    def _index_ended(self, clients):
+        """Tira os clientes da busca dos ativos e os coloca na do histórico (se ela já foi montada)."""
+        for client in clients:
+            self.active_search.remove(client.id)
+        if self.ended_search is not None and clients:
+            rowids = self.database.rowids(client.id for client in clients)
+            for client in sorted(clients, key=lambda client: rowids[client.id]):
+                self.ended_search.add(client.id, client.nome, client.mac, client.status,
+                                      _to_order_key(client.ended_at, rowids[client.id]))
+
+    def ended_search_index(self):
+        """Índice de busca do histórico, montado do banco na primeira chamada e depois mantido a cada mudança."""
+        if self.ended_search is None:
+            self.ended_search = SearchIndex()
+            for client_id, nome, mac, status, ended_at, rowid in self.database.iter_ended_search_keys():
+                self.ended_search.add(client_id, nome, mac, status, (ended_at or '', rowid))
+        return self.ended_search
+
+    def search_active(self, text):
+        """Clientes ATIVOS que atendem à busca, na ordem de cadastro."""
+        return [self.active_clients[client_id] for client_id in self.active_search.search(text)]
+
+    def search_ended(self, text, status=None):
+        """Ids do histórico que atendem à busca, do mais recente ao mais antigo (carregue-os com `get_clients`)."""
+        return self.ended_search_index().search(text, status, reverse=True)
+
+    def get_clients(self, client_ids):
+        return self.database.get_clients(client_ids)
+
+    def migrate_legacy_json(self, path):
+        """Importa o antigo client_data.json para o banco (uma única vez) e renomeia o arquivo."""
+        try:
+            active, expired = read_legacy_json(path)
+        except json.JSONDecodeError as e:
+             log.error('legacy_json_corrupt', f"Failed to decode JSON from {path}: {e}. "
+                       "Data file might be corrupted. Skipping migration.", path=path, error=str(e))
+             return
+        except Exception as e:
+             log.error('legacy_json_failed', f"Failed to load data from {path}: {e}. Skipping migration.",
+                       path=path, error=str(e))
+             return
+
+        now = self.clock()
+        normalize_legacy_clients(active, expired, self.duration, now)
+
+        # O momento real da saída da lista ativa não existia no JSON: usa o da migração (a ordem é mantida pelo rowid)
+        clients = []
+        for client_dict in active + expired:
+            client = Client.from_dict(client_dict, self.duration)
+            if client.status != 'active':
+                client.ended_at = now
+            clients.append(client)
+
+        self.database.insert_many(clients)
+        self.database.commit()
+        os.replace(path, path + '.migrated')
+        log.info('legacy_json_migrated', f"Migrated {len(active)} active and {len(expired)} expired clients from {path}",
+                 path=path, active=len(active), expired=len(expired))
+
+    def save(self):
+        """Grava no banco as alterações pendentes."""
+        self.database.commit()
+
+    def find_duplicate(self, mac, senha):
+        """Retorna o cliente (ativo, vencido ou já arquivado) cadastrado com este MAC e senha, ou None."""
+        client = self.index.find(mac, senha)
+        if client is not None:
+            return client
+        # Vencidos e arquivados não estão em memória: consultas indexadas no banco
+        key = ClientIndex.key_for(mac, senha)
+        client = self.database.find_ended(*key)
+        if client is not None:
+            return client
+        archived = self.database.find_archived(*key)
+        if archived is not None:
+            return Client(mac, senha, archived[0], status='archived')
+        return None
+
+    def add_client(self, mac, senha, nome, plan=DEFAULT_PLAN):
+        """Cadastra um novo cliente ATIVO no plano informado, com o timer começando agora."""
+        creation_time = self.clock()
+        duration = PLANS[plan].duration
+        client = Client(mac=mac,
+                        senha=senha,
+                        nome=nome,
+                        creation_time=creation_time,
+                        deadline=creation_time + duration,
+                        calendar_event_created=False,
+                        status='active',
+                        plan=plan,
+                        duration=duration)
+        self.active_clients[client.id] = client
+        self.index.add(client)
+        self._index_active(client)
+        self.database.insert_client(client)
+        return client
+
+    def add_many(self, records, report):
+        """Cadastra em lote os registros {'mac', 'senha', 'nome', 'plano'} de uma importação.
+
+        Duplicados (no banco ou no próprio arquivo) vão para o relatório; o histórico e os arquivados
+        são consultados em bloco e os novos clientes gravados com um único executemany.
+        Retorna a lista de clientes criados.
+        """
+        creation_time = self.clock()
+        # Vencidos e arquivados com os mesmos pares: consultas em bloco, não duas por registro
+        keys = {ClientIndex.key_for(record['mac'], record['senha']) for record in records}
+        ended = self.database.find_ended_many(keys)
+        archived = self.database.find_archived_many(key for key in keys if key not in ended)
+        added = []
+        for record in records:
+            key = ClientIndex.key_for(record['mac'], record['senha'])
+            existing = self.index.find(record['mac'], record['senha']) or ended.get(key)
+            if existing is None and key in archived:
+                existing = Client(record['mac'], record['senha'], archived[key][0], status='archived')
+            if existing is not None:
+                report.duplicates += 1
+                report.add_error(record.get('_line'), f"MAC {record['mac']} e senha já cadastrados ({existing.nome})")
+                continue
+            plan = PLANS[record.get('plano') or DEFAULT_PLAN]
+            client = Client(mac=record['mac'],
+                            senha=record['senha'],
+                            nome=record['nome'],
+                            creation_time=creation_time,
+                            deadline=creation_time + plan.duration,
+                            calendar_event_created=False,
+                            status='active',
+                            plan=plan.key,
+                            duration=plan.duration)
+            self.active_clients[client.id] = client
+            self.index.add(client)
+            self._index_active(client)
+            added.append(client)
+        self.database.insert_many(added)
+        report.imported += len(added)
+        return added
+
+    def delete_manual(self, client):
+        """Move o cliente da lista ativa para a de vencidos com status 'deleted_manual'."""
+        if self.active_clients.get(client.id) is not client:
+            return False
+        client.status = 'deleted_manual'
+        client.ended_at = self.clock()
+        del self.active_clients[client.id]
+        self.index.remove(client)
+        self.ended_count += 1
+        self.database.update_status(client)
+        self._index_ended([client])
+        return True
+
+    def purge(self, client):
+        """Remove o cliente permanentemente da lista de vencidos."""
+        if client.is_active or not self.database.delete_client(client):
+            return False
+        if self.ended_search is not None:
+            self.ended_search.remove(client.id)
+        self.ended_count -= 1
+        return True
+
+    # --- Ações em lote: uma única escrita no banco para todos os clientes ---
+    def delete_manual_many(self, clients):
+        """Move vários clientes ATIVOS para os vencidos ('deleted_manual'); retorna os que foram movidos."""
+        now = self.clock()
+        moved = []
+        for client in clients:
+            if self.active_clients.get(client.id) is not client:
+                continue
+            client.status = 'deleted_manual'
+            client.ended_at = now
+            del self.active_clients[client.id]
+            self.index.remove(client)
+            moved.append(client)
+        self.database.update_status_many(moved)
+        self._index_ended(moved)
+        self.ended_count += len(moved)
+        return moved
+
+    def purge_many(self, clients):
+        """Remove permanentemente vários clientes do histórico; retorna quantos saíram do banco."""
+        ended = [client for client in clients if not client.is_active]
+        removed = self.database.delete_many(ended)
+        if self.ended_search is not None:
+            for client in ended:
+                self.ended_search.remove(client.id)
+        self.ended_count -= removed
+        return removed
+
+    def purge_ended(self, older_than=None):
+        """Remove todo o histórico, ou só quem saiu da lista ativa há mais de `older_than` (timedelta)."""
+        before = self.clock() - older_than if older_than is not None else None
+        removed = self.database.delete_ended(before)
+        if removed:
+            self.ended_search = None # Remontado do banco na próxima busca
+            self.ended_count -= removed
+        return removed
+
+    def set_deadline(self, client, deadline):
+        """Troca o prazo de um cliente ATIVO (renovação/extensão) gravando só essa coluna."""
+        if self.active_clients.get(client.id) is not client:
+            return False
+        client.deadline = deadline
+        self.database.update_deadline(client)
+        return True
+
+    def reactivate(self, client, deadline):
+        """Devolve um cliente vencido/excluído à lista ativa com um novo prazo.
+
+        Recusa (retorna False) se já houver um cliente ATIVO com o mesmo MAC e senha.
+        """
+        if client.is_active or self.index.find(client.mac, client.senha) is not None:
+            return False
+        previous = (client.status, client.deadline, client.ended_at, client.reminder_status, client.calendar_event_created)
+        client.status = 'active'
+        client.deadline = deadline
+        client.ended_at = None
+        client.reminder_status = None
+        client.calendar_event_created = False
+        with self.database.lock: # Status e prazo novos chegam juntos ao commit
+            if not self.database.update_status(client): # Excluído permanentemente ou arquivado nesse meio-tempo
+                (client.status, client.deadline, client.ended_at, client.reminder_status,
+                 client.calendar_event_created) = previous
+                return False
+            self.database.update_deadline(client)
+        self.active_clients[client.id] = client
+        self.index.add(client)
+        self._index_active(client)
+        if self.ended_search is not None:
+            self.ended_search.remove(client.id)
+        self.ended_count -= 1
+        return True
+
+    def ended_page(self, limit, after=None):
+        """Uma página do histórico de vencidos, do mais recente ao mais antigo: (clientes, cursor da próxima)."""
+        return self.database.page_ended_clients(limit, after)
+
+    def archive_expired(self, policy, directory, fmt='jsonl'):
+        """Aplica a política de retenção: grava os vencidos escolhidos num arquivo .gz e os tira do banco.
+
+        Retorna (caminho do arquivo, quantidade) ou (None, 0) se nada precisou ser arquivado.
+        Quem não pode esperar a gravação (a thread da UI) chama as três etapas separadamente:
+        `select_for_archive`, write_archive numa thread e `finish_archive` de volta na thread dona do banco.
+        """
+        selected = self.select_for_archive(policy)
+        if not selected:
+            return None, 0
+        path = self.new_archive_path(directory, fmt)
+        write_archive(path, selected)
+        return path, self.finish_archive(selected, path)
+
+    def select_for_archive(self, policy):
+        """Vencidos que a política manda arquivar, do mais antigo ao mais recente (só lê o banco)."""
+        return policy.select(self.database.iter_ended_clients(), self.ended_count, self.clock())
+
+    def new_archive_path(self, directory, fmt='jsonl'):
+        """Caminho livre para um novo arquivo de arquivamento em `directory` (criado se preciso)."""
+        now = self.clock()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, archive_file_name(now, fmt=fmt))
+        suffix = itertools.count(2)
+        while os.path.exists(path) or os.path.exists(path + '.tmp'): # Mais de um arquivamento no mesmo segundo
+            path = os.path.join(directory, archive_file_name(now, fmt=fmt, sequence=next(suffix)))
+        return path
+
+    def finish_archive(self, selected, path):
+        """Com `path` já completo no disco, tira do banco os clientes arquivados; retorna quantos saíram.
+
+        Quem foi reativado ou apagado desde `select_for_archive` continua como está.
+        """
+        still_ended = {client.id for client in self.database.get_clients([client.id for client in selected])
+                       if not client.is_active}
+        archived = [client for client in selected if client.id in still_ended]
+        archive_name = os.path.basename(path)
+        with self.database.lock:
+            self.database.insert_archived_keys(
+                (ClientIndex.key_for(client.mac, client.senha) + (client.nome,) for client in archived), archive_name)
+            self.database.delete_many(archived)
+            self.database.commit()
+        self.ended_count -= len(archived)
+        if self.ended_search is not None:
+            for client in archived:
+                self.ended_search.remove(client.id)
+        log.info('expired_archived', f"Archived {len(archived)} expired client(s) to {path}",
+                 path=path, count=len(archived))
+        return len(archived)
+
+    def export_expired(self, path):
+        """Exporta todo o histórico de vencidos/excluídos (sem removê-lo) lendo o banco em blocos."""
+        return write_archive(path, self.database.iter_ended_clients())
+
+    def mark_expired(self, clients, now):
+        """Move clientes ATIVOS cujo prazo passou para a lista de vencidos, com o lembrete (e as ações do daemon) pendentes."""
+        for client in clients:
+            client.status = 'expired'
+            client.ended_at = now
+            client.reminder_status = 'pending'
+            del self.active_clients[client.id]
+            self.index.remove(client)
+        self.database.update_status_many(clients)
+        self._index_ended(clients)
+        self.ended_count += len(clients)
+
+    def record_reminder_result(self, client_id, delivered):
+        """Grava o resultado da criação do lembrete; retorna False se o cliente já foi excluído."""
+        if delivered:
+            return self.database.update_reminder_status(client_id, 'sent', calendar_event_created=True)
+        return self.database.update_reminder_status(client_id, 'failed')
+
+    def pending_reminders(self):
+        """Clientes vencidos cujo lembrete ainda não foi entregue (lidos do banco)."""
+        return self.database.load_ended_clients('pending')
+
+
+# --- Expiração ---
+class TimerEngine:
+    """Agenda a expiração (e os avisos antes dela) dos clientes de um ClientStore numa TimingWheel
+    e aplica as mutações mantendo o agendamento coerente.
+
+    `warning_offsets` são as antecedências dos avisos (ex.: 1 h, 15 min, 1 min antes do prazo);
+    `warnings` guarda, por cliente, a menor antecedência já alcançada (o selo mostrado na linha).
+    """
+    def __init__(self, store, clock=None, warning_offsets=()):
+        self.store = store
+        self.clock = clock or store.clock
+        self.warning_offsets = sorted(set(warning_offsets), reverse=True)
+        self.warnings = {} # client.id -> antecedência (timedelta) do último aviso alcançado
+        self.wheel = TimingWheel(self.clock())
+
+    def schedule(self, client):
+        """Coloca um cliente ATIVO na roda: a expiração e os avisos que ainda estão no futuro.
+
+        Avisos cuja hora já passou não são disparados; só marcam o selo do cliente.
+        """
+        self.unschedule(client)
+        if client.deadline is None or client.calendar_event_created:
+            return
+        self.wheel.schedule(('expire', client.id), client.deadline, client)
+        now = self.clock()
+        for offset in self.warning_offsets:
+            when = client.deadline - offset
+            if when > now:
+                self.wheel.schedule(('warn', client.id, offset), when, client)
+            else:
+                self.warnings[client.id] = offset
+
+    def unschedule(self, client):
+        """Tira da roda a expiração e os avisos do cliente (O(1) por evento)."""
+        self.wheel.cancel(('expire', client.id))
+        for offset in self.warning_offsets:
+            self.wheel.cancel(('warn', client.id, offset))
+        self.warnings.pop(client.id, None)
+
+    def rebuild(self):
+        """Reconstrói o agendamento a partir dos clientes ATIVOS (usado após carregar os dados)."""
+        self.wheel = TimingWheel(self.clock())
+        self.warnings = {}
+        for client in self.store.active_clients.values():
+            self.schedule(client)
+
+    def next_deadline(self):
+        """Instante do próximo evento agendado (aviso ou expiração) ou None."""
+        return self.wheel.next_time()
+
+    def seconds_until_next_deadline(self):
+        """Segundos até o próximo evento (0 se já passou) ou None se não há nada agendado."""
+        next_deadline = self.wheel.next_time()
+        if next_deadline is None:
+            return None
+        return max((next_deadline - self.clock()).total_seconds(), 0)
+
+    def add_client(self, mac, senha, nome, plan=DEFAULT_PLAN):
+        client = self.store.add_client(mac, senha, nome, plan)
+        self.schedule(client)
+        return client
+
+    def import_clients(self, records, report):
+        """Cadastra os registros importados e agenda a expiração de todos de uma vez."""
+        added = self.store.add_many(records, report)
+        for client in added:
+            self.schedule(client)
+        return added
+
+    def delete_manual(self, client):
+        if not self.store.delete_manual(client):
+            return False
+        self.unschedule(client)
+        return True
+
+    def purge(self, client):
+        return self.store.purge(client)
+
+    def delete_manual_many(self, clients):
+        moved = self.store.delete_manual_many(clients)
+        for client in moved:
+            self.unschedule(client)
+        return moved
+
+    def purge_many(self, clients):
+        return self.store.purge_many(clients)
+
+    def purge_ended(self, older_than=None):
+        return self.store.purge_ended(older_than)
+
+    def _set_deadline(self, client, deadline):
+        """Aplica o novo prazo (reativando vencidos) e troca só a entrada deste cliente no agendador."""
+        if client.is_active:
+            changed = self.store.set_deadline(client, deadline)
+        else:
+            changed = self.store.reactivate(client, deadline)
+        if changed:
+            self.schedule(client)
+        return changed
+
+    def renew(self, client):
+        """Recomeça o plano do cliente a partir de agora."""
+        return self._set_deadline(client, self.clock() + client.duration)
+
+    def extend(self, client, delta):
+        """Soma `delta` ao tempo restante (para vencidos, a partir de agora)."""
+        now = self.clock()
+        base = client.deadline if client.is_active and client.deadline is not None and client.deadline > now else now
+        return self._set_deadline(client, base + delta)
+
+    def take_due(self, limit=None):
+        """Retira da roda os eventos vencidos SEM gravar nada: retorna (expirados, avisos), com
+        avisos = [(cliente, antecedência)], um por cliente. Os expirados continuam ATIVOS no
+        ClientStore até serem gravados (é o que `process_due` faz).
+
+        Com `limit`, processa no máximo `limit` eventos (os mais antigos): quem precisa
+        dividir um acúmulo grande em fatias chama de novo enquanto `has_due()` for verdadeiro.
+        """
+        now = self.clock()
+        expired = []
+        warned = {}
+        for key, client in self.wheel.advance(now, limit):
+            if key[0] == 'expire':
+                expired.append(client)
+            else:
+                warned[client.id] = (client, key[2]) # Em ordem de instante: fica a menor antecedência
+        for client, offset in warned.values():
+            self.warnings[client.id] = offset
+        for client in expired:
+            self.warnings.pop(client.id, None)
+            warned.pop(client.id, None)
+            for offset in self.warning_offsets:
+                self.wheel.cancel(('warn', client.id, offset))
+        return expired, list(warned.values())
+
+    def process_due(self, limit=None):
+        """Como `take_due`, já movendo os clientes expirados para os vencidos; retorna (expirados, avisos)."""
+        expired, warned = self.take_due(limit)
+        if expired:
+            self.store.mark_expired(expired, self.clock())
+        return expired, warned
+
+    def has_due(self):
+        """Há eventos cujo instante já passou esperando process_due?"""
+        next_time = self.wheel.next_time()
+        return next_time is not None and next_time <= self.clock()
+
+    def expire_due(self):
+        """Como `process_due`, retornando só os clientes expirados (os avisos atualizam `warnings`)."""
+        return self.process_due()[0]
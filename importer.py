@@ -0,0 +1,142 @@
+# importer.py
+# Importação em lote de clientes a partir de arquivos CSV ou JSONL, lidos linha a linha.
+# Não importa Kivy: a leitura pode rodar numa thread e o resultado é aplicado pelo TimerEngine.
+
+import csv
+import json
+import os
+
+from models import PLANS
+
+IMPORT_FIELDS = ('mac', 'senha', 'nome')
+OPTIONAL_FIELDS = ('plano',) # Chave ou nome do plano (ex.: 'semanal' ou 'Semanal'); vazio = plano padrão
+_PLAN_NAMES = {name.casefold(): plan.key for plan in PLANS.values() for name in (plan.key, plan.label)}
+
+
+class ImportReport:
+    """Resultado de uma importação: quantos clientes entraram e o erro de cada linha rejeitada."""
+    def __init__(self, path):
+        self.path = path
+        self.rows_read = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.errors = [] # (número da linha, mensagem)
+
+    def add_error(self, line_number, message):
+        self.errors.append((line_number, message))
+
+    def summary(self):
+        return (f"{self.imported} importado(s), {self.duplicates} duplicado(s), "
+                f"{len(self.errors)} erro(s) em {self.rows_read} linha(s)")
+
+
+class _ByteCountingLines:
+    """Itera as linhas de um arquivo binário decodificadas em UTF-8, contando os bytes já lidos."""
+    def __init__(self, f):
+        self._f = f
+        self.bytes_read = 0
+        self.line_number = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        raw = self._f.readline()
+        if not raw:
+            raise StopIteration
+        self.bytes_read += len(raw)
+        self.line_number += 1
+        line = raw.decode('utf-8')
+        if self.line_number == 1:
+            line = line.lstrip('\ufeff') # BOM de arquivos salvos pelo Excel
+        return line
+
+
+def _clean_record(row):
+    """Valida uma linha já convertida em dict; retorna (registro, mensagem de erro)."""
+    row = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+    missing = [field for field in IMPORT_FIELDS if not str(row.get(field) or '').strip()]
+    if missing:
+        return None, f"campo(s) vazio(s) ou ausente(s): {', '.join(missing)}"
+    record = {field: str(row[field]).strip() for field in IMPORT_FIELDS}
+    plan_name = str(row.get('plano') or '').strip()
+    if plan_name:
+        plan = _PLAN_NAMES.get(plan_name.casefold())
+        if plan is None:
+            return None, f"plano desconhecido: {plan_name}"
+        record['plano'] = plan
+    return record, None
+
+
+def _iter_csv(lines):
+    reader = csv.DictReader(lines)
+    if reader.fieldnames is None:
+        return
+    header = {name.strip().lower() for name in reader.fieldnames if name}
+    missing = [field for field in IMPORT_FIELDS if field not in header]
+    if missing:
+        raise ValueError(f"Cabeçalho CSV sem a(s) coluna(s): {', '.join(missing)}")
+    for row in reader:
+        if not any((value or '').strip() for value in row.values() if isinstance(value, str)):
+            continue # Linha em branco
+        yield lines.line_number, row, None
+
+
+def _iter_jsonl(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield lines.line_number, None, f"JSON inválido: {e.msg}"
+            continue
+        if not isinstance(row, dict):
+            yield lines.line_number, None, "a linha não é um objeto JSON"
+            continue
+        yield lines.line_number, row, None
+
+
+def read_import_file(path, on_progress=None, progress_every=500):
+    """Lê um arquivo .csv (com cabeçalho mac,senha,nome e, opcionalmente, plano) ou .jsonl (um objeto por linha).
+
+    Retorna (registros, relatório): os registros válidos como dicts {'mac', 'senha', 'nome'[, 'plano']} com o
+    número da linha em '_line'; as linhas inválidas vão para `relatório.errors`. O arquivo é lido
+    em fluxo, sem carregar tudo na memória; `on_progress(fração, linhas_lidas)` é chamado a cada
+    `progress_every` linhas e ao final. Cabeçalho CSV incompleto ou extensão desconhecida levantam ValueError.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        parse = _iter_csv
+    elif extension in ('.jsonl', '.ndjson'):
+        parse = _iter_jsonl
+    else:
+        raise ValueError(f"Formato não suportado: {extension or path} (use .csv ou .jsonl)")
+
+    report = ImportReport(path)
+    records = []
+    total_bytes = os.path.getsize(path) or 1
+
+    with open(path, 'rb') as f:
+        lines = _ByteCountingLines(f)
+        try:
+            for line_number, row, error in parse(lines):
+                report.rows_read += 1
+                if error is None:
+                    record, error = _clean_record(row)
+                if error is not None:
+                    report.add_error(line_number, error)
+                else:
+                    record['_line'] = line_number
+                    records.append(record)
+
+                if on_progress is not None and report.rows_read % progress_every == 0:
+                    on_progress(lines.bytes_read / total_bytes, report.rows_read)
+        except UnicodeDecodeError:
+            report.add_error(lines.line_number, "o arquivo não está em UTF-8; leitura interrompida")
+        except csv.Error as e:
+            report.add_error(lines.line_number, f"CSV inválido: {e}; leitura interrompida")
+
+    if on_progress is not None:
+        on_progress(1.0, report.rows_read)
+    return records, report
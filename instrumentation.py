@@ -0,0 +1,243 @@
+# instrumentation.py
+# Instrumentação leve: cronômetros e contadores dos caminhos quentes e log estruturado (evento + campos).
+# Não importa Kivy: o engine, o storage e os benchmarks registram no mesmo log e nas mesmas estatísticas.
+
+import collections
+import datetime
+import functools
+import json
+import logging
+import logging.handlers
+import math
+import os
+import sys
+import threading
+import time
+
+
+# --- Cronômetros e contadores ---
+class TimerStats:
+    """Tempos de uma operação: totais desde o início e as últimas `window` amostras (para percentis)."""
+    __slots__ = ('count', 'total', 'min', 'max', 'last', 'recent')
+
+    def __init__(self, window=256):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+        self.recent = collections.deque(maxlen=window)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+        self.recent.append(seconds)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, fraction):
+        """Percentil das amostras recentes (ex.: 0.95), pelo método do posto mais próximo."""
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        rank = max(math.ceil(fraction * len(ordered)), 1)
+        return ordered[rank - 1]
+
+    def to_dict(self):
+        """Resumo em milissegundos."""
+        def ms(value):
+            return round(value * 1000, 3) if value is not None else None
+        return {'count': self.count, 'total_ms': ms(self.total), 'mean_ms': ms(self.mean),
+                'min_ms': ms(self.min), 'max_ms': ms(self.max), 'last_ms': ms(self.last),
+                'p95_ms': ms(self.percentile(0.95))}
+
+
+class _Timing:
+    """Context manager de PerfStats.time (uma classe simples custa menos que contextlib por chamada)."""
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = self.stats.clock()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stats.record(self.name, self.stats.clock() - self.start)
+        return False
+
+
+class PerfStats:
+    """Registro de cronômetros (operação -> TimerStats), contadores e medidas pontuais (gauges).
+
+    Pode ser usado de qualquer thread; o custo por medição é de poucos microssegundos, então
+    fica ligado sempre (o overlay e a exportação só leem o que já foi coletado).
+    """
+    def __init__(self, clock=time.perf_counter, window=256):
+        self.clock = clock
+        self.window = window
+        self.started_at = datetime.datetime.now()
+        self._lock = threading.Lock()
+        self.timers = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def time(self, name):
+        """Mede o bloco `with`: `with stats.time('save_data'): ...`."""
+        return _Timing(self, name)
+
+    def timed(self, name):
+        """Decorador que mede cada chamada da função com o nome `name`."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with _Timing(self, name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name, seconds):
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = TimerStats(self.window)
+            timer.add(seconds)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def last_ms(self, name):
+        """Duração da última medição de `name` em milissegundos (None se ainda não houve)."""
+        timer = self.timers.get(name)
+        return timer.last * 1000 if timer is not None and timer.last is not None else None
+
+    def snapshot(self):
+        """Cópia serializável em JSON de tudo que foi coletado."""
+        with self._lock:
+            return {'started_at': self.started_at.isoformat(),
+                    'taken_at': datetime.datetime.now().isoformat(),
+                    'timers': {name: timer.to_dict() for name, timer in sorted(self.timers.items())},
+                    'counters': dict(sorted(self.counters.items())),
+                    'gauges': dict(sorted(self.gauges.items()))}
+
+    def export(self, path):
+        """Grava o snapshot em JSON (via arquivo .tmp + renomeação) e o retorna."""
+        snapshot = self.snapshot()
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, path)
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self.started_at = datetime.datetime.now()
+            self.timers = {}
+            self.counters = {}
+            self.gauges = {}
+
+
+# Instância do processo: o app e os módulos sem interface registram aqui
+stats = PerfStats()
+
+
+# --- Log estruturado ---
+LOGGER_NAME = 'applembrete'
+_LEVEL_TAGS = {logging.DEBUG: 'DEBUG', logging.INFO: 'INFO ', logging.WARNING: 'WARNING',
+               logging.ERROR: 'ERROR', logging.CRITICAL: 'CRITICAL'}
+
+
+class ConsoleFormatter(logging.Formatter):
+    """Mantém o formato de console de sempre: `[INFO ] mensagem`."""
+    def format(self, record):
+        text = f"[{_LEVEL_TAGS.get(record.levelno, record.levelname)}] {record.getMessage()}"
+        if record.exc_info:
+            text += '\n' + self.formatException(record.exc_info)
+        return text
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Um objeto JSON por linha: hora, nível, componente, evento, mensagem e os campos do evento."""
+    def format(self, record):
+        entry = {'time': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+                 'level': record.levelname,
+                 'component': record.name.rpartition('.')[2],
+                 'event': getattr(record, 'event', None),
+                 'message': record.getMessage()}
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class EventLogger:
+    """Logger de um componente: cada linha tem um nome de evento estável e campos chave=valor.
+
+    A mensagem é o texto para quem lê o console; os campos vão para o arquivo JSONL (ver
+    `enable_log_file`) e permitem filtrar/agrupar o log sem interpretar o texto.
+    """
+    __slots__ = ('_logger',)
+
+    def __init__(self, component):
+        self._logger = logging.getLogger(f"{LOGGER_NAME}.{component}")
+
+    def log(self, level, event, message, **fields):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, message, extra={'event': event, 'fields': fields})
+
+    def debug(self, event, message, **fields):
+        self.log(logging.DEBUG, event, message, **fields)
+
+    def info(self, event, message, **fields):
+        self.log(logging.INFO, event, message, **fields)
+
+    def warning(self, event, message, **fields):
+        self.log(logging.WARNING, event, message, **fields)
+
+    def error(self, event, message, **fields):
+        self.log(logging.ERROR, event, message, **fields)
+
+
+def get_logger(component):
+    return EventLogger(component)
+
+
+def _configure_console():
+    root = logging.getLogger(LOGGER_NAME)
+    if root.handlers:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(ConsoleFormatter())
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    root.propagate = False # O Kivy configura o logger raiz com o próprio formato
+
+
+def enable_log_file(path, max_bytes=1_000_000, backup_count=3):
+    """Passa a gravar também o log estruturado em `path` (JSONL, com rotação por tamanho)."""
+    root = logging.getLogger(LOGGER_NAME)
+    for handler in root.handlers:
+        if isinstance(handler, logging.FileHandler) and handler.baseFilename == os.path.abspath(path):
+            return handler
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                   encoding='utf-8')
+    handler.setFormatter(JsonLinesFormatter())
+    root.addHandler(handler)
+    return handler
+
+
+_configure_console()
@@ -11,26 +11,67 @@ import datetime
 from kivy.uix.popup import Popup
 from kivy.uix.textinput import TextInput
 from kivy.graphics import Color, Rectangle
-from kivy.uix.scrollview import ScrollView
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
 from kivy.uix.screenmanager import ScreenManager, Screen, NoTransition
+from kivy.uix.scrollview import ScrollView
+from kivy.uix.spinner import Spinner
+from kivy.uix.checkbox import CheckBox
+from kivy.uix.floatlayout import FloatLayout
+from kivy.factory import Factory
+from kivy.core.window import Window
 
 # Import necessary modules for data persistence
-import json
+import importlib
 import os
 import sys
+import sqlite3
+import threading
+import time
+import unicodedata
+import weakref
+
+from engine import DEFAULT_TIMER_DURATION, ClientStore, GroupedOrder, SearchIndex, TimerEngine
+from instrumentation import enable_log_file, get_logger, stats
+from models import DEFAULT_PLAN, PLANS, plan_label
+from archive import RetentionPolicy, archive_file_name, write_archive
+from reminders import Reminder, ReminderDispatcher
+from storage import AutoSaveWorker, ClientDatabase
+
 
+log = get_logger('app')
 
-# --- Tenta importar Plyer ---
-try:
-    from plyer import calendar
-    PLYER_CALENDAR_AVAILABLE = True
-    print("[INFO ] Plyer Calendar module imported successfully.")
-except ImportError:
-    PLYER_CALENDAR_AVAILABLE = False
-    print("[WARNING] Plyer Calendar module not available. Install plyer (`pip install plyer`) for calendar integration.")
-except NotImplementedError:
-    PLYER_CALENDAR_AVAILABLE = False
-    print("[WARNING] Plyer Calendar backend not implemented for this platform.")
+
+# --- Plyer: importado no primeiro uso (lembrete ou notificação), fora da inicialização ---
+_plyer_modules = {} # nome -> módulo ou False (indisponível)
+_plyer_lock = threading.Lock()
+
+
+def _get_plyer_module(name):
+    """Importa `plyer.<name>` na primeira chamada; retorna None se não estiver disponível."""
+    with _plyer_lock:
+        if name not in _plyer_modules:
+            try:
+                module = getattr(importlib.import_module('plyer'), name)
+                _plyer_modules[name] = module
+                log.info('plyer_available', f"Plyer {name} module imported successfully.", module=name)
+            except ImportError:
+                _plyer_modules[name] = False
+                log.warning('plyer_missing', f"Plyer {name} module not available. Install plyer (`pip install plyer`) for {name} integration.",
+                            module=name)
+            except NotImplementedError:
+                _plyer_modules[name] = False
+                log.warning('plyer_unsupported', f"Plyer {name} backend not implemented for this platform.", module=name)
+        return _plyer_modules[name] or None
+
+
+def get_plyer_calendar():
+    return _get_plyer_module('calendar')
+
+
+def get_plyer_notification():
+    return _get_plyer_module('notification')
 # -----------------------------
 
 
@@ -38,25 +79,17 @@ except NotImplementedError:
 kivy.require('2.0.0')
 
 
-# --- Classe auxiliar para lidar com objetos datetime ao salvar/carregar JSON ---
-class DateTimeEncoder(json.JSONEncoder):
-    """Converte objetos datetime para strings ISO 8601 ao serializar para JSON."""
-    def default(self, obj):
-        if isinstance(obj, datetime.datetime):
-            return obj.isoformat()
-        return super().default(obj) # Let the base class default method raise the TypeError for other types
-
-def datetime_decoder(json_object):
-    """Converte strings ISO 8601 de volta para objetos datetime ao deserializar de JSON."""
-    for key, value in json_object.items():
-        if isinstance(value, str):
-            try:
-                # Tenta parsear a string como datetime ISO 8601
-                json_object[key] = datetime.datetime.fromisoformat(value)
-            except ValueError:
-                # Se falhar, mantém o valor como estava (pode não ser uma string de data)
-                pass
-    return json_object
+def create_calendar_event(reminder):
+    """Cria o evento de calendário de um lembrete via Plyer (executado numa thread do ReminderDispatcher)."""
+    calendar = get_plyer_calendar()
+    if calendar is None:
+        raise NotImplementedError("Plyer Calendar não disponível.")
+    calendar.create_event(
+        title=reminder.title,
+        description=reminder.description,
+        start_time=reminder.start_time,
+        end_time=reminder.start_time
+    )
 
 
 # --- Definição da Tela de Alerta ---
@@ -94,9 +127,234 @@ class AlertScreen(Screen):
         self.manager.current = 'main_screen'
 
 
+# --- Listas virtualizadas: só existem widgets para as linhas visíveis ---
+def build_client_recycle_view(viewclass, row_height):
+    """Cria um RecycleView vertical que recicla linhas do tipo `viewclass` com altura fixa."""
+    recycle_view = RecycleView(size_hint=(1, 1))
+    recycle_layout = RecycleBoxLayout(orientation='vertical', spacing=5, size_hint_y=None,
+                                      default_size=(None, row_height), default_size_hint=(1, None))
+    recycle_layout.bind(minimum_height=recycle_layout.setter('height'))
+    recycle_view.add_widget(recycle_layout)
+    recycle_view.viewclass = viewclass
+    return recycle_view
+
+
+def _bind_text_width(label, fraction=0.95):
+    """Faz o texto do rótulo quebrar na largura atual do próprio rótulo."""
+    label.bind(width=lambda instance, width: setattr(instance, 'text_size', (width * fraction, None)))
+
+
+def _build_select_checkbox(on_toggle):
+    """Caixa de marcação do modo de seleção; começa escondida (largura zero) no início da linha."""
+    checkbox = CheckBox(size_hint_x=0, opacity=0, disabled=True, color=(0, 0, 0, 1))
+    checkbox.client_data = None
+    # on_press só é disparado pelo toque: marcar ao reciclar a linha (refresh_view_attrs) não conta como seleção
+    checkbox.bind(on_press=lambda box: on_toggle(box.client_data, box.active))
+    return checkbox
+
+
+def _set_row_selection(row, selecting, selected):
+    """No modo de seleção, a caixa de marcação ocupa o lugar do número da linha."""
+    row.num_label.size_hint_x = 0 if selecting else row.num_width_hint
+    row.num_label.opacity = 0 if selecting else 1
+    row.select_checkbox.size_hint_x = row.num_width_hint if selecting else 0
+    row.select_checkbox.opacity = 1 if selecting else 0
+    row.select_checkbox.disabled = not selecting
+    row.select_checkbox.active = selected
+
+
+class ActiveClientRow(RecycleDataViewBehavior, BoxLayout):
+    """Linha reciclável da lista ATIVA; é reaproveitada para outro cliente ao rolar a lista."""
+    num_width_hint = 0.1
+
+    def __init__(self, **kwargs):
+        super().__init__(orientation='horizontal', spacing=5, padding=5, **kwargs)
+        self.client = None
+
+        self.select_checkbox = _build_select_checkbox(
+            lambda client, selected: App.get_running_app().set_active_selected(client, selected))
+        self.num_label = Label(text="", font_size=18, size_hint_x=self.num_width_hint, halign='right', valign='middle', color=(0,0,0,1))
+
+        # Detalhes (Nome, MAC, Senha)
+        details_layout = BoxLayout(orientation='vertical', spacing=2, size_hint_x=0.42)
+        self.nome_label = Label(font_size=15, halign='left', valign='top', color=(0,0,0,1))
+        self.mac_label = Label(font_size=15, halign='left', valign='middle', color=(0,0,0,1))
+        self.senha_label = Label(font_size=15, halign='left', valign='bottom', color=(0,0,0,1))
+        for detail_label in (self.nome_label, self.mac_label, self.senha_label):
+            _bind_text_width(detail_label)
+            details_layout.add_widget(detail_label)
+
+        self.timer_label = Label(text="Timer: --:--:--", font_size=16, size_hint_x=0.3, halign='center', valign='middle', color=(0,0,0,1))
+        self.timer_label.client_deadline = None
+        self.timer_label.client_id = None
+        self.timer_label.is_timer_label = True
+
+        # Renovar/estender o timer deste cliente
+        self.renew_button = Button(text='+', font_size=20, size_hint_x=0.08, background_color=(0, 0.6, 0, 1))
+        self.renew_button.client_data = None
+        self.renew_button.bind(on_press=lambda button: App.get_running_app().show_renew_popup(button))
+
+        self.delete_button = Button(text='X', font_size=18, size_hint_x=0.1, background_color=(1, 0, 0, 1))
+        self.delete_button.client_data = None
+        # Este botão chama o popup que MOVE para a lista de vencidos
+        self.delete_button.bind(on_press=lambda button: App.get_running_app().show_delete_confirmation_popup(button))
+
+        self.add_widget(self.select_checkbox)
+        self.add_widget(self.num_label)
+        self.add_widget(details_layout)
+        self.add_widget(self.timer_label)
+        self.add_widget(self.renew_button)
+        self.add_widget(self.delete_button)
+
+        # Registra o rótulo para a atualização periódica dos timers
+        App.get_running_app().active_timer_labels.add(self.timer_label)
+
+    def refresh_view_attrs(self, rv, index, data):
+        """Preenche a linha com os dados do cliente na posição `index` (numeração sempre atual)."""
+        client = data['client']
+        app = App.get_running_app()
+        # Numeração contínua entre os grupos (os cabeçalhos não contam)
+        self.num_label.text = f"{app.active_order.group_at(index)[1]}."
+        self.nome_label.text = f"Nome: {client.nome or 'N/A'}"
+        self.mac_label.text = f"MAC: {client.mac or 'N/A'}"
+        self.senha_label.text = f"Senha: {client.senha or 'N/A'}  |  Plano: {plan_label(client.plan)}"
+        self.timer_label.client_deadline = client.deadline
+        self.timer_label.client_id = client.id
+        self.renew_button.client_data = client
+        self.delete_button.client_data = client
+        self.select_checkbox.client_data = client
+        _set_row_selection(self, app.selecting_active, client.id in app.selected_active)
+        app.refresh_timer_label(self.timer_label, datetime.datetime.now())
+        app.apply_warning_badge(self.timer_label)
+        return super().refresh_view_attrs(rv, index, data)
+
+
+class ActiveGroupHeader(RecycleDataViewBehavior, Label):
+    """Cabeçalho de grupo da lista ATIVA (ex.: "Vencem em até 1 h"); o texto vem do item de dados."""
+    def __init__(self, **kwargs):
+        super().__init__(font_size=16, bold=True, halign='left', valign='middle', color=(0.2, 0.2, 0.2, 1), **kwargs)
+        _bind_text_width(self)
+
+
+# Os itens de dados escolhem a classe da linha pelo nome (chave 'viewclass')
+Factory.register('ActiveGroupHeader', cls=ActiveGroupHeader)
+
+
+class ExpiredClientRow(RecycleDataViewBehavior, BoxLayout):
+    """Linha reciclável (horizontal) da lista de VENCIDOS/EXCLUÍDOS."""
+    # Proporções: Num (0.1) | Nome (0.16) | MAC (0.16) | Senha (0.16) | Status (0.24) | Renovar (0.08) | Delete (0.1) = 1.0
+    num_width_hint = 0.1
+    detail_width_hint = 0.16
+    status_width_hint = 0.24
+    renew_width_hint = 0.08
+    delete_width_hint = 0.1
+
+    def __init__(self, **kwargs):
+        super().__init__(orientation='horizontal', spacing=5, padding=5, **kwargs)
+        self.client = None
+
+        self.select_checkbox = _build_select_checkbox(
+            lambda client, selected: App.get_running_app().set_expired_selected(client, selected))
+        self.num_label = Label(text="", font_size=15, size_hint_x=self.num_width_hint, halign='right', valign='middle', color=(0,0,0,1))
+        self.nome_label = Label(font_size=14, size_hint_x=self.detail_width_hint, halign='left', valign='middle', color=(0,0,0,1))
+        self.mac_label = Label(font_size=14, size_hint_x=self.detail_width_hint, halign='left', valign='middle', color=(0,0,0,1))
+        self.senha_label = Label(font_size=14, size_hint_x=self.detail_width_hint, halign='left', valign='middle', color=(0,0,0,1))
+
+        # Rótulo para exibir o STATUS (VENCIDO ou EXCLUÍDO MANUALMENTE) com fundo colorido
+        self.status_label = Label(font_size=16, size_hint_x=self.status_width_hint, halign='center', valign='middle',
+                                  markup=True)
+        with self.status_label.canvas.before:
+            self.status_bg_color = Color(0, 0, 0, 0)
+            self.status_bg_rect = Rectangle(pos=self.status_label.pos, size=self.status_label.size)
+        self.status_label.bind(pos=self.update_status_rect, size=self.update_status_rect)
+
+        for text_label in (self.nome_label, self.mac_label, self.senha_label, self.status_label):
+            _bind_text_width(text_label)
+
+        self.delete_button = Button(text='X', font_size=18, size_hint_x=self.delete_width_hint, background_color=(1, 0, 0, 1))
+        self.delete_button.client_data = None
+        # Este botão chama o popup que EXCLUI PERMANENTEMENTE
+        self.delete_button.bind(on_press=lambda button: App.get_running_app().show_expired_delete_confirmation_popup(button))
+
+        self.add_widget(self.select_checkbox)
+        self.add_widget(self.num_label)
+        self.add_widget(self.nome_label)
+        self.add_widget(self.mac_label)
+        self.add_widget(self.senha_label)
+        # Renovar/estender devolve o cliente à lista ativa
+        self.renew_button = Button(text='+', font_size=20, size_hint_x=self.renew_width_hint, background_color=(0, 0.6, 0, 1))
+        self.renew_button.client_data = None
+        self.renew_button.bind(on_press=lambda button: App.get_running_app().show_renew_popup(button))
+
+        self.add_widget(self.status_label)
+        self.add_widget(self.renew_button)
+        self.add_widget(self.delete_button)
+
+    def update_status_rect(self, instance, value):
+        """Atualiza a posição e tamanho do retângulo de fundo do rótulo de status."""
+        self.status_bg_rect.pos = instance.pos
+        self.status_bg_rect.size = instance.size
+
+    def refresh_view_attrs(self, rv, index, data):
+        """Preenche a linha com os dados do cliente na posição `index`."""
+        client = data['client']
+        self.num_label.text = f"{index + 1}."
+        self.nome_label.text = f"Nome: {client.nome or 'N/A'}"
+        self.mac_label.text = f"MAC: {client.mac or 'N/A'}"
+        self.senha_label.text = f"Senha: {client.senha or 'N/A'}"
+
+        client_status = client.status
+        if client_status == 'expired':
+            status_text = "VENCIDO"
+            self.status_bg_color.rgba = (1, 0, 0, 1)
+            self.status_label.color = (1, 1, 1, 1)
+        elif client_status == 'deleted_manual':
+            status_text = "EXCLUÍDO"
+            self.status_bg_color.rgba = (0.7, 0.7, 0.7, 1) # Fundo cinza claro
+            self.status_label.color = (0, 0, 0, 1)
+        else:
+            status_text = ""
+            self.status_bg_color.rgba = (0, 0, 0, 0)
+            self.status_label.color = (0, 0, 0, 1)
+        self.status_label.text = f"[b]{status_text}[/b]"
+
+        self.renew_button.client_data = client
+        self.delete_button.client_data = client
+        app = App.get_running_app()
+        self.select_checkbox.client_data = client
+        _set_row_selection(self, app.selecting_expired, client.id in app.selected_expired)
+        return super().refresh_view_attrs(rv, index, data)
+
+
+# --- Modo de seleção: barra de ações em lote que substitui os botões da tela ---
+def build_selection_bar(on_delete, on_select_all, on_cancel):
+    """Cria a barra 'Excluir selecionados / Todos / Cancelar'; retorna (barra, botão de excluir)."""
+    selection_layout = BoxLayout(orientation='horizontal', spacing=10, size_hint_y=None, height=60)
+    delete_button = Button(text='Excluir selecionados (0)', font_size=20, background_color=(1, 0, 0, 1))
+    delete_button.bind(on_press=on_delete)
+    select_all_button = Button(text='Todos', font_size=20)
+    select_all_button.bind(on_press=on_select_all)
+    cancel_button = Button(text='Cancelar', font_size=20)
+    cancel_button.bind(on_press=on_cancel)
+    selection_layout.add_widget(delete_button)
+    selection_layout.add_widget(select_all_button)
+    selection_layout.add_widget(cancel_button)
+    return selection_layout, delete_button
+
+
+def show_selection_bar(layout, buttons_layout, selection_layout, selecting):
+    """Troca, na mesma posição de `layout`, a barra de botões normal pela de seleção (ou o contrário)."""
+    current, replacement = (buttons_layout, selection_layout) if selecting else (selection_layout, buttons_layout)
+    if current.parent is None:
+        return
+    index = layout.children.index(current)
+    layout.remove_widget(current)
+    layout.add_widget(replacement, index=index)
+
+
 # --- Definição da Segunda Tela (Vencidos) ---
 class ExpiredScreen(Screen):
-    expired_clients_list_layout = None
+    expired_clients_list_view = None
     expired_clients_box_layout = None
 
 
@@ -109,6 +367,15 @@ class ExpiredScreen(Screen):
                                        font_size=30, size_hint_y=None, height=50,
                                        halign='center', valign='middle'))
 
+        # Busca por nome/MAC e filtro de status (aplicados com debounce pelo app)
+        filter_layout = BoxLayout(orientation='horizontal', spacing=10, size_hint_y=None, height=40)
+        self.search_input = TextInput(hint_text='Buscar por nome ou MAC', multiline=False, size_hint_x=0.7)
+        self.status_spinner = Spinner(text='Todos', values=('Todos', 'Vencidos', 'Excluídos'), size_hint_x=0.3)
+        self.search_input.bind(text=lambda instance, text: App.get_running_app().request_expired_filter())
+        self.status_spinner.bind(text=lambda instance, text: App.get_running_app().request_expired_filter())
+        filter_layout.add_widget(self.search_input)
+        filter_layout.add_widget(self.status_spinner)
+        expired_main_layout.add_widget(filter_layout)
 
         self.expired_clients_box_layout = BoxLayout(orientation='vertical',
                                                     padding=10, spacing=5,
@@ -122,29 +389,55 @@ class ExpiredScreen(Screen):
         self.expired_clients_box_layout.bind(pos=self.update_red_list_rect, size=self.update_red_list_rect)
 
 
-        expired_list_scrollview = ScrollView(size_hint=(1, 1))
+        # Lista virtualizada: apenas as linhas visíveis têm widgets, reciclados ao rolar
+        self.expired_clients_list_view = build_client_recycle_view(ExpiredClientRow, row_height=40)
 
-        self.expired_clients_list_layout = BoxLayout(orientation='vertical', spacing=5, size_hint_y=None)
-        self.expired_clients_list_layout.bind(minimum_height=self.expired_clients_list_layout.setter('height'))
-
-        expired_list_scrollview.add_widget(self.expired_clients_list_layout)
-
-        self.expired_clients_box_layout.add_widget(expired_list_scrollview)
+        self.expired_clients_box_layout.add_widget(self.expired_clients_list_view)
 
         expired_main_layout.add_widget(self.expired_clients_box_layout)
 
 
+        expired_buttons_layout = BoxLayout(orientation='horizontal', spacing=10,
+                                           size_hint=(None, None), size=(630, 60),
+                                           pos_hint={'center_x': 0.5})
+
         back_button = Button(text='Voltar',
-                             font_size=20,
-                             size_hint=(None, None),
-                             size=(150, 60),
-                             pos_hint={'center_x': 0.5})
+                             font_size=20)
 
         back_button.bind(on_press=self.go_back_to_main)
-        expired_main_layout.add_widget(back_button)
+
+        # Exporta todo o histórico (sem removê-lo) para um arquivo CSV compactado
+        export_button = Button(text='Exportar',
+                               font_size=20)
+        export_button.bind(on_press=lambda button: App.get_running_app().export_expired_history())
+
+        # Ações em lote: selecionar linhas ou limpar o histórico (tudo ou só os mais antigos)
+        select_button = Button(text='Selecionar',
+                               font_size=20)
+        select_button.bind(on_press=lambda button: App.get_running_app().set_expired_selection_mode(True))
+        purge_button = Button(text='Limpar...',
+                              font_size=20)
+        purge_button.bind(on_press=lambda button: App.get_running_app().show_purge_popup())
+
+        expired_buttons_layout.add_widget(back_button)
+        expired_buttons_layout.add_widget(export_button)
+        expired_buttons_layout.add_widget(select_button)
+        expired_buttons_layout.add_widget(purge_button)
+        expired_main_layout.add_widget(expired_buttons_layout)
+
+        # Barra do modo de seleção: substitui os botões acima enquanto estiver ativa
+        self.expired_buttons_layout = expired_buttons_layout
+        self.selection_layout, self.selection_delete_button = build_selection_bar(
+            on_delete=lambda button: App.get_running_app().confirm_purge_selected(),
+            on_select_all=lambda button: App.get_running_app().select_all_expired(),
+            on_cancel=lambda button: App.get_running_app().set_expired_selection_mode(False))
+        self.expired_main_layout = expired_main_layout
 
         self.add_widget(expired_main_layout)
 
+    def show_selection_bar(self, selecting):
+        show_selection_bar(self.expired_main_layout, self.expired_buttons_layout, self.selection_layout, selecting)
+
     def update_red_list_rect(self, instance, value):
         self.red_list_rect.pos = instance.pos
         self.red_list_rect.size = instance.size
@@ -154,24 +447,127 @@ class ExpiredScreen(Screen):
         self.manager.current = 'main_screen'
 
 
+# --- Overlay de desempenho (depuração): medidas do instrumentation.stats sobre a interface ---
+class PerfOverlay(BoxLayout):
+    """Caixa semitransparente no canto da tela com as medidas recentes e um botão de exportação."""
+    def __init__(self, **kwargs):
+        super().__init__(orientation='vertical', size_hint=(None, None), size=(300, 170),
+                         pos_hint={'right': 1, 'top': 1}, padding=5, spacing=5, **kwargs)
+        with self.canvas.before:
+            Color(0, 0, 0, 0.6)
+            self.background_rect = Rectangle(pos=self.pos, size=self.size)
+        self.bind(pos=self.update_background_rect, size=self.update_background_rect)
+
+        self.stats_label = Label(text='', font_size=13, halign='left', valign='top')
+        self.stats_label.bind(size=lambda instance, size: setattr(instance, 'text_size', size))
+        export_button = Button(text='Exportar estatísticas', font_size=14, size_hint_y=None, height=35)
+        export_button.bind(on_press=lambda button: App.get_running_app().export_perf_stats())
+        self.add_widget(self.stats_label)
+        self.add_widget(export_button)
+
+    def update_background_rect(self, instance, value):
+        self.background_rect.pos = instance.pos
+        self.background_rect.size = instance.size
+
+
 # --- Definição da Aplicação Principal ---
 class MobileApp(App):
-    clients_list = [] # Lista de clientes ATIVOS
-    expired_clients_list = [] # Lista de clientes VENCIDOS
-    total_timer_duration = datetime.timedelta(hours=23, minutes=55)
-    active_timer_labels = [] # Lista para manter referências aos rótulos de timer ativos
+    total_timer_duration = DEFAULT_TIMER_DURATION
+    # Histórico de vencidos mantido no banco; o restante vai para arquivos .jsonl.gz em user_data_dir/archive
+    expired_retention = RetentionPolicy(max_age=datetime.timedelta(days=90), max_count=2000)
+    store = None # ClientStore: clientes, índice de duplicidade e banco (sem Kivy)
+    engine = None # TimerEngine: agendamento da expiração sobre o store
+    active_timer_labels = None # Rótulos de timer das linhas ATIVAS já criadas (WeakSet)
+    _tick_event = None # Próximo tick da UI (hora + timers)
+    _paused = False
+    active_rows = {} # client.id -> item de dados da lista ATIVA no RecycleView
+    expired_rows = {} # client.id -> item de dados das páginas já carregadas da lista VENCIDA
+    expired_page_size = 50 # Linhas do histórico lidas do banco por vez
+    expired_list_loaded = False # A lista VENCIDA só tem dados enquanto a tela de vencidos está aberta
+    _expired_cursor = None # Chave da próxima página do histórico (None: não há mais)
+    search_debounce = 0.25 # Segundos sem digitar antes de aplicar a busca
+    # Opções de extensão oferecidas no popup de renovação
+    extension_options = (('+1 hora', datetime.timedelta(hours=1)),
+                         ('+1 dia', datetime.timedelta(days=1)),
+                         ('+7 dias', datetime.timedelta(days=7)))
+    active_filter = '' # Texto da busca na lista ATIVA
+    expired_filter = '' # Texto da busca na lista VENCIDA
+    expired_status_filter = None # None, 'expired' ou 'deleted_manual'
+    _expired_filter_ids = None # Resultado da busca no histórico (ids); as páginas saem dele
+    _expired_filter_offset = 0
+    _expiry_event = None # Evento único do Clock armado para o próximo prazo de expiração
+    # Acúmulo de vencidos (ex.: depois de uma suspensão) processado em fatias, sem travar a interface
+    expiry_chunk_size = 50 # Eventos retirados da roda de tempo por vez
+    expiry_frame_budget = 0.008 # Segundos de processamento por quadro antes de devolver o controle ao Kivy
+    reminder_summary_min = 3 # A partir de quantos vencidos juntos os lembretes viram um único resumo
+    clock_jump_tolerance = 2.0 # Segundos de diferença entre o relógio de parede e o monotônico
+    _catch_up = None # Processamento em fatias em andamento: vencidos e avisos acumulados
+    _clock_base = None # (monotônico, parede) do último tick, para perceber saltos do relógio
+    _import_thread = None # Leitura do arquivo de importação em andamento
+    _archive_thread = None # Gravação de um arquivo de arquivamento (retenção) em andamento
+    data_loaded = False # Os clientes são carregados numa thread depois que a tela principal aparece
+    autosave_delay = 0.5 # Segundos sem novas alterações antes do commit em segundo plano
+    # Modo de seleção (ações em lote) de cada lista: ids dos clientes marcados
+    selecting_active = False
+    selecting_expired = False
+    selected_active = set()
+    selected_expired = set()
+    purge_default_days = 30 # Sugestão inicial de "Limpar mais antigos que N dias"
+    # Avisos antes do vencimento (selo na linha + notificação), para oferecer a renovação a tempo
+    warning_offsets = (datetime.timedelta(hours=1), datetime.timedelta(minutes=15), datetime.timedelta(minutes=1))
+    warning_colors = {'soon': (0.85, 0.45, 0, 1), 'imminent': (0.8, 0, 0, 1)}
+    # Ordenação e grupos da lista ATIVA: (chave, rótulo no seletor)
+    active_sort_modes = (('created', 'Cadastro'), ('time', 'Tempo restante'), ('name', 'Nome'))
+    active_sort_mode = 'created'
+    active_order = None # GroupedOrder dos clientes mostrados na lista ATIVA, no modo atual
+    active_group_height = 30
+    _save_failed = False
+    _load_thread = None
+    # Overlay de desempenho: APPLEMBRETE_PERF_OVERLAY=1 o mostra ao abrir; F12 liga/desliga
+    perf_overlay_enabled = os.environ.get('APPLEMBRETE_PERF_OVERLAY') == '1'
+    perf_overlay = None
+    _perf_overlay_event = None
 
 
     def build(self):
+        self._build_started = stats.clock()
         self.sm = ScreenManager(transition=NoTransition())
 
-        # >>>>> Configura o caminho do arquivo de dados <<<<<
-        self.save_file_path = os.path.join(self.user_data_dir, 'client_data.json')
-        print(f"[INFO ] User data directory: {self.user_data_dir}")
-        print(f"[INFO ] Save file path: {self.save_file_path}")
-
-        # >>>>> Carrega os dados ao iniciar <<<<<
-        self.load_data()
+        # >>>>> Configura o caminho do banco de dados <<<<<
+        self.database_path = os.path.join(self.user_data_dir, 'client_data.db')
+        self.legacy_json_path = os.path.join(self.user_data_dir, 'client_data.json')
+        self.archive_dir = os.path.join(self.user_data_dir, 'archive')
+        self.export_dir = os.path.join(self.user_data_dir, 'exports')
+        self.log_path = os.path.join(self.user_data_dir, 'logs', 'applembrete.jsonl')
+        try:
+            enable_log_file(self.log_path)
+        except OSError as e:
+            log.error('log_file_failed', f"Failed to open log file {self.log_path}: {e}", error=str(e))
+        log.info('app_paths', f"User data directory: {self.user_data_dir}", user_data_dir=self.user_data_dir)
+        log.info('app_paths', f"Database path: {self.database_path}", database_path=self.database_path)
+        # A conexão é usada primeiro pela thread de carga e, depois de on_data_loaded, só pela thread da UI
+        self.database = ClientDatabase(self.database_path, check_same_thread=False)
+        self.database.start_background_checkpoints()
+        # Commits em segundo plano: cada ação só pede a gravação e as rajadas viram um único commit
+        self.autosave = AutoSaveWorker(self.database, self._deliver_autosave_result, delay=self.autosave_delay)
+        self.autosave.start()
+        self.store = ClientStore(self.database, self.total_timer_duration)
+        self.engine = TimerEngine(self.store, warning_offsets=self.warning_offsets)
+
+        # --- Registro de linhas (itens de dados dos RecycleViews, por identidade do cliente) ---
+        self.active_timer_labels = weakref.WeakSet()
+        self.active_rows = {}
+        self.expired_rows = {}
+        self.selected_active = set()
+        self.selected_expired = set()
+        self.active_empty_label = Label(text='Nenhum cliente ATIVO cadastrado.',
+                                        halign='center', valign='middle', size_hint_y=None, height=100, color=(0,0,0,1))
+        self.expired_empty_label = Label(text='Nenhum cliente VENCIDO ou EXCLUÍDO ainda.',
+                                         halign='center', valign='middle', size_hint_y=None, height=100, color=(0,0,0,1))
+
+        # --- Busca: cada tecla só rearma o gatilho; as linhas são refeitas uma vez, após a pausa ---
+        self._active_filter_trigger = Clock.create_trigger(self.apply_active_filter, self.search_debounce)
+        self._expired_filter_trigger = Clock.create_trigger(self.apply_expired_filter, self.search_debounce)
 
         # --- Cria a Tela Principal (contém a lista ATIVA) ---
         main_screen = Screen(name='main_screen')
@@ -185,6 +581,20 @@ class MobileApp(App):
                                 size_hint_y=0.1)
 
 
+        # Busca na lista ATIVA: o filtro só é aplicado quando a digitação pausa
+        self.active_search_input = TextInput(hint_text='Buscar por nome ou MAC', multiline=False,
+                                             size_hint_y=None, height=40)
+        self.active_search_input.bind(text=lambda instance, text: self._active_filter_trigger())
+        sort_labels = dict(self.active_sort_modes)
+        sort_keys = {label: key for key, label in self.active_sort_modes}
+        self.active_sort_spinner = Spinner(text=sort_labels[self.active_sort_mode], values=list(sort_keys), size_hint_x=0.3)
+        self.active_sort_spinner.bind(text=lambda instance, text: self.set_active_sort_mode(sort_keys[text]))
+        self.active_search_input.size_hint_x = 0.7
+        active_filter_layout = BoxLayout(orientation='horizontal', spacing=10, size_hint_y=None, height=40)
+        active_filter_layout.add_widget(self.active_search_input)
+        active_filter_layout.add_widget(self.active_sort_spinner)
+
+
         # Seção 2: Caixa Cinza para CONTENER a lista rolável de TODOS os Clientes ATIVOS
         self.all_clients_box_layout = BoxLayout(orientation='vertical',
                                                 size_hint_y=0.55,
@@ -196,22 +606,22 @@ class MobileApp(App):
                                               size=self.all_clients_box_layout.size)
         self.all_clients_box_layout.bind(pos=self.update_all_rect, size=self.update_all_rect)
 
-        self.client_list_scrollview = ScrollView(size_hint=(1, 1))
-        self.client_list_layout = BoxLayout(orientation='vertical', spacing=5, size_hint_y=None)
-        self.client_list_layout.bind(minimum_height=self.client_list_layout.setter('height'))
-
-        self.client_list_scrollview.add_widget(self.client_list_layout)
-        self.all_clients_box_layout.add_widget(self.client_list_scrollview)
+        # Lista virtualizada: apenas as linhas visíveis têm widgets, reciclados ao rolar
+        self.client_list_view = build_client_recycle_view(ActiveClientRow, row_height=100)
+        self.client_list_view.key_viewclass = 'viewclass' # Cabeçalhos de grupo entre as linhas
+        self.active_order = self.build_active_order(())
+        self.all_clients_box_layout.add_widget(self.client_list_view)
 
 
         # Seção 3: Rótulo de Feedback e Botões
-        self.info_label = Label(text='Use o botão abaixo para adicionar clientes',
+        self.info_label = Label(text='Carregando clientes...',
                                  font_size=20,
                                  halign='center',
                                  valign='middle',
                                  size_hint_y=0.1)
 
-        main_buttons_layout = BoxLayout(orientation='horizontal', spacing=10, size_hint_y=None, height=60)
+        self.main_buttons_layout = main_buttons_layout = BoxLayout(orientation='horizontal', spacing=10,
+                                                                   size_hint_y=None, height=60)
 
         # >>>>> REMOVIDO: Botão Mudar Texto Info <<<<<
         # change_text_button = Button(text='Mudar Texto Info', font_size=20)
@@ -220,49 +630,72 @@ class MobileApp(App):
         open_add_client_button = Button(text='Adicionar Novo Cliente', font_size=20)
         open_add_client_button.bind(on_press=self.show_add_client_popup)
 
+        import_clients_button = Button(text='Importar', font_size=20)
+        import_clients_button.bind(on_press=self.show_import_popup)
+
         expired_clients_button = Button(text='Vencidos', font_size=20)
         expired_clients_button.bind(on_press=self.go_to_expired_screen)
 
+        select_clients_button = Button(text='Selecionar', font_size=20)
+        select_clients_button.bind(on_press=lambda button: self.set_active_selection_mode(True))
+
 
         # >>>>> REMOVIDO: Adição do botão Mudar Texto Info <<<<<
         # main_buttons_layout.add_widget(change_text_button) # Opcional
         main_buttons_layout.add_widget(open_add_client_button)
+        main_buttons_layout.add_widget(import_clients_button)
         main_buttons_layout.add_widget(expired_clients_button)
+        main_buttons_layout.add_widget(select_clients_button)
+
+        # Barra do modo de seleção da lista ATIVA (entra no lugar dos botões acima)
+        self.active_selection_layout, self.active_selection_delete_button = build_selection_bar(
+            on_delete=lambda button: self.confirm_delete_selected(),
+            on_select_all=lambda button: self.select_all_active(),
+            on_cancel=lambda button: self.set_active_selection_mode(False))
 
 
         main_layout.add_widget(self.time_label)
+        main_layout.add_widget(active_filter_layout)
         main_layout.add_widget(self.all_clients_box_layout) # Caixa cinza com a lista ATIVA
         main_layout.add_widget(self.info_label)
         main_layout.add_widget(main_buttons_layout)
+        self.main_layout = main_layout
 
         main_screen.add_widget(main_layout)
 
-        # --- Cria a Segunda Tela (Vencidos - contem a lista VENCIDA) ---
-        expired_screen = ExpiredScreen(name='expired_screen')
-
-        # --- Cria a Tela de Alerta ---
-        alert_screen = AlertScreen(name='alert_screen')
+        # --- Só a tela principal é criada agora; as de vencidos e de alerta, no primeiro uso ---
+        self.sm.add_widget(main_screen)
 
+        # Até os dados chegarem, a lista fica vazia e as ações que dependem dela, desabilitadas
+        self.active_empty_label.text = 'Carregando clientes...'
+        self._sync_empty_label(self.all_clients_box_layout, self.active_empty_label, True)
+        self.active_search_input.disabled = True
+        self.active_sort_spinner.disabled = True
+        self.main_buttons_layout.disabled = True
 
-        # --- Adiciona as telas ao ScreenManager ---
-        self.sm.add_widget(main_screen)
-        self.sm.add_widget(expired_screen)
-        self.sm.add_widget(alert_screen)
 
+        # --- Lembretes de calendário em segundo plano ---
+        self.reminder_dispatcher = ReminderDispatcher(create_calendar_event, self._deliver_reminder_results)
+        self.reminder_dispatcher.start()
 
         # --- Inicialização e Agendamento ---
-        self.update_time()
-        Clock.schedule_interval(self.update_time, 1)
-
-        # >>>>> Atualiza as exibições APÓS carregar os dados <<<<<
-        self.update_client_list_display()
-        self.update_expired_list_display()
+        # Um único tick por segundo atualiza a hora e os timers; só roda com a tela principal visível.
+        self.sm.bind(current=self.on_current_screen)
+        self.start_ui_tick()
 
-        # O timer está agendado para rodar a cada segundo.
-        Clock.schedule_interval(self.update_timers, 1)
+        # >>>>> Carrega os dados numa thread; a lista e a expiração são montadas em on_data_loaded <<<<<
+        self.start_loading()
 
+        # --- Overlay de desempenho sobre todas as telas ---
+        root = FloatLayout()
+        root.add_widget(self.sm)
+        Window.bind(on_key_down=self.on_key_down)
+        if self.perf_overlay_enabled:
+            self.perf_overlay_enabled = False
+            Clock.schedule_once(lambda dt: self.toggle_perf_overlay())
 
-        return self.sm
+        stats.record('build', stats.clock() - self._build_started)
+        return root
 
     # >>>>> REMOVIDO: Método on_change_text_button_press <<<<<
     # def on_change_text_button_press(self, instance):
@@ -271,94 +704,249 @@ class MobileApp(App):
     #     print("Change text button was pressed!")
 
 
-    # >>>>> Método para salvar os dados <<<<<
+    @property
+    def active_clients(self):
+        """Clientes ATIVOS (client.id -> Client), mantidos pelo ClientStore."""
+        return self.store.active_clients
+
+
+    # --- Carga inicial fora da thread da UI ---
+    def start_loading(self):
+        """Carrega os clientes, aplica a retenção e monta o agendador numa thread (o custo cresce com os dados)."""
+        def run():
+            try:
+                self.load_data()
+                self.apply_retention()
+                self.engine.rebuild()
+            finally:
+                Clock.schedule_once(lambda dt: self.on_data_loaded())
+
+        self._load_thread = threading.Thread(target=run, name='client-load', daemon=True)
+        self._load_thread.start()
+
+    def on_data_loaded(self):
+        """Na thread da UI: mostra a lista ATIVA, arma a expiração e libera as ações da tela principal."""
+        self._load_thread = None
+        self.data_loaded = True
+        self.update_client_list_display()
+        self.active_search_input.disabled = False
+        self.active_sort_spinner.disabled = False
+        self.main_buttons_layout.disabled = False
+        self.info_label.text = 'Use o botão abaixo para adicionar clientes'
+        self.resubmit_pending_reminders()
+        if not self._paused:
+            self.arm_expiry_timer()
+        stats.record('startup_to_data', stats.clock() - self._build_started)
+
+    # >>>>> Gravação: pedida a cada alteração, feita pelo AutoSaveWorker fora da thread da UI <<<<<
+    def request_save(self):
+        """Agenda o commit das alterações já escritas no banco (não bloqueia a interface)."""
+        if self.data_loaded:
+            self.autosave.request()
+
+    def _deliver_autosave_result(self, pending, seconds, error):
+        """Chamado na thread do AutoSaveWorker: repassa o resultado do commit para a thread da UI."""
+        Clock.schedule_once(lambda dt: self.on_autosave_result(pending, error))
+
+    def on_autosave_result(self, pending, error):
+        """Informa no info_label uma falha de gravação e, depois dela, quando as alterações foram salvas."""
+        if error is not None:
+            self._save_failed = True
+            self.info_label.text = f"Erro ao salvar as alterações: {error}"
+        elif self._save_failed:
+            self._save_failed = False
+            self.info_label.text = "Alterações salvas."
+
+    @stats.timed('save_data')
     def save_data(self):
-        """Salva as listas de clientes ativos e vencidos em um arquivo JSON."""
-        data_to_save = {
-            'active': self.clients_list,
-            'expired': self.expired_clients_list
-        }
+        """Grava imediatamente, na thread atual, as alterações pendentes (ao pausar ou fechar o app)."""
+        if not self.data_loaded:
+            return # A thread de carga ainda está usando a conexão
         try:
-            # Garante que o diretório de dados existe antes de salvar
-            os.makedirs(self.user_data_dir, exist_ok=True)
-            with open(self.save_file_path, 'w') as f:
-                # Usa a classe customizada DateTimeEncoder para serializar datetime
-                json.dump(data_to_save, f, indent=4, cls=DateTimeEncoder)
-            print(f"[INFO ] Data saved successfully to {self.save_file_path}")
-        except Exception as e:
-            print(f"[ERROR] Failed to save data: {e}")
+            self.autosave.flush()
+        except sqlite3.Error as e:
+            log.error('save_failed', f"Failed to save data: {e}", error=str(e))
 
 
     # >>>>> Método para carregar os dados <<<<<
+    @stats.timed('load_data')
     def load_data(self):
-        """Carrega as listas de clientes ativos e vencidos de um arquivo JSON."""
-        self.clients_list = [] # Inicia com listas vazias
-        self.expired_clients_list = []
-        if os.path.exists(self.save_file_path):
+        """Carrega as listas de clientes ativos e vencidos do banco SQLite (migrando o antigo JSON na primeira vez)."""
+        try:
+            self.store.load(self.legacy_json_path)
+            log.info('data_loaded', f"Data loaded successfully from {self.database_path}",
+                     active=len(self.store.active_clients), ended=self.store.ended_count)
+        except sqlite3.Error as e:
+             log.error('load_failed', f"Failed to load data from {self.database_path}: {e}. Starting with empty lists.",
+                       error=str(e))
+             self.store.active_clients = {}
+
+
+    # >>>>> Retenção do histórico: os vencidos mais antigos vão para arquivos compactados <<<<<
+    def apply_retention(self):
+        """Arquiva os vencidos/excluídos fora da política de retenção; retorna quantos saíram do banco."""
+        try:
+            path, count = self.store.archive_expired(self.expired_retention, self.archive_dir)
+        except (OSError, sqlite3.Error) as e:
+            log.error('archive_failed', f"Failed to archive expired clients: {e}", error=str(e))
+            return 0
+        return count
+
+    def start_retention(self):
+        """Na thread da UI: escolhe os vencidos a arquivar e grava o arquivo (gzip + fsync) numa thread.
+
+        O banco só muda em `finish_retention`, de volta na thread da UI, depois que o arquivo está completo.
+        """
+        if self._archive_thread is not None:
+            return
+        try:
+            selected = self.store.select_for_archive(self.expired_retention)
+            if not selected:
+                return
+            path = self.store.new_archive_path(self.archive_dir)
+        except (OSError, sqlite3.Error) as e:
+            log.error('archive_failed', f"Failed to archive expired clients: {e}", error=str(e))
+            return
+
+        def run():
+            error = None
             try:
-                with open(self.save_file_path, 'r') as f:
-                    # Usa o object_hook para deserializar datetime strings
-                    loaded_data = json.load(f, object_hook=datetime_decoder)
-
-                if 'active' in loaded_data and isinstance(loaded_data['active'], list):
-                    self.clients_list = loaded_data['active']
-                    # Garante flags para clientes antigos que não tinham status/calendar_event_created
-                    for client in self.clients_list:
-                         if 'calendar_event_created' not in client:
-                              client['calendar_event_created'] = False
-                         if 'status' not in client: # Garante status para clientes antigos
-                              client['status'] = 'active'
-
-
-                if 'expired' in loaded_data and isinstance(loaded_data['expired'], list):
-                    self.expired_clients_list = loaded_data['expired']
-                    # Garante flags para clientes antigos em expirados
-                    for client in self.expired_clients_list:
-                         if 'calendar_event_created' not in client:
-                              client['calendar_event_created'] = False
-                         if 'status' not in client:
-                             # Tenta deduzir o status para clientes antigos sem o campo
-                             if client.get('creation_time') is not None and isinstance(client.get('creation_time'), datetime.datetime):
-                                  # Se tem creation_time e é um datetime, tenta ver se já passou do timer total
-                                  try:
-                                       if datetime.datetime.now() - client['creation_time'] > self.total_timer_duration:
-                                            client['status'] = 'expired'
-                                       else: # Se creation_time existe mas não expirou (o que não deveria acontecer em 'expired_clients_list'), assume manual
-                                            client['status'] = 'deleted_manual'
-                                  except TypeError: # Catch error if creation_time is not a datetime object for some reason
-                                       client['status'] = 'deleted_manual'
-                             else: # Se não tem creation_time, assume que foi deletado manualmente (pode não ser preciso)
-                                  client['status'] = 'deleted_manual'
-
-
-                print(f"[INFO ] Data loaded successfully from {self.save_file_path}")
-            except json.JSONDecodeError as e:
-                 print(f"[ERROR] Failed to decode JSON from {self.save_file_path}: {e}")
-                 print("[ERROR] Data file might be corrupted. Starting with empty lists.")
-                 self.clients_list = []
-                 self.expired_clients_list = []
-            except Exception as e:
-                 print(f"[ERROR] Failed to load data from {self.save_file_path}: {e}")
-                 print("[ERROR] Starting with empty lists.")
-                 self.clients_list = []
-                 self.expired_clients_list = []
-        else:
-            print(f"[INFO ] Save file not found at {self.save_file_path}. Starting with empty lists.")
+                write_archive(path, selected)
+            except OSError as e:
+                error = e
+            Clock.schedule_once(lambda dt: self.finish_retention(selected, path, error))
+
+        self._archive_thread = threading.Thread(target=run, name='client-archive', daemon=True)
+        self._archive_thread.start()
+
+    def finish_retention(self, selected, path, error):
+        """Na thread da UI: tira do banco os clientes já gravados no arquivo e refaz a lista de vencidos uma vez."""
+        self._archive_thread = None
+        if error is not None:
+            log.error('archive_failed', f"Failed to archive expired clients: {error}", path=path, error=str(error))
+            return
+        try:
+            count = self.store.finish_archive(selected, path)
+        except sqlite3.Error as e:
+            log.error('archive_failed', f"Failed to archive expired clients: {e}", path=path, error=str(e))
+            return
+        if count and self.expired_list_loaded:
+            self.update_expired_list_display()
+
+    def export_expired_history(self):
+        """Exporta todo o histórico de vencidos/excluídos para um CSV compactado em user_data_dir/exports."""
+        path = os.path.join(self.export_dir, archive_file_name(datetime.datetime.now(), prefix='historico', fmt='csv'))
+        try:
+            os.makedirs(self.export_dir, exist_ok=True)
+            count = self.store.export_expired(path)
+        except (OSError, sqlite3.Error) as e:
+            log.error('export_failed', f"Failed to export expired clients: {e}", path=path, error=str(e))
+            self.show_alert_screen(f"Erro ao exportar o histórico:\n{e}")
+            return
+        log.info('expired_exported', f"Exported {count} expired client(s) to {path}", path=path, count=count)
+        self.show_alert_screen(f"{count} cliente(s) exportado(s) para\n{path}")
 
 
-    # >>>>> Override do método on_stop para salvar os dados ao fechar <<<<<
+    # >>>>> No Android o processo pode ser encerrado em segundo plano: compacta o journal ao pausar <<<<<
+    def on_pause(self):
+        """Suspende o tick da UI, pede a compactação do journal e permite que o app seja pausado."""
+        self._paused = True
+        self.stop_ui_tick()
+        self.save_data()
+        self.database.request_checkpoint()
+        return True
+
+    def on_resume(self):
+        """Retoma o tick da UI e processa, em fatias, o que venceu durante a pausa."""
+        self._paused = False
+        self._clock_base = None # Durante a pausa os dois relógios divergem de propósito
+        if self.sm.current == 'main_screen':
+            self.start_ui_tick()
+        if self.data_loaded:
+            log.info('app_resumed', "App resumed; catching up on expirations.", backlog=self.engine.has_due())
+            # Com acúmulo o atraso é zero: process_expirations começa no próximo quadro, depois do primeiro desenho
+            self.arm_expiry_timer()
+
+
+    # >>>>> Override do método on_stop para fechar o banco ao sair <<<<<
     def on_stop(self):
-        """Salva os dados dos clientes quando o aplicativo é fechado."""
-        print("[INFO ] App stopping. Saving data...")
+        """Grava as alterações pendentes e fecha o banco quando o aplicativo é fechado."""
+        log.info('app_stopping', "App stopping. Saving data...")
+        self.reminder_dispatcher.stop()
+        self.autosave.stop()
+        if self._load_thread is not None:
+            # Fechou durante a carga: espera a thread largar a conexão antes de gravar e fechar
+            self._load_thread.join()
+            self.data_loaded = True
         self.save_data()
-
-
-    # Método para atualizar a posição e tamanho do retângulo de fundo do status (na lista vencida)
-    def update_status_rect(self, instance, value):
-        """Atualiza a posição e tamanho do retângulo de fundo do rótulo de status."""
-        if hasattr(instance, 'status_bg_rect'):
-             instance.status_bg_rect.pos = instance.pos
-             instance.status_bg_rect.size = instance.size
+        self.database.close()
+        if self.perf_overlay_enabled:
+            self.export_perf_stats()
+
+
+    # --- Instrumentação: overlay de desempenho e exportação das estatísticas ---
+    def on_key_down(self, window, key, scancode, codepoint, modifiers):
+        """F12 liga/desliga o overlay de desempenho."""
+        if key == 293: # F12
+            self.toggle_perf_overlay()
+            return True
+        return False
+
+    def toggle_perf_overlay(self):
+        """Mostra ou esconde o overlay; enquanto visível, ele é atualizado uma vez por segundo."""
+        if self.perf_overlay is None:
+            self.perf_overlay = PerfOverlay()
+        if self.perf_overlay_enabled:
+            self.perf_overlay_enabled = False
+            self._perf_overlay_event.cancel()
+            self._perf_overlay_event = None
+            self.root.remove_widget(self.perf_overlay)
+        else:
+            self.perf_overlay_enabled = True
+            self.root.add_widget(self.perf_overlay)
+            self.update_perf_overlay()
+            self._perf_overlay_event = Clock.schedule_interval(self.update_perf_overlay, 1.0)
+
+    def collect_ui_gauges(self):
+        """Registra no stats as medidas da interface que só são calculadas sob demanda."""
+        stats.set_gauge('active_clients', len(self.active_clients))
+        stats.set_gauge('ended_clients', self.store.ended_count)
+        stats.set_gauge('active_rows', len(self.active_rows))
+        stats.set_gauge('expired_rows', len(self.expired_rows))
+        # Percorre a árvore inteira (inclusive popups abertos): só quando o overlay/exportação pede
+        stats.set_gauge('widget_count', sum(1 for child in Window.children for _ in child.walk()))
+
+    def update_perf_overlay(self, dt=None):
+        self.collect_ui_gauges()
+
+        def ms(name):
+            value = stats.last_ms(name)
+            return f"{value:.2f} ms" if value is not None else '--'
+
+        tick = stats.timers.get('ui_tick')
+        p95 = tick.percentile(0.95) if tick is not None else None
+        self.perf_overlay.stats_label.text = '\n'.join((
+            f"Tick: {ms('ui_tick')} (p95 {p95 * 1000:.2f} ms)" if p95 is not None else f"Tick: {ms('ui_tick')}",
+            f"Timers: {ms('update_timers')}",
+            f"Linhas renderizadas: {stats.gauges.get('rows_rendered', 0)} de {stats.gauges['active_rows']}",
+            f"Widgets: {stats.gauges['widget_count']}",
+            f"Último save: {ms('autosave')}",
+            f"Lista ativa: {ms('update_client_list_display')}  Carga: {ms('load_data')}",
+        ))
+
+    def export_perf_stats(self):
+        """Grava as estatísticas coletadas em user_data_dir/exports/perf-AAAAMMDD-HHMMSS.json."""
+        self.collect_ui_gauges()
+        path = os.path.join(self.export_dir, f"perf-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+        try:
+            os.makedirs(self.export_dir, exist_ok=True)
+            stats.export(path)
+        except OSError as e:
+            log.error('perf_export_failed', f"Failed to export performance stats: {e}", path=path, error=str(e))
+            return None
+        log.info('perf_exported', f"Performance stats exported to {path}", path=path)
+        self.info_label.text = f"Estatísticas exportadas para {path}"
+        return path
 
 
     # Método para exibir o popup de confirmação de exclusão (da lista ATIVA)
@@ -368,7 +956,7 @@ class MobileApp(App):
 
         popup_layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
 
-        popup_message = Label(text=f"Tem certeza que deseja excluir\n{client_to_confirm.get('nome', 'este cliente')}?",
+        popup_message = Label(text=f"Tem certeza que deseja excluir\n{client_to_confirm.nome or 'este cliente'}?",
                               font_size=20, halign='center', valign='middle',
                               text_size=(self.sm.width * 0.7, None))
 
@@ -402,7 +990,7 @@ class MobileApp(App):
 
         popup_layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
 
-        popup_message = Label(text=f"Tem certeza que deseja excluir\nPERMANENTEMENTE {client_to_confirm.get('nome', 'este cliente')}?",
+        popup_message = Label(text=f"Tem certeza que deseja excluir\nPERMANENTEMENTE {client_to_confirm.nome or 'este cliente'}?",
                               font_size=20, halign='center', valign='middle',
                               text_size=(self.sm.width * 0.7, None))
 
@@ -433,351 +1021,905 @@ class MobileApp(App):
     # Modificado: Transfere o cliente para a lista de vencidos com status "excluído manualmente"
     def confirm_delete(self, client_to_delete, popup_instance):
         """Move o cliente da lista ativa para a lista de vencidos com status 'deleted_manual'."""
-        if client_to_delete in self.clients_list:
-            client_to_delete['status'] = 'deleted_manual'
-
-            self.clients_list.remove(client_to_delete)
-            self.expired_clients_list.append(client_to_delete)
+        if self.engine.delete_manual(client_to_delete):
+            self.arm_expiry_timer()
+            self.request_save()
 
-            print(f"\nCliente excluído manualmente (movido para vencidos): {client_to_delete.get('nome', 'Desconhecido')} ({client_to_delete.get('mac', 'Desconhecido')})\n")
-            self.info_label.text = f"Cliente {client_to_delete.get('nome', 'Desconhecido')} excluído e movido para vencidos."
+            log.info('client_deleted', f"Cliente excluído manualmente (movido para vencidos): {client_to_delete.nome} ({client_to_delete.mac})",
+                     client_id=client_to_delete.id)
+            self.info_label.text = f"Cliente {client_to_delete.nome} excluído e movido para vencidos."
 
-            self.update_client_list_display()
-            self.update_expired_list_display()
+            self.remove_active_row(client_to_delete)
+            self.add_expired_row(client_to_delete)
 
             popup_instance.dismiss()
 
         else:
-            print("Erro: Cliente não encontrado na lista ativa para exclusão manual.")
+            log.error('client_delete_failed', "Cliente não encontrado na lista ativa para exclusão manual.",
+                      client_id=client_to_delete.id)
             self.info_label.text = "Erro ao excluir cliente."
             popup_instance.dismiss()
 
     # >>>>> NOVO: Método para excluir PERMANENTEMENTE da lista VENCIDA <<<<<
     def confirm_expired_delete(self, client_to_delete, popup_instance):
         """Remove o cliente permanentemente da lista de vencidos."""
-        if client_to_delete in self.expired_clients_list:
-            self.expired_clients_list.remove(client_to_delete)
+        if self.engine.purge(client_to_delete):
+            self.request_save()
 
-            print(f"\nCliente excluído permanentemente: {client_to_delete.get('nome', 'Desconhecido')} ({client_to_delete.get('mac', 'Desconhecido')})\n")
-            self.info_label.text = f"Cliente {client_to_delete.get('nome', 'Desconhecido')} excluído permanentemente."
+            log.info('client_purged', f"Cliente excluído permanentemente: {client_to_delete.nome} ({client_to_delete.mac})",
+                     client_id=client_to_delete.id)
+            self.info_label.text = f"Cliente {client_to_delete.nome} excluído permanentemente."
 
-            self.update_expired_list_display() # Atualiza APENAS a exibição da lista de vencidos
+            self.remove_expired_row(client_to_delete) # Remove APENAS a linha deste cliente
 
             popup_instance.dismiss()
 
         else:
-            print("Erro: Cliente não encontrado na lista vencida para exclusão permanente.")
+            log.error('client_purge_failed', "Cliente não encontrado na lista vencida para exclusão permanente.",
+                      client_id=client_to_delete.id)
             self.info_label.text = "Erro ao excluir cliente permanentemente."
             popup_instance.dismiss()
 
 
-    def show_alert_screen(self, message):
-        """Muda para a tela de alerta e define a mensagem."""
-        alert_screen_instance = self.sm.get_screen('alert_screen')
-        alert_screen_instance.alert_message_label.text = message
-        self.sm.current = 'alert_screen'
-
-
-    def go_to_expired_screen(self, instance):
-        """Muda a tela atual do ScreenManager para a tela de Clientes Vencidos."""
-        self.update_expired_list_display()
-        self.sm.current = 'expired_screen'
+    # --- Ações em lote: uma mutação no store/banco e um único redesenho da lista ---
+    def show_confirmation_popup(self, title, message, on_confirm):
+        """Popup Sim/Não; `on_confirm()` é chamado (com o popup já fechado) se o usuário confirmar."""
+        popup_layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
+        popup_layout.add_widget(Label(text=message, font_size=20, halign='center', valign='middle',
+                                      text_size=(self.sm.width * 0.7, None)))
+        button_layout = BoxLayout(orientation='horizontal', spacing=10, size_hint_y=None, height=50)
+        yes_button = Button(text='Sim', font_size=20)
+        no_button = Button(text='Não', font_size=20)
+        button_layout.add_widget(yes_button)
+        button_layout.add_widget(no_button)
+        popup_layout.add_widget(button_layout)
 
-    def update_all_rect(self, instance, value):
-        """Atualiza a posição e o tamanho do retângulo de fundo da caixa cinza principal."""
-        self.all_clients_rect.pos = instance.pos
-        self.all_clients_rect.size = instance.size
+        confirmation_popup = Popup(title=title, content=popup_layout, size_hint=(0.8, 0.4), auto_dismiss=False)
 
-    def update_time(self, *args):
-        """Atualiza o texto do time_label com a hora atual."""
-        now = datetime.datetime.now()
-        time_str = now.strftime('%H:%M:%S')
-        self.time_label.text = time_str
+        def on_yes(button):
+            confirmation_popup.dismiss()
+            on_confirm()
 
-    # Método para atualizar a exibição da lista de clientes ATIVOS (com botão de excluir e timer)
-    def update_client_list_display(self):
-        """Limpa a lista de exibição e a preenche com os clientes ATIVOS atuais."""
-        self.client_list_layout.clear_widgets()
-        self.active_timer_labels.clear() # Limpa a lista de rótulos de timer ao redesenhar
+        yes_button.bind(on_press=on_yes)
+        no_button.bind(on_press=lambda button: confirmation_popup.dismiss())
+        confirmation_popup.open()
 
+    def set_active_selection_mode(self, selecting, refresh=True):
+        """Liga/desliga as caixas de marcação da lista ATIVA e troca a barra de botões.
+
+        `refresh=False` quando quem chama já vai refazer a lista logo em seguida (uma atualização por lote).
+        """
+        self.selecting_active = selecting
+        self.selected_active = set()
+        show_selection_bar(self.main_layout, self.main_buttons_layout, self.active_selection_layout, selecting)
+        self._update_selection_count(self.active_selection_delete_button, self.selected_active)
+        if refresh:
+            self.client_list_view.refresh_from_data()
+
+    def set_active_selected(self, client, selected):
+        if selected:
+            self.selected_active.add(client.id)
+        else:
+            self.selected_active.discard(client.id)
+        self._update_selection_count(self.active_selection_delete_button, self.selected_active)
 
-        if not self.clients_list:
-            self.client_list_layout.add_widget(Label(text='Nenhum cliente ATIVO cadastrado.',
-                                                      halign='center', valign='middle', size_hint_y=None, height=100, color=(0,0,0,1)))
+    def select_all_active(self):
+        """Marca todas as linhas da lista ATIVA (as que atendem à busca atual); de novo, desmarca todas."""
+        if self.selected_active and self.selected_active >= self.active_rows.keys():
+            self.selected_active = set()
+        else:
+            self.selected_active = set(self.active_rows)
+        self._update_selection_count(self.active_selection_delete_button, self.selected_active)
+        self.client_list_view.refresh_from_data()
+
+    @staticmethod
+    def _update_selection_count(delete_button, selected):
+        delete_button.text = f"Excluir selecionados ({len(selected)})"
+        delete_button.disabled = not selected
+
+    def confirm_delete_selected(self):
+        clients = [self.active_clients[client_id] for client_id in self.selected_active if client_id in self.active_clients]
+        if not clients:
             return
+        self.show_confirmation_popup('Confirmar Exclusão',
+                                     f"Excluir {len(clients)} cliente(s) selecionado(s)?\n(Eles vão para a lista de vencidos.)",
+                                     lambda: self.delete_selected_active(clients))
+
+    def delete_selected_active(self, clients):
+        """Move os clientes selecionados para os vencidos de uma vez e refaz a lista ATIVA uma única vez."""
+        moved = self.engine.delete_manual_many(clients)
+        self.request_save()
+        self.arm_expiry_timer()
+        log.info('clients_deleted', f"{len(moved)} cliente(s) excluído(s) em lote (movidos para vencidos).",
+                 count=len(moved))
+        self.set_active_selection_mode(False, refresh=False)
+        self.update_client_list_display()
+        self.info_label.text = f"{len(moved)} cliente(s) excluído(s) e movido(s) para vencidos."
+
+    def set_expired_selection_mode(self, selecting, refresh=True):
+        """Liga/desliga as caixas de marcação da lista VENCIDA e troca a barra de botões (ver set_active_selection_mode)."""
+        expired_screen = self.get_expired_screen()
+        self.selecting_expired = selecting
+        self.selected_expired = set()
+        expired_screen.show_selection_bar(selecting)
+        self._update_selection_count(expired_screen.selection_delete_button, self.selected_expired)
+        if refresh:
+            expired_screen.expired_clients_list_view.refresh_from_data()
+
+    def set_expired_selected(self, client, selected):
+        if selected:
+            self.selected_expired.add(client.id)
+        else:
+            self.selected_expired.discard(client.id)
+        self._update_selection_count(self.get_expired_screen().selection_delete_button, self.selected_expired)
+
+    def select_all_expired(self):
+        """Marca todas as linhas carregadas (ou todo o resultado da busca); de novo, desmarca todas."""
+        candidates = set(self._expired_filter_ids) if self._expired_filter_ids is not None else set(self.expired_rows)
+        if self.selected_expired and self.selected_expired >= candidates:
+            self.selected_expired = set()
+        else:
+            self.selected_expired = candidates
+        expired_screen = self.get_expired_screen()
+        self._update_selection_count(expired_screen.selection_delete_button, self.selected_expired)
+        expired_screen.expired_clients_list_view.refresh_from_data()
 
-        list_layout_width = self.client_list_layout.width if self.client_list_layout.width > 10 else 400
-
-
-        for index, client in enumerate(self.clients_list):
-            # Altura da linha para acomodar o texto verticalmente
-            client_row_layout = BoxLayout(orientation='horizontal', spacing=5, padding=5, size_hint_y=None, height=100)
-
-
-            num_label = Label(text=f"{index + 1}.", font_size=18, size_hint_x=0.1, halign='right', valign='middle', color=(0,0,0,1),
-                              size_hint_y=1)
+    def confirm_purge_selected(self):
+        if not self.selected_expired:
+            return
+        count = len(self.selected_expired)
+        self.show_confirmation_popup('Confirmar Exclusão Permanente',
+                                     f"Excluir PERMANENTEMENTE {count} cliente(s) selecionado(s)?",
+                                     self.purge_selected_expired)
+
+    def purge_selected_expired(self):
+        """Exclui permanentemente os selecionados numa única escrita e recarrega a lista VENCIDA uma vez."""
+        # Seleções fora das páginas carregadas (ex.: 'Todos' numa busca) são lidas do banco de uma vez
+        clients = self.store.get_clients(list(self.selected_expired))
+        removed = self.engine.purge_many(clients)
+        self.request_save()
+        log.info('clients_purged', f"{removed} cliente(s) excluído(s) permanentemente em lote.", count=removed)
+        self.set_expired_selection_mode(False, refresh=False)
+        self.update_expired_list_display()
+        self.info_label.text = f"{removed} cliente(s) excluído(s) permanentemente."
 
+    def show_purge_popup(self):
+        """Oferece limpar todo o histórico ou só quem saiu da lista ativa há mais de N dias."""
+        popup_layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
+        popup_layout.add_widget(Label(text=f"{self.store.ended_count} cliente(s) no histórico de vencidos/excluídos.",
+                                      font_size=18, halign='center', valign='middle'))
+
+        age_layout = BoxLayout(orientation='horizontal', spacing=10, size_hint_y=None, height=50)
+        days_input = TextInput(text=str(self.purge_default_days), input_filter='int', multiline=False, size_hint_x=0.25)
+        older_button = Button(text='Limpar mais antigos que (dias):', size_hint_x=0.75)
+        age_layout.add_widget(older_button)
+        age_layout.add_widget(days_input)
+        popup_layout.add_widget(age_layout)
+
+        all_button = Button(text='Limpar todo o histórico', size_hint_y=None, height=50, background_color=(1, 0, 0, 1))
+        popup_layout.add_widget(all_button)
+        cancel_button = Button(text='Cancelar', size_hint_y=None, height=50)
+        popup_layout.add_widget(cancel_button)
+
+        purge_popup = Popup(title='Limpar Histórico', content=popup_layout, size_hint=(0.9, 0.5), auto_dismiss=False)
+
+        def on_older(button):
+            days = int(days_input.text or 0)
+            purge_popup.dismiss()
+            self.show_confirmation_popup('Confirmar Limpeza',
+                                         f"Excluir PERMANENTEMENTE quem está no histórico há mais de {days} dia(s)?",
+                                         lambda: self.purge_expired_history(datetime.timedelta(days=days)))
+
+        def on_all(button):
+            purge_popup.dismiss()
+            self.show_confirmation_popup('Confirmar Limpeza',
+                                         f"Excluir PERMANENTEMENTE todos os {self.store.ended_count} cliente(s) do histórico?",
+                                         lambda: self.purge_expired_history(None))
+
+        older_button.bind(on_press=on_older)
+        all_button.bind(on_press=on_all)
+        cancel_button.bind(on_press=lambda button: purge_popup.dismiss())
+        purge_popup.open()
+
+    def purge_expired_history(self, older_than):
+        """Apaga o histórico (todo ou só o mais antigo que `older_than`) com um único DELETE e recarrega a lista."""
+        removed = self.engine.purge_ended(older_than)
+        self.request_save()
+        log.info('history_purged', f"{removed} cliente(s) removido(s) do histórico.", count=removed,
+                 older_than_days=older_than.days if older_than is not None else None)
+        if self.selecting_expired:
+            self.set_expired_selection_mode(False, refresh=not self.expired_list_loaded)
+        if self.expired_list_loaded:
+            self.update_expired_list_display()
+        self.info_label.text = f"{removed} cliente(s) removido(s) do histórico."
 
-            # Detalhes (Nome, MAC, Senha) - Permitindo que os Labels definam sua altura
-            details_layout = BoxLayout(orientation='vertical', spacing=2, size_hint_x=0.5,
-                                       size_hint_y=None)
 
+    # --- Renovação/extensão: troca só o prazo do cliente e a sua entrada no agendador ---
+    def show_renew_popup(self, instance):
+        """Exibe as opções de renovação (plano inteiro a partir de agora) e de extensão do timer."""
+        client = instance.client_data
 
-            # Mostrando Nome, MAC e Senha na lista ATIVA
-            nome_label = Label(text=f"Nome: {client.get('nome', 'N/A')}",
-                               font_size=15, halign='left', valign='top', color=(0,0,0,1),
-                               text_size=((list_layout_width * 0.5 * 0.95), None), size_hint_y=None)
+        popup_layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
+        popup_layout.add_widget(Label(text=f"Renovar ou estender\n{client.nome or 'este cliente'} ({plan_label(client.plan)})",
+                                      font_size=20, halign='center', valign='middle',
+                                      text_size=(self.sm.width * 0.7, None)))
+
+        options_layout = BoxLayout(orientation='horizontal', spacing=10, size_hint_y=None, height=50)
+        renew_button = Button(text='Renovar plano')
+        renew_button.bind(on_press=lambda btn: self.confirm_renew(client, None, renew_popup))
+        options_layout.add_widget(renew_button)
+        for option_text, delta in self.extension_options:
+            option_button = Button(text=option_text)
+            option_button.bind(on_press=lambda btn, delta=delta: self.confirm_renew(client, delta, renew_popup))
+            options_layout.add_widget(option_button)
+        popup_layout.add_widget(options_layout)
+
+        cancel_button = Button(text='Cancelar', size_hint_y=None, height=50)
+        cancel_button.bind(on_press=lambda btn: renew_popup.dismiss())
+        popup_layout.add_widget(cancel_button)
+
+        renew_popup = Popup(title='Renovar Cliente',
+                            content=popup_layout,
+                            size_hint=(0.9, 0.45),
+                            auto_dismiss=False)
+        renew_popup.open()
+
+    def confirm_renew(self, client, delta, popup_instance):
+        """Renova (delta None) ou estende o cliente; vencidos voltam para a lista ativa."""
+        was_active = client.is_active
+        if delta is None:
+            changed = self.engine.renew(client)
+        else:
+            changed = self.engine.extend(client, delta)
+        popup_instance.dismiss()
 
-            mac_label = Label(text=f"MAC: {client.get('mac', 'N/A')}",
-                              font_size=15, halign='left', valign='middle', color=(0,0,0,1),
-                              text_size=((list_layout_width * 0.5 * 0.95), None), size_hint_y=None)
+        if not changed:
+            log.warning('client_renew_failed', f"Não foi possível renovar {client.nome} ({client.mac}).", client_id=client.id)
+            self.info_label.text = f"Não foi possível renovar {client.nome}: já existe um cliente ativo com o mesmo MAC e senha ou ele foi excluído."
+            return
 
-            senha_status_label = Label(text=f"Senha: {client.get('senha', 'N/A')}",
-                                       font_size=15, halign='left', valign='bottom', color=(0,0,0,1),
-                                       text_size=((list_layout_width * 0.5 * 0.95), None), size_hint_y=None)
+        self.request_save()
+        self.arm_expiry_timer()
+        if was_active:
+            self.refresh_client_timer(client)
+        else:
+            self.remove_expired_row(client)
+            self.add_active_row(client)
 
+        log.info('client_renewed', f"Cliente renovado: {client.nome} ({client.mac}) até {client.deadline.strftime('%Y-%m-%d %H:%M:%S')}",
+                 client_id=client.id, deadline=client.deadline.isoformat(), extension=delta.total_seconds() if delta else None)
+        self.info_label.text = f"Cliente {client.nome} renovado até {client.deadline.strftime('%d/%m %H:%M')}."
 
-            details_layout.add_widget(nome_label)
-            details_layout.add_widget(mac_label)
-            details_layout.add_widget(senha_status_label)
+    def refresh_client_timer(self, client):
+        """Atualiza o prazo apenas nas linhas visíveis deste cliente e a posição dele na ordem (sem refazer a lista)."""
+        self.reposition_active_row(client)
+        now = datetime.datetime.now()
+        for timer_label in list(self.active_timer_labels):
+            client_row = timer_label.parent
+            if client_row is not None and client_row.delete_button.client_data is client:
+                timer_label.client_deadline = client.deadline
+                self.refresh_timer_label(timer_label, now)
+                self.apply_warning_badge(timer_label)
+
+
+    # --- Telas secundárias: construídas no primeiro uso ---
+    def get_alert_screen(self):
+        if not self.sm.has_screen('alert_screen'):
+            self.sm.add_widget(AlertScreen(name='alert_screen'))
+        return self.sm.get_screen('alert_screen')
+
+    def get_expired_screen(self):
+        if not self.sm.has_screen('expired_screen'):
+            expired_screen = ExpiredScreen(name='expired_screen')
+            expired_screen.expired_clients_list_view.bind(scroll_y=self.on_expired_scroll)
+            self.sm.add_widget(expired_screen)
+        return self.sm.get_screen('expired_screen')
 
-            # Timer - Permitindo que o Label defina sua altura
-            timer_label = Label(text="Timer: --:--:--", font_size=16, size_hint_x=0.3, halign='center', valign='middle', color=(0,0,0,1),
-                                size_hint_y=1)
+    def show_alert_screen(self, message):
+        """Muda para a tela de alerta e define a mensagem."""
+        alert_screen_instance = self.get_alert_screen()
+        alert_screen_instance.alert_message_label.text = message
+        self.sm.current = 'alert_screen'
 
-            # Associa a creation_time ao rótulo do timer
-            timer_label.client_creation_time = client.get('creation_time')
-            timer_label.is_timer_label = True
 
+    def go_to_expired_screen(self, instance):
+        """Muda a tela atual do ScreenManager para a tela de Clientes Vencidos."""
+        self.get_expired_screen()
+        self.sm.current = 'expired_screen'
 
-            delete_button = Button(text='X',
-                                   font_size=18,
-                                   size_hint_x=0.1,
-                                   size_hint_y=1,
-                                   background_color=(1, 0, 0, 1))
+    def update_all_rect(self, instance, value):
+        """Atualiza a posição e o tamanho do retângulo de fundo da caixa cinza principal."""
+        self.all_clients_rect.pos = instance.pos
+        self.all_clients_rect.size = instance.size
 
-            delete_button.client_data = client
-            # Este botão chama o popup que MOVE para a lista de vencidos
-            delete_button.bind(on_press=self.show_delete_confirmation_popup)
+    # --- Tick único da UI: calcula `now` uma vez e atualiza a hora e os timers visíveis ---
+    def check_clock_jump(self, now):
+        """Compara quanto o relógio de parede e o monotônico andaram desde o último tick.
+
+        O Clock do Kivy conta o atraso do próximo prazo no relógio monotônico, que não anda com o
+        aparelho suspenso nem muda com ajustes de hora; se os dois divergem, rearma pela hora atual.
+        """
+        monotonic = time.monotonic()
+        base = self._clock_base
+        self._clock_base = (monotonic, now)
+        if base is None or not self.data_loaded:
+            return False
+        drift = (now - base[1]).total_seconds() - (monotonic - base[0])
+        if abs(drift) < self.clock_jump_tolerance:
+            return False
+        log.info('clock_jump', f"Wall clock moved {drift:+.0f}s relative to the monotonic clock; re-arming expiry.",
+                 drift=round(drift, 1))
+        stats.increment('clock_jumps')
+        self.arm_expiry_timer()
+        return True
+
+    def start_ui_tick(self):
+        """(Re)inicia o tick da UI, com uma atualização imediata."""
+        self.stop_ui_tick()
+        self.on_tick()
+
+    def stop_ui_tick(self):
+        if self._tick_event is not None:
+            self._tick_event.cancel()
+            self._tick_event = None
+
+    @stats.timed('ui_tick')
+    def on_tick(self, dt=None):
+        """Atualiza a hora e os timers e agenda o próximo tick logo após a virada do segundo."""
+        self._tick_event = None
+        if self._paused or self.sm.current != 'main_screen':
+            return
 
+        now = datetime.datetime.now()
+        self.check_clock_jump(now)
+        self.update_time(now)
+        self.update_timers(now)
+
+        # Alinhado ao relógio: todos os rótulos mudam juntos, uma única vez por segundo
+        delay = 1.0 - now.microsecond / 1_000_000 + 0.005
+        self._tick_event = Clock.schedule_once(self.on_tick, delay)
+
+    def on_current_screen(self, screen_manager, current):
+        """Pausa o tick enquanto a lista ATIVA não está na tela; carrega/descarta as páginas da lista VENCIDA."""
+        if current == 'main_screen' and not self._paused:
+            self.start_ui_tick()
+        else:
+            self.stop_ui_tick()
 
-            # Adiciona o rótulo do timer à lista de rótulos ativos
-            self.active_timer_labels.append(timer_label)
+        if current == 'expired_screen':
+            self.update_expired_list_display()
+        elif self.expired_list_loaded:
+            self.clear_expired_list_display()
 
+    def update_time(self, now):
+        """Atualiza o texto do time_label com a hora atual."""
+        time_str = now.strftime('%H:%M:%S')
+        if self.time_label.text != time_str:
+            self.time_label.text = time_str
+
+    # --- Registro de linhas: cada cliente (por identidade) tem exatamente um item nos dados do RecycleView ---
+    def _sync_empty_label(self, container, empty_label, is_empty):
+        """Mostra o rótulo de lista vazia (acima da lista) apenas quando não há linhas."""
+        if is_empty and empty_label.parent is None:
+            container.add_widget(empty_label, index=len(container.children))
+        elif not is_empty and empty_label.parent is not None:
+            container.remove_widget(empty_label)
+
+    @staticmethod
+    def _remove_row_item(data, item):
+        """Remove `item` dos dados do RecycleView comparando por identidade."""
+        for index, candidate in enumerate(data):
+            if candidate is item:
+                del data[index]
+                return
+
+    # --- Ordem da lista ATIVA: o GroupedOrder dá a posição de cada item, com cabeçalhos de grupo ---
+    def active_order_keys(self, mode):
+        """(chave de ordenação, grupo) de um modo; os grupos se ordenam na ordem em que aparecem."""
+        if mode == 'time':
+            # O grupo é o menor aviso já alcançado: muda quando a roda de tempo dispara o aviso
+            return (lambda client: client.deadline or datetime.datetime.max,
+                    lambda client: self.engine.warnings.get(client.id, datetime.timedelta.max))
+        if mode == 'name':
+            return (lambda client: self.name_sort_key(client.nome), self.name_group)
+        return (lambda client: client.creation_time or datetime.datetime.min,
+                lambda client: (client.creation_time or datetime.datetime.min).date())
+
+    @staticmethod
+    def name_sort_key(nome):
+        """Nome normalizado e sem acentos: 'Ábner' fica junto de 'abel', antes de 'ana'."""
+        decomposed = unicodedata.normalize('NFKD', SearchIndex.normalize_name(nome or ''))
+        return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+    def name_group(self, client):
+        """Inicial do nome sem acento ('#' para o que não começa com letra)."""
+        initial = self.name_sort_key(client.nome)[:1].upper()
+        return initial if initial.isalpha() else '#'
+
+    def active_group_title(self, group):
+        if self.active_sort_mode == 'time':
+            if group != datetime.timedelta.max:
+                return f"Vencem em até {self.warning_text(group)}"
+            if self.engine.warning_offsets:
+                return f"Mais de {self.warning_text(max(self.engine.warning_offsets))}"
+            return "Ativos"
+        if self.active_sort_mode == 'name':
+            return group
+        return f"Cadastrados em {group.strftime('%d/%m/%Y')}"
+
+    def build_active_order(self, clients):
+        sort_key, group_of = self.active_order_keys(self.active_sort_mode)
+        return GroupedOrder(sort_key, group_of, clients)
+
+    def group_header_item(self, group):
+        return {'viewclass': 'ActiveGroupHeader', 'height': self.active_group_height,
+                'text': self.active_group_title(group)}
+
+    def layout_active_rows(self):
+        """Monta os dados do RecycleView na ordem atual; os itens dos clientes são reaproveitados."""
+        self.client_list_view.data = [self.active_rows[client_id] if client_id is not None else self.group_header_item(group)
+                                      for group, client_id in self.active_order.entries()]
+        self._sync_empty_label(self.all_clients_box_layout, self.active_empty_label, not self.active_rows)
+
+    def _insert_active_item(self, client, row_item):
+        index, header_index = self.active_order.add(client)
+        data = self.client_list_view.data
+        if header_index is not None:
+            data.insert(header_index, self.group_header_item(self.active_order.group_at(index)[0]))
+        data.insert(index, row_item)
+
+    def _remove_active_item(self, client_id):
+        removed = self.active_order.remove(client_id)
+        if removed is not None:
+            index, header_index = removed
+            data = self.client_list_view.data
+            del data[index]
+            if header_index is not None:
+                del data[header_index]
+
+    def set_active_sort_mode(self, mode):
+        """Troca a ordenação da lista ATIVA: reordena os itens existentes, sem recriar nenhum."""
+        if mode == self.active_sort_mode:
+            return
+        self.active_sort_mode = mode
+        with stats.time('active_sort'):
+            self.active_order = self.build_active_order(row_item['client'] for row_item in self.active_rows.values())
+            self.layout_active_rows()
+        self.client_list_view.scroll_y = 1
+        log.info('active_sort_changed', f"Active list sorted by {mode}.", mode=mode, rows=len(self.active_rows))
+
+    def reposition_active_row(self, client):
+        """Leva a linha do cliente para a nova posição/grupo (renovação, aviso) sem tocar nas demais."""
+        row_item = self.active_rows.get(client.id)
+        if row_item is None or not self.active_order.changed(client):
+            return
+        self._remove_active_item(client.id)
+        self._insert_active_item(client, row_item)
 
-            client_row_layout.add_widget(num_label)
-            client_row_layout.add_widget(details_layout)
-            client_row_layout.add_widget(timer_label)
-            client_row_layout.add_widget(delete_button)
+    def add_active_row(self, client):
+        """Insere apenas o item do cliente ATIVO informado, na posição da ordem atual; o RecycleView cria widgets só se estiver visível."""
+        key = client.id
+        if key in self.active_rows:
+            return
+        if self.active_filter and not self.store.active_search.matches(key, self.active_filter):
+            return
+        row_item = {'client': client}
+        self.active_rows[key] = row_item
+        self._insert_active_item(client, row_item)
+        self._sync_empty_label(self.all_clients_box_layout, self.active_empty_label, False)
+
+    def remove_active_rows(self, clients):
+        """Remove os itens de vários clientes ATIVOS e remonta os dados do RecycleView numa única passada."""
+        removed = False
+        for client in clients:
+            if self.active_rows.pop(client.id, None) is not None:
+                self.active_order.remove(client.id)
+                removed = True
+            if client.id in self.selected_active:
+                self.set_active_selected(client, False)
+        if removed:
+            self.layout_active_rows()
+        self._sync_empty_label(self.all_clients_box_layout, self.active_empty_label, not self.active_rows)
+
+    def remove_active_row(self, client):
+        """Remove apenas o item do cliente ATIVO informado."""
+        if self.active_rows.pop(client.id, None) is not None:
+            self._remove_active_item(client.id)
+        if client.id in self.selected_active:
+            self.set_active_selected(client, False)
+        self._sync_empty_label(self.all_clients_box_layout, self.active_empty_label, not self.active_rows)
 
+    # Método para atualizar a exibição da lista de clientes ATIVOS (com botão de excluir e timer)
+    @stats.timed('update_client_list_display')
+    def update_client_list_display(self):
+        """Refaz a lista ATIVA (filtrada pela busca, se houver) na ordem atual; itens de clientes que continuam são reaproveitados."""
+        if self.active_filter:
+            clients = self.store.search_active(self.active_filter)
+            self.active_empty_label.text = 'Nenhum cliente ATIVO encontrado.'
+        else:
+            clients = self.active_clients.values()
+            self.active_empty_label.text = 'Nenhum cliente ATIVO cadastrado.'
+        previous = self.active_rows
+        self.active_rows = {}
+        for client in clients:
+            row_item = previous.get(client.id)
+            self.active_rows[client.id] = row_item if row_item is not None and row_item['client'] is client else {'client': client}
+        self.active_order = self.build_active_order(row_item['client'] for row_item in self.active_rows.values())
+        self.layout_active_rows()
+
+    def apply_active_filter(self, dt=None):
+        """Aplica o texto da busca à lista ATIVA (chamado pelo gatilho com debounce)."""
+        text = self.active_search_input.text.strip()
+        if text != self.active_filter:
+            self.active_filter = text
+            self.update_client_list_display()
 
-            self.client_list_layout.add_widget(client_row_layout)
 
+    def add_expired_row(self, client):
+        """Insere o cliente que acabou de sair da lista ativa no topo da lista de vencidos (se estiver carregada)."""
+        key = client.id
+        if not self.expired_list_loaded or key in self.expired_rows:
+            return
+        if self._expired_filter_ids is not None and not self.store.ended_search_index().matches(
+                key, self.expired_filter, self.expired_status_filter):
+            return
+        expired_screen = self.get_expired_screen()
+        row_item = {'client': client}
+        self.expired_rows[key] = row_item
+        expired_screen.expired_clients_list_view.data.insert(0, row_item)
+        self._sync_empty_label(expired_screen.expired_clients_box_layout, self.expired_empty_label, False)
+
+    def remove_expired_row(self, client):
+        """Remove apenas o item do cliente informado da lista de vencidos."""
+        if not self.expired_list_loaded:
+            return
+        expired_screen = self.get_expired_screen()
+        if client.id in self.selected_expired:
+            self.set_expired_selected(client, False)
+        row_item = self.expired_rows.pop(client.id, None)
+        if row_item is not None:
+            self._remove_row_item(expired_screen.expired_clients_list_view.data, row_item)
+        self._sync_empty_label(expired_screen.expired_clients_box_layout, self.expired_empty_label, not self.expired_rows)
 
     # Método para atualizar a exibição da lista de clientes VENCIDOS em layout horizontal
     def update_expired_list_display(self):
-        """Limpa a lista de exibição de vencidos e a preenche com os clientes vencidos em layout horizontal, incluindo botão de exclusão."""
-        expired_screen = self.sm.get_screen('expired_screen')
-        expired_layout = expired_screen.expired_clients_list_layout
-
-        expired_layout.clear_widgets()
-
-        if not self.expired_clients_list:
-             expired_layout.add_widget(Label(text='Nenhum cliente VENCIDO ou EXCLUÍDO ainda.',
-                                             halign='center', valign='middle', size_hint_y=None, height=100, color=(0,0,0,1)))
-             return
-
-        expired_list_container_width = expired_screen.expired_clients_box_layout.width if expired_screen.expired_clients_box_layout.width > 10 else 400
-
-        # Altura ajustada para a linha horizontal de vencidos/excluídos
-        row_height = 40 # Pode precisar de ajuste conforme necessário para caber o texto
-
-        # >>>>> NOVO: Proporções ajustadas para incluir o botão de exclusão (total 1.0) <<<<<
-        # Exemplo de proporções: Num (0.1) | Nome (0.18) | MAC (0.18) | Senha (0.18) | Status (0.26) | Delete (0.1) = 1.0
-        num_width_hint = 0.1
-        detail_width_hint = 0.18
-        status_width_hint = 0.26
-        delete_width_hint = 0.1
-
-        base_text_width = expired_list_container_width
-
-        for index, client in enumerate(self.expired_clients_list):
-            # Layout HORIZONTAL para cada linha de cliente VENCIDO/EXCLUÍDO
-            expired_row_layout = BoxLayout(orientation='horizontal', spacing=5, padding=5, size_hint_y=None, height=row_height)
-
-
-            num_label = Label(text=f"{index + 1}.", font_size=15, size_hint_x=num_width_hint, halign='right', valign='middle', color=(0,0,0,1))
-
-            # Labels para os dados do cliente (Nome, MAC, Senha Status)
-            nome_label = Label(text=f"Nome: {client.get('nome', 'N/A')}",
-                               font_size=14, size_hint_x=detail_width_hint, halign='left', valign='middle', color=(0,0,0,1),
-                               text_size=((base_text_width * detail_width_hint * 0.95), None))
-
-            mac_label = Label(text=f"MAC: {client.get('mac', 'N/A')}",
-                              font_size=14, size_hint_x=detail_width_hint, halign='left', valign='middle', color=(0,0,0,1),
-                              text_size=((base_text_width * detail_width_hint * 0.95), None))
-
-            senha_status_label = Label(text=f"Senha: {client.get('senha', 'N/A')}",
-                                       font_size=14, size_hint_x=detail_width_hint, halign='left', valign='middle', color=(0,0,0,1),
-                                       text_size=((base_text_width * detail_width_hint * 0.95), None))
-
-
-            # Rótulo para exibir o STATUS (VENCIDO ou EXCLUÍDO MANUALMENTE)
-            status_label = Label(font_size=16, size_hint_x=status_width_hint, halign='center', valign='middle',
-                                 markup=True)
-
-            client_status = client.get('status', 'expired')
-
-            status_text = ""
-            status_color = (0,0,0,1)
-
-
-            if client_status == 'expired':
-                status_text = "VENCIDO"
-                status_color = (1, 0, 0, 1)
-                with status_label.canvas.before:
-                    Color(1, 0, 0, 1)
-                    status_label.status_bg_rect = Rectangle(pos=status_label.pos, size=status_label.size)
-                status_label.bind(pos=self.update_status_rect, size=self.update_status_rect)
-                status_label.color = (1, 1, 1, 1)
-
-
-            elif client_status == 'deleted_manual':
-                status_text = "EXCLUÍDO"
-                status_color = (0, 0, 1, 1)
-                with status_label.canvas.before:
-                    Color(0.7, 0.7, 0.7, 1) # Fundo cinza claro
-                    status_label.status_bg_rect = Rectangle(pos=status_label.pos, size=status_label.size)
-                status_label.bind(pos=self.update_status_rect, size=self.update_status_rect)
-                status_label.color = (0, 0, 0, 1)
-
-
-            status_label.text = f"[b]{status_text}[/b]"
-            status_label.text_size = ((base_text_width * status_width_hint * 0.95), None)
-
-            # >>>>> NOVO: Botão de exclusão para a lista vencida <<<<<
-            expired_delete_button = Button(text='X',
-                                           font_size=18,
-                                           size_hint_x=delete_width_hint,
-                                           size_hint_y=1,
-                                           background_color=(1, 0, 0, 1))
-
-            expired_delete_button.client_data = client
-            # Este botão chama o popup que EXCLUI PERMANENTEMENTE
-            expired_delete_button.bind(on_press=self.show_expired_delete_confirmation_popup)
-
-
-            # Adiciona todos os elementos à linha HORIZONTAL
-            expired_row_layout.add_widget(num_label)
-            expired_row_layout.add_widget(nome_label)
-            expired_row_layout.add_widget(mac_label)
-            expired_row_layout.add_widget(senha_status_label)
-            expired_row_layout.add_widget(status_label)
-            expired_row_layout.add_widget(expired_delete_button) # Adiciona o botão de exclusão no final
-
+        """Carrega do banco a primeira página (os mais recentes) da lista de vencidos; o custo não depende do histórico."""
+        expired_screen = self.get_expired_screen()
+        if self.expired_filter or self.expired_status_filter:
+            # Busca: os ids vêm do índice em memória; só a página visível é lida do banco
+            self._expired_filter_ids = self.store.search_ended(self.expired_filter, self.expired_status_filter)
+            self._expired_filter_offset = self.expired_page_size
+            clients = self.store.get_clients(self._expired_filter_ids[:self.expired_page_size])
+            self._expired_cursor = None
+            self.expired_empty_label.text = 'Nenhum cliente encontrado.'
+        else:
+            self._expired_filter_ids = None
+            clients, self._expired_cursor = self.store.ended_page(self.expired_page_size)
+            self.expired_empty_label.text = 'Nenhum cliente VENCIDO ou EXCLUÍDO ainda.'
+        self.expired_rows = {client.id: {'client': client} for client in clients}
+        self.expired_list_loaded = True
+        expired_screen.expired_clients_list_view.data = list(self.expired_rows.values())
+        expired_screen.expired_clients_list_view.scroll_y = 1
+        self._sync_empty_label(expired_screen.expired_clients_box_layout, self.expired_empty_label, not self.expired_rows)
+
+    def load_next_expired_page(self):
+        """Acrescenta a próxima página (mais antiga) do histórico ao final da lista de vencidos."""
+        if not self.expired_list_loaded:
+            return
+        if self._expired_filter_ids is not None:
+            start = self._expired_filter_offset
+            if start >= len(self._expired_filter_ids):
+                return
+            self._expired_filter_offset = start + self.expired_page_size
+            clients = self.store.get_clients(self._expired_filter_ids[start:self._expired_filter_offset])
+        elif self._expired_cursor is None:
+            return
+        else:
+            clients, self._expired_cursor = self.store.ended_page(self.expired_page_size, self._expired_cursor)
+        new_items = []
+        for client in clients:
+            if client.id not in self.expired_rows:
+                row_item = {'client': client}
+                self.expired_rows[client.id] = row_item
+                new_items.append(row_item)
+        if new_items:
+            self.get_expired_screen().expired_clients_list_view.data.extend(new_items)
+
+    def on_expired_scroll(self, recycle_view, scroll_y):
+        """Busca a página seguinte quando a rolagem se aproxima do fim da lista de vencidos."""
+        if scroll_y <= 0.1:
+            self.load_next_expired_page()
+
+    def request_expired_filter(self):
+        """Chamado a cada tecla/mudança de status na tela de vencidos: só rearma o gatilho."""
+        self._expired_filter_trigger()
+
+    def apply_expired_filter(self, dt=None):
+        """Aplica a busca e o filtro de status à lista VENCIDA (chamado pelo gatilho com debounce)."""
+        expired_screen = self.get_expired_screen()
+        text = expired_screen.search_input.text.strip()
+        status = {'Vencidos': 'expired', 'Excluídos': 'deleted_manual'}.get(expired_screen.status_spinner.text)
+        if text == self.expired_filter and status == self.expired_status_filter:
+            return
+        self.expired_filter = text
+        self.expired_status_filter = status
+        if self.expired_list_loaded:
+            self.update_expired_list_display()
 
-            expired_layout.add_widget(expired_row_layout)
+    def clear_expired_list_display(self):
+        """Descarta as páginas carregadas ao sair da tela de vencidos."""
+        if self.selecting_expired:
+            self.set_expired_selection_mode(False)
+        self.expired_list_loaded = False
+        self._expired_cursor = None
+        self._expired_filter_ids = None
+        self.expired_rows = {}
+        self.get_expired_screen().expired_clients_list_view.data = []
+
+
+    # --- Expiração: o TimerEngine guarda os prazos e avisos, o Clock só é armado para o próximo ---
+    def arm_expiry_timer(self):
+        """Arma um único Clock.schedule_once para o próximo evento (aviso ou prazo), substituindo o anterior."""
+        if self._expiry_event is not None:
+            self._expiry_event.cancel()
+            self._expiry_event = None
+        if not self.data_loaded:
+            return # on_data_loaded arma o primeiro
+
+        delay = self.engine.seconds_until_next_deadline()
+        if delay is None:
+            return
 
+        self._expiry_event = Clock.schedule_once(self.process_expirations, delay)
+
+    # >>>>> Método para mover os clientes cujo prazo passou <<<<<
+    def process_expirations(self, dt=None):
+        """Retira da roda de tempo os eventos vencidos: avisa os clientes perto do prazo e
+        move os expirados para a lista de vencidos, criando os lembretes.
+
+        Trabalha em fatias de `expiry_chunk_size` eventos e no máximo `expiry_frame_budget` segundos
+        por quadro: depois de uma suspensão o acúmulo continua nos quadros seguintes e os avisos,
+        lembretes e mensagens saem uma única vez, no fim.
+        """
+        self._expiry_event = None
+        if self._catch_up is None:
+            self._catch_up = {'expired': [], 'warnings': {}, 'started': stats.clock()}
+        catch_up = self._catch_up
+
+        # --- Passo 1: O engine retira da roda os avisos e as expirações cujo instante já passou ---
+        with stats.time('expiry_slice'):
+            slice_started = stats.clock()
+            while True:
+                expired, warnings = self.engine.process_due(self.expiry_chunk_size)
+                for client, offset in warnings:
+                    catch_up['warnings'][client.id] = (client, offset)
+                for client in expired:
+                    catch_up['warnings'].pop(client.id, None)
+                    log.info('client_expired', f"Tempo do cliente {client.nome or 'Desconhecido'} ({client.mac or 'Desconhecido'}) expirou!",
+                             client_id=client.id)
+                if expired:
+                    catch_up['expired'].extend(expired)
+                    self.remove_active_rows(expired)
+                    for client in expired:
+                        self.add_expired_row(client)
+                if not self.engine.has_due():
+                    break
+                if stats.clock() - slice_started >= self.expiry_frame_budget:
+                    # Ainda há acúmulo: continua no próximo quadro, depois que a interface desenhar este
+                    self._expiry_event = Clock.schedule_once(self.process_expirations, 0)
+                    return
+        self._catch_up = None
+
+        # --- Passo 2: Avisos dos clientes que continuam ATIVOS e lembretes dos expirados, uma vez só ---
+        warnings = [(client, offset) for client, offset in catch_up['warnings'].values()
+                    if client.id in self.active_clients]
+        if warnings:
+            self.notify_warnings(warnings)
+
+        expired = catch_up['expired']
+        if expired:
+            self.request_save()
+            log.info('clients_moved', f"Movidos {len(expired)} cliente(s) para a lista de vencidos.",
+                     count=len(expired), seconds=round(stats.clock() - catch_up['started'], 3))
+            stats.increment('clients_expired', len(expired))
+            # Só enfileira depois de gravar 'pending': se o app fechar antes, o lembrete é reenviado
+            self.submit_reminders(expired)
+            if len(expired) == 1:
+                self.info_label.text = f"Tempo de {expired[0].nome or 'Desconhecido'} expirou! Criando lembrete..."
+            else:
+                self.info_label.text = f"{len(expired)} clientes expiraram! Criando lembrete..."
+
+            # Passou do limite do histórico: arquiva os mais antigos (até a marca baixa) numa thread
+            if self.expired_retention.exceeds_count(self.store.ended_count):
+                self.start_retention()
+
+        # Arma o próximo disparo para o evento seguinte
+        self.arm_expiry_timer()
+
+
+    # --- Avisos antes do vencimento: selo na linha e notificação ---
+    @staticmethod
+    def warning_text(offset):
+        """Antecedência legível: '1 h', '15 min', '30 s'."""
+        seconds = int(offset.total_seconds())
+        if seconds % 3600 == 0:
+            return f"{seconds // 3600} h"
+        if seconds % 60 == 0:
+            return f"{seconds // 60} min"
+        return f"{seconds} s"
+
+    def apply_warning_badge(self, timer_label):
+        """Destaca o timer do cliente que já passou de algum aviso (vermelho no último, laranja nos outros)."""
+        offset = self.engine.warnings.get(getattr(timer_label, 'client_id', None))
+        if offset is None:
+            color, bold = (0, 0, 0, 1), False
+        elif offset == min(self.engine.warning_offsets):
+            color, bold = self.warning_colors['imminent'], True
+        else:
+            color, bold = self.warning_colors['soon'], True
+        if tuple(timer_label.color) != color:
+            timer_label.color = color
+        if timer_label.bold != bold:
+            timer_label.bold = bold
+
+    def notify_warnings(self, warnings):
+        """Atualiza o selo só das linhas dos clientes avisados e mostra uma notificação (agrupada se forem vários)."""
+        warned_ids = {client.id for client, _ in warnings}
+        for client, _ in warnings:
+            self.reposition_active_row(client) # No modo "Tempo restante" o cliente muda de grupo
+        for timer_label in list(self.active_timer_labels):
+            if timer_label.client_id in warned_ids and timer_label.parent is not None:
+                self.apply_warning_badge(timer_label)
+        for client, offset in warnings:
+            log.info('client_warning', f"Faltam {self.warning_text(offset)} para {client.nome} ({client.mac}) expirar.",
+                     client_id=client.id, offset=offset.total_seconds())
+        stats.increment('warnings_fired', len(warnings))
+
+        if len(warnings) == 1:
+            client, offset = warnings[0]
+            message = f"Faltam {self.warning_text(offset)} para {client.nome or 'Desconhecido'} expirar."
+        else:
+            message = f"{len(warnings)} clientes perto do vencimento."
+        self.info_label.text = message
+        # O Plyer pode bloquear (D-Bus, serviço do Android): a notificação sai de uma thread à parte
+        threading.Thread(target=self._send_notification, args=("Renovação de clientes", message),
+                         name='warning-notification', daemon=True).start()
+
+    @staticmethod
+    def _send_notification(title, message):
+        notification = get_plyer_notification()
+        if notification is None:
+            return
+        try:
+            notification.notify(title=title, message=message, app_name='AppLembrete')
+        except Exception as e:
+            log.warning('notification_failed', f"Failed to show notification: {e}", error=str(e))
+
+
+    # --- Lembretes de calendário (criados em segundo plano, resultado aplicado na thread da UI) ---
+    def build_reminder(self, client):
+        """Monta o lembrete de calendário de um cliente que expirou."""
+        client_name = client.nome or 'Desconhecido'
+        client_mac = client.mac or 'Desconhecido'
+        event_time = client.ended_at or datetime.datetime.now()
+        created_text = client.creation_time.strftime('%Y-%m-%d %H:%M:%S') if client.creation_time else '--'
+        return Reminder(client.id,
+                        title=f"Cliente Expirado: {client_name}",
+                        description=f"MAC: {client_mac}\nStatus Senha: [Salva]\nCriado em: {created_text}",
+                        start_time=event_time)
+
+    def build_summary_reminder(self, clients, max_lines=20):
+        """Monta um único lembrete para vários clientes que expiraram juntos (ex.: com o app pausado)."""
+        lines = [f"{client.nome or 'Desconhecido'} ({client.mac or 'Desconhecido'})" for client in clients[:max_lines]]
+        if len(clients) > max_lines:
+            lines.append(f"... e mais {len(clients) - max_lines}")
+        event_time = max((client.ended_at for client in clients if client.ended_at), default=datetime.datetime.now())
+        return Reminder(None,
+                        title=f"{len(clients)} clientes expirados",
+                        description="\n".join(lines),
+                        start_time=event_time,
+                        client_ids=[client.id for client in clients])
+
+    def submit_reminders(self, clients):
+        """Enfileira os lembretes dos clientes; a partir de `reminder_summary_min` vira um resumo só."""
+        if len(clients) >= self.reminder_summary_min:
+            self.reminder_dispatcher.submit(self.build_summary_reminder(clients))
+        else:
+            for client in clients:
+                self.reminder_dispatcher.submit(self.build_reminder(client))
+
+    def resubmit_pending_reminders(self):
+        """Reenfileira os lembretes que ficaram pendentes na execução anterior."""
+        pending = self.store.pending_reminders()
+        self.submit_reminders(pending)
+        if pending:
+            log.info('reminders_resubmitted', f"Resubmitted {len(pending)} pending reminder(s).", count=len(pending))
+
+    def _deliver_reminder_results(self, delivered, failed):
+        """Chamado na thread do worker: repassa o resultado do lote para a thread da UI."""
+        Clock.schedule_once(lambda dt: self.on_reminder_results(delivered, failed))
+
+    def on_reminder_results(self, delivered, failed):
+        """Grava a situação de entrega de um lote de lembretes e informa o resultado no info_label."""
+        # Clientes excluídos permanentemente enquanto o lembrete era criado são ignorados pelo store
+        for reminder in delivered + failed:
+            for client_id in reminder.client_ids:
+                self.store.record_reminder_result(client_id, reminder.error is None)
+        self.request_save()
+
+        for reminder in delivered:
+            log.info('reminder_created', f"Lembrete criado: {reminder.title} às {reminder.start_time.strftime('%H:%M:%S')}.",
+                     client_id=reminder.client_id, attempts=reminder.attempts)
+        for reminder in failed:
+            log.error('reminder_failed', f"Erro ao criar lembrete '{reminder.title}' após {reminder.attempts} tentativa(s): {reminder.error}",
+                      client_id=reminder.client_id, attempts=reminder.attempts, error=str(reminder.error))
+        stats.increment('reminders_delivered', len(delivered))
+        stats.increment('reminders_failed', len(failed))
+
+        if failed:
+            error = failed[-1].error
+            if isinstance(error, NotImplementedError):
+                self.info_label.text = f"Erro no lembrete: {error}"
+            else:
+                self.info_label.text = f"Erro ao criar {len(failed)} lembrete(s): {error}"
+        elif len(delivered) == 1:
+            self.info_label.text = f"Lembrete criado: {delivered[0].title}"
+        else:
+            self.info_label.text = f"{len(delivered)} lembretes criados!"
 
-    # >>>>> Método aprimorado para atualizar os timers e mover expirados <<<<<
-    def update_timers(self, dt):
-        """Calcula e atualiza o tempo restante para clientes ATIVOS e move expirados."""
-        now = datetime.datetime.now()
-        expired_clients_this_tick = [] # Lista para clientes que expiram NESTA tick
-
-        # --- Passo 1: Identificar clientes que expiraram nesta tick (Itera sobre a lista de DADOS ativos) ---
-        for client_data in list(self.clients_list): # Usa uma cópia
-            creation_time = client_data.get('creation_time')
-            if creation_time is None:
-                continue
-
-            elapsed_time = now - creation_time
-            time_remaining = self.total_timer_duration - elapsed_time
-
-            if time_remaining.total_seconds() <= 0 and not client_data.get('calendar_event_created', False):
-                 expired_clients_this_tick.append(client_data)
-                 client_data['status'] = 'expired'
-
-
-                 # --- Lógica de Criação de Lembrete (TENTATIVA VIA PLYER) ---
-                 client_name = client_data.get('nome', 'Desconhecido')
-                 client_mac = client_data.get('mac', 'Desconhecido')
-                 event_time = now
-                 event_title = f"Cliente Expirado: {client_name}"
-                 event_description = f"MAC: {client_mac}\nStatus Senha: [Salva]\nCriado em: {creation_time.strftime('%Y-%m-%d %H:%M:%S')}"
-
-                 print(f"\nTempo do cliente {client_name} ({client_mac}) expirou! Tentando criar lembrete...")
-                 self.info_label.text = f"Tempo de {client_name} expirou! Tentando criar lembrete..."
-
-                 if PLYER_CALENDAR_AVAILABLE:
-                     try:
-                         calendar.create_event(
-                             title=event_title,
-                             description=event_description,
-                             start_time=event_time,
-                             end_time=event_time
-                         )
-                         print(f"Lembrete criado para {client_name} às {event_time.strftime('%H:%M:%S')}.")
-                         self.info_label.text = f"Lembrete criado para {client_name}!"
-                         client_data['calendar_event_created'] = True
-
-                     except NotImplementedError:
-                         print("Erro: Backend do Plyer Calendar não implementado para esta plataforma.")
-                         self.info_label.text = "Erro no lembrete: Plyer não implementado."
-                     except Exception as e:
-                         print(f"Erro ao criar lembrete para {client_name}: {e}")
-                         self.info_label.text = f"Erro ao criar lembrete para {client_name}: {e}"
-                 else:
-                     print("Plyer Calendar não disponível. Não foi possível criar lembrete.")
-                     self.info_label.text = "Plyer Calendar não disponível."
-
-
-        # --- Passo 2: Mover os clientes expirados e redesenhar se necessário ---
-        if expired_clients_this_tick:
-             self.clients_list = [client for client in self.clients_list if client not in expired_clients_this_tick]
-             self.expired_clients_list.extend(expired_clients_this_tick)
-
-             print(f"Movidos {len(expired_clients_this_tick)} cliente(s) para a lista de vencidos.")
-             self.update_client_list_display()
-             self.update_expired_list_display()
-             return # Sai da função para evitar atualizar timers dos widgets antigos
-
-
-        # --- Passo 3: Se nenhum cliente expirou nesta tick, atualizar os rótulos dos timers VISÍVEIS ---
-        # Iteramos diretamente sobre a lista de rótulos de timer ativos
-        for timer_label in list(self.active_timer_labels): # Itera sobre uma cópia
-            # Verifica se o rótulo ainda está no layout (ainda visível na lista ativa)
-            if timer_label.parent is None:
-                 if timer_label in self.active_timer_labels:
-                      self.active_timer_labels.remove(timer_label)
-                 continue
 
-            creation_time = getattr(timer_label, 'client_creation_time', None)
+    def refresh_timer_label(self, timer_label, now):
+        """Escreve no rótulo o tempo restante do cliente associado a ele."""
+        deadline = getattr(timer_label, 'client_deadline', None)
 
-            if creation_time is None:
-                 timer_label.text = "Timer: --:--:--"
-                 continue
+        if deadline is None:
+             timer_text = "Timer: --:--:--"
+             if timer_label.text != timer_text:
+                 timer_label.text = timer_text
+             return
 
-            elapsed_time = now - creation_time
-            time_remaining = self.total_timer_duration - elapsed_time
+        # O prazo já foi calculado na criação do cliente
+        time_remaining = deadline - now
 
-            total_seconds = int(time_remaining.total_seconds())
-            if total_seconds < 0:
-                total_seconds = 0
+        total_seconds = int(time_remaining.total_seconds())
+        if total_seconds < 0:
+            total_seconds = 0
 
-            hours = total_seconds // 3600
-            minutes = (total_seconds % 3600) // 60
-            seconds = total_seconds % 60
+        days, remainder = divmod(total_seconds, 86400)
+        hours = remainder // 3600
+        minutes = (remainder % 3600) // 60
+        seconds = remainder % 60
+        if days:
+            # Planos de vários dias
+            timer_text = f"Timer: {days}d {hours:02}:{minutes:02}:{seconds:02}"
+        else:
             timer_text = f"Timer: {hours:02}:{minutes:02}:{seconds:02}"
-
+        # Só toca no rótulo (e na textura) quando o texto realmente mudou
+        if timer_label.text != timer_text:
             timer_label.text = timer_text
 
+    @stats.timed('update_timers')
+    def update_timers(self, now):
+        """Atualiza o tempo restante exibido nos rótulos de timer dos clientes ATIVOS."""
+
+        # --- Atualizar os rótulos dos timers VISÍVEIS ---
+        # Só existem rótulos para as linhas criadas pelo RecycleView (visíveis ou em cache)
+        rows_rendered = 0
+        for timer_label in list(self.active_timer_labels):
+            # Linhas recicladas fora da tela não têm parent
+            client_row = timer_label.parent
+            if client_row is None or client_row.parent is None:
+                 continue
+            self.refresh_timer_label(timer_label, now)
+            rows_rendered += 1
+        stats.set_gauge('rows_rendered', rows_rendered)
+
 
     def show_add_client_popup(self, instance):
         """Cria e exibe uma caixa de diálogo (Popup) para adicionar um novo cliente."""
 
         main_popup_layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
-        input_grid = GridLayout(cols=2, spacing=10, size_hint_y=None, height=220)
+        input_grid = GridLayout(cols=2, spacing=10, size_hint_y=None, height=290)
 
         # CAMPOS DE ENTRADA VISÍVEIS
         input_grid.add_widget(Label(text='MAC:', halign='right', valign='middle'))
@@ -792,6 +1934,12 @@ class MobileApp(App):
         self.nome_input = TextInput(hint_text='Nome do Cliente', multiline=False)
         input_grid.add_widget(self.nome_input)
 
+        # Plano: define a duração do timer deste cliente
+        input_grid.add_widget(Label(text='Plano:', halign='right', valign='middle'))
+        plan_keys_by_label = {plan.label: plan.key for plan in PLANS.values()}
+        self.plan_spinner = Spinner(text=PLANS[DEFAULT_PLAN].label, values=list(plan_keys_by_label))
+        input_grid.add_widget(self.plan_spinner)
+
         main_popup_layout.add_widget(input_grid)
 
         button_layout = BoxLayout(orientation='horizontal', spacing=10, size_hint_y=None, height=50)
@@ -813,51 +1961,37 @@ class MobileApp(App):
             user_name = self.nome_input.text.strip()
 
             if not mac_address or not password or not user_name:
-                 print("Erro: Todos os campos devem ser preenchidos.")
+                 log.warning('client_add_invalid', "Todos os campos devem ser preenchidos.")
                  self.info_label.text = 'Erro: Preencha todos os campos!'
                  return
 
-            already_registered = False
-
-            for client in self.clients_list:
-                if client.get('mac') == mac_address and client.get('senha') == password:
-                    already_registered = True
-                    break
-
-            if not already_registered:
-                 for client in self.expired_clients_list:
-                     if client.get('mac') == mac_address and client.get('senha') == password:
-                         already_registered = True
-                         break
+            # Consulta O(1) no índice (MAC, senha) que cobre as listas ativa e vencida
+            already_registered = self.store.find_duplicate(mac_address, password) is not None
 
             if already_registered:
-                 print(f"\nCliente com MAC {mac_address} e Senha correspondente já cadastrado!")
+                 log.info('client_duplicate', f"Cliente com MAC {mac_address} e Senha correspondente já cadastrado!",
+                          mac=mac_address)
                  self.info_label.text = "Cliente já cadastrado!"
                  add_client_popup.dismiss()
                  self.show_alert_screen(f"Cliente com MAC {mac_address}\nSenha correspondente já foi cadastrado antes.")
                  return
 
-            new_client = {
-                'mac': mac_address,
-                'senha': password,
-                'nome': user_name,
-                'creation_time': datetime.datetime.now(),
-                'calendar_event_created': False,
-                'status': 'active'
-            }
+            plan = plan_keys_by_label.get(self.plan_spinner.text, DEFAULT_PLAN)
+            new_client = self.engine.add_client(mac_address, password, user_name, plan)
+            self.request_save()
+            self.arm_expiry_timer()
 
-            self.clients_list.append(new_client)
-
-            self.update_client_list_display()
+            self.add_active_row(new_client)
 
-            print(f"\nCliente adicionado: {user_name} ({mac_address}) criado em {new_client['creation_time'].strftime('%Y-%m-%d %H:%M:%S')}\n")
+            log.info('client_added', f"Cliente adicionado: {user_name} ({mac_address}) no plano {plan_label(plan)}, criado em {new_client.creation_time.strftime('%Y-%m-%d %H:%M:%S')}",
+                     client_id=new_client.id, plan=plan)
             self.info_label.text = f'Cliente "{user_name}" adicionado! Cronômetro iniciado.'
 
             add_client_popup.dismiss()
 
         def on_cancel(instance):
             """Fecha o popup sem adicionar."""
-            print("Adição de cliente cancelada.")
+            log.debug('client_add_cancelled', "Adição de cliente cancelada.")
             self.info_label.text = 'Adição de cliente cancelada'
             add_client_popup.dismiss()
 
@@ -867,5 +2001,126 @@ class MobileApp(App):
         add_client_popup.open()
 
 
+    # --- Importação em lote (CSV/JSONL): leitura numa thread, gravação e redesenho uma única vez ---
+    def show_import_popup(self, instance):
+        """Exibe um seletor de arquivos .csv/.jsonl para importar clientes em lote."""
+        from kivy.uix.filechooser import FileChooserListView # Importado só no primeiro uso (inicialização mais rápida)
+
+        if self._import_thread is not None:
+            self.info_label.text = 'Já existe uma importação em andamento.'
+            return
+
+        popup_layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
+        popup_layout.add_widget(Label(text='CSV com cabeçalho mac,senha,nome ou JSONL (um objeto por linha)',
+                                      size_hint_y=None, height=30))
+        file_chooser = FileChooserListView(path=os.path.expanduser('~'),
+                                           filters=['*.csv', '*.jsonl', '*.ndjson'])
+        popup_layout.add_widget(file_chooser)
+
+        button_layout = BoxLayout(orientation='horizontal', spacing=10, size_hint_y=None, height=50)
+        cancel_button = Button(text='Cancelar')
+        import_button = Button(text='Importar')
+        button_layout.add_widget(cancel_button)
+        button_layout.add_widget(import_button)
+        popup_layout.add_widget(button_layout)
+
+        import_popup = Popup(title='Importar Clientes',
+                             content=popup_layout,
+                             size_hint=(0.95, 0.9),
+                             auto_dismiss=False)
+
+        def on_import(instance):
+            if not file_chooser.selection:
+                self.info_label.text = 'Selecione um arquivo para importar.'
+                return
+            import_popup.dismiss()
+            self.start_import(file_chooser.selection[0])
+
+        cancel_button.bind(on_press=lambda btn: import_popup.dismiss())
+        import_button.bind(on_press=on_import)
+        import_popup.open()
+
+    def start_import(self, path):
+        """Lê o arquivo em segundo plano mostrando o progresso; os clientes são aplicados na thread da UI."""
+        from kivy.uix.progressbar import ProgressBar
+        from importer import read_import_file
+
+        progress_layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
+        self.import_status_label = Label(text=f"Lendo {os.path.basename(path)}...", halign='center', valign='top')
+        _bind_text_width(self.import_status_label)
+        self.import_progress_bar = ProgressBar(max=1.0, value=0, size_hint_y=None, height=30)
+        progress_layout.add_widget(self.import_progress_bar)
+        progress_layout.add_widget(self.import_status_label)
+        self.import_popup = Popup(title='Importando Clientes',
+                                  content=progress_layout,
+                                  size_hint=(0.9, 0.8),
+                                  auto_dismiss=False)
+        self.import_popup.open()
+
+        def on_progress(fraction, rows_read):
+            Clock.schedule_once(lambda dt: self.on_import_progress(fraction, rows_read))
+
+        def run():
+            try:
+                records, report = read_import_file(path, on_progress)
+            except (OSError, ValueError) as e:
+                log.error('import_failed', f"Failed to import {path}: {e}", path=path, error=str(e))
+                Clock.schedule_once(lambda dt, error=e: self.on_import_failed(path, error))
+                return
+            Clock.schedule_once(lambda dt: self.finish_import(records, report))
+
+        self._import_thread = threading.Thread(target=run, name='client-import', daemon=True)
+        self._import_thread.start()
+
+    def on_import_progress(self, fraction, rows_read):
+        self.import_progress_bar.value = fraction
+        self.import_status_label.text = f"{rows_read} linha(s) lida(s)..."
+
+    def on_import_failed(self, path, error):
+        self._import_thread = None
+        self.import_popup.dismiss()
+        self.info_label.text = f"Erro ao importar {os.path.basename(path)}: {error}"
+
+    def finish_import(self, records, report):
+        """Cadastra os registros lidos numa única transação e atualiza a lista ATIVA uma vez."""
+        self._import_thread = None
+        added = self.engine.import_clients(records, report)
+        self.request_save()
+        if added:
+            self.arm_expiry_timer()
+            self.update_client_list_display()
+
+        report.errors.sort(key=lambda error: error[0] or 0)
+        log.info('import_finished', f"Import of {report.path}: {report.summary()}", path=report.path,
+                 rows_read=report.rows_read, imported=report.imported, duplicates=report.duplicates,
+                 errors=len(report.errors))
+        for line_number, message in report.errors:
+            log.warning('import_row_rejected', f"Import line {line_number}: {message}", path=report.path, line=line_number)
+        self.info_label.text = f"Importação: {report.summary()}"
+        self.show_import_report(report)
+
+    def show_import_report(self, report, max_lines=200):
+        """Mostra o resumo da importação e o erro de cada linha rejeitada (as primeiras `max_lines`)."""
+        self.import_progress_bar.value = 1.0
+        content = self.import_popup.content
+        content.remove_widget(self.import_status_label)
+
+        error_lines = [f"Linha {line_number}: {message}" for line_number, message in report.errors[:max_lines]]
+        if len(report.errors) > max_lines:
+            error_lines.append(f"... e mais {len(report.errors) - max_lines} erro(s) (veja o log).")
+        report_label = Label(text=report.summary() + ('\n\n' + '\n'.join(error_lines) if error_lines else ''),
+                             halign='left', valign='top', size_hint_y=None)
+        report_label.bind(width=lambda instance, width: setattr(instance, 'text_size', (width, None)),
+                          texture_size=lambda instance, size: setattr(instance, 'height', size[1]))
+        report_scroll = ScrollView()
+        report_scroll.add_widget(report_label)
+        content.add_widget(report_scroll)
+
+        close_button = Button(text='Fechar', size_hint_y=None, height=50)
+        close_button.bind(on_press=lambda btn: self.import_popup.dismiss())
+        content.add_widget(close_button)
+        self.import_popup.title = 'Importação Concluída'
+
+
 if __name__ == '__main__':
     MobileApp().run()
\ No newline at end of file
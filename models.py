@@ -0,0 +1,105 @@
+# models.py
+# Modelo compacto de cliente usado pela aplicação e pelo armazenamento.
+
+import datetime
+import uuid
+
+
+def normalize_mac(mac):
+    """Normaliza um endereço MAC para comparação (sem separadores, em maiúsculas)."""
+    return ''.join(char for char in mac.strip().upper() if char.isalnum())
+
+
+class Plan:
+    """Plano vendido ao cliente: define a duração do timer."""
+    __slots__ = ('key', 'label', 'duration')
+
+    def __init__(self, key, label, duration):
+        self.key = key
+        self.label = label
+        self.duration = duration
+
+    def __repr__(self):
+        return f"Plan({self.key!r}, {self.duration})"
+
+
+# Planos oferecidos no cadastro (na ordem exibida); 'diario' é a duração original de 23h55
+PLANS = {plan.key: plan for plan in (
+    Plan('diario', 'Diário', datetime.timedelta(hours=23, minutes=55)),
+    Plan('semanal', 'Semanal', datetime.timedelta(days=7)),
+    Plan('quinzenal', 'Quinzenal', datetime.timedelta(days=15)),
+    Plan('mensal', 'Mensal', datetime.timedelta(days=30)),
+)}
+DEFAULT_PLAN = 'diario'
+
+
+def plan_label(plan_key):
+    """Nome do plano para exibição (planos que não existem mais aparecem pela chave)."""
+    plan = PLANS.get(plan_key)
+    return plan.label if plan is not None else (plan_key or '--')
+
+
+def new_client_id():
+    """Gera o identificador estável de um cliente (chave primária no banco)."""
+    return uuid.uuid4().hex
+
+
+class Client:
+    """Cliente cadastrado (ativo, vencido ou excluído).
+
+    Usa __slots__ para ocupar pouca memória e é comparado por identidade: pode ser guardado
+    em dicionários/conjuntos sem comparar campo a campo. O prazo (`deadline`) é calculado uma
+    única vez a partir de `creation_time` e da duração do plano, que cada cliente guarda
+    (`plan` e `duration`): mudar os planos oferecidos não altera clientes já cadastrados.
+    """
+    __slots__ = ('id', 'mac', 'senha', 'nome', 'creation_time', 'deadline',
+                 'status', 'calendar_event_created', 'ended_at', 'reminder_status',
+                 'plan', 'duration')
+
+    def __init__(self, mac, senha, nome, creation_time=None, deadline=None, status='active',
+                 calendar_event_created=False, ended_at=None, reminder_status=None, id=None,
+                 plan=DEFAULT_PLAN, duration=None):
+        self.id = id or new_client_id()
+        self.mac = mac
+        self.senha = senha
+        self.nome = nome
+        self.creation_time = creation_time
+        self.deadline = deadline
+        self.status = status
+        self.calendar_event_created = calendar_event_created
+        self.ended_at = ended_at # Momento em que saiu da lista ativa (vencido/excluído)
+        self.reminder_status = reminder_status # None, 'pending', 'sent' ou 'failed'
+        self.plan = plan
+        self.duration = duration if duration is not None else PLANS[DEFAULT_PLAN].duration
+
+    def __repr__(self):
+        return f"Client({self.nome!r}, mac={self.mac!r}, status={self.status!r})"
+
+    @property
+    def is_active(self):
+        return self.status == 'active'
+
+    @classmethod
+    def from_dict(cls, data, duration):
+        """Cria o cliente a partir do formato dict/JSON ({'mac', 'senha', 'nome', 'creation_time', ...})."""
+        creation_time = data.get('creation_time')
+        if not isinstance(creation_time, datetime.datetime):
+            creation_time = None
+        deadline = creation_time + duration if creation_time is not None else None
+        return cls(mac=data.get('mac', ''), senha=data.get('senha', ''), nome=data.get('nome', ''),
+                   creation_time=creation_time, deadline=deadline,
+                   status=data.get('status', 'active'),
+                   calendar_event_created=bool(data.get('calendar_event_created', False)),
+                   id=data.get('id'), duration=duration)
+
+    def to_dict(self):
+        """Converte para o formato dict/JSON usado pelo antigo client_data.json."""
+        return {
+            'id': self.id,
+            'mac': self.mac,
+            'senha': self.senha,
+            'nome': self.nome,
+            'creation_time': self.creation_time,
+            'calendar_event_created': self.calendar_event_created,
+            'status': self.status,
+        }
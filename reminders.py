@@ -0,0 +1,138 @@
+# reminders.py
+# Criação dos lembretes de calendário fora da thread da UI, com lotes e novas tentativas.
+
+import heapq
+import itertools
+import random
+import threading
+import time
+
+from instrumentation import get_logger
+
+log = get_logger('reminders')
+
+
+class Reminder:
+    """Lembrete de calendário a ser criado para um cliente que expirou.
+
+    Um lembrete-resumo cobre vários clientes (`client_ids`); nesse caso `client_id` é None.
+    """
+    __slots__ = ('client_id', 'client_ids', 'title', 'description', 'start_time', 'attempts', 'error')
+
+    def __init__(self, client_id, title, description, start_time, client_ids=None):
+        self.client_id = client_id
+        self.client_ids = list(client_ids) if client_ids is not None else [client_id]
+        self.title = title
+        self.description = description
+        self.start_time = start_time
+        self.attempts = 0
+        self.error = None
+
+    def __repr__(self):
+        return f"Reminder({self.title!r}, attempts={self.attempts})"
+
+
+class ReminderDispatcher:
+    """Fila de lembretes processada por `workers` threads em segundo plano.
+
+    Cada thread retira um lote de até `batch_size` lembretes prontos, chama `create_event(reminder)`
+    para cada um e entrega o resultado do lote inteiro de uma vez em `on_results(delivered, failed)`
+    (na thread do worker: quem usa Kivy deve repassar com Clock.schedule_once).
+    Falhas são tentadas de novo com backoff exponencial até `max_attempts`; NotImplementedError
+    (backend de calendário inexistente) é definitiva e não é repetida.
+    """
+    def __init__(self, create_event, on_results, workers=1, batch_size=10,
+                 max_attempts=5, base_delay=2.0, max_delay=300.0):
+        self.create_event = create_event
+        self.on_results = on_results
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._queue = [] # heap de (pronto_em, seq, lembrete)
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+    def __len__(self):
+        with self._condition:
+            return len(self._queue)
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'reminder-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=1.0):
+        """Encerra os workers; lembretes ainda na fila continuam 'pending' no banco e são reenviados na próxima execução."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, reminder, delay=0.0):
+        """Enfileira um lembrete (pode ser chamado de qualquer thread)."""
+        with self._condition:
+            heapq.heappush(self._queue, (time.monotonic() + delay, next(self._counter), reminder))
+            self._condition.notify()
+
+    def backoff_delay(self, attempts):
+        """Atraso antes da tentativa seguinte: exponencial, limitado a max_delay, com um pouco de jitter."""
+        delay = min(self.base_delay * (2 ** (attempts - 1)), self.max_delay)
+        return delay * random.uniform(0.8, 1.2)
+
+    def _take_batch(self):
+        """Espera até haver lembretes prontos e retira um lote (ou None se estiver encerrando)."""
+        with self._condition:
+            while True:
+                if self._stopping:
+                    return None
+                now = time.monotonic()
+                if self._queue and self._queue[0][0] <= now:
+                    batch = []
+                    while self._queue and self._queue[0][0] <= now and len(batch) < self.batch_size:
+                        batch.append(heapq.heappop(self._queue)[2])
+                    return batch
+                timeout = self._queue[0][0] - now if self._queue else None
+                self._condition.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+
+            delivered = []
+            failed = []
+            for reminder in batch:
+                reminder.attempts += 1
+                try:
+                    self.create_event(reminder)
+                except NotImplementedError as e:
+                    reminder.error = e
+                    failed.append(reminder)
+                except Exception as e:
+                    reminder.error = e
+                    if reminder.attempts < self.max_attempts:
+                        delay = self.backoff_delay(reminder.attempts)
+                        log.warning('reminder_retry', f"Reminder for {reminder.client_id} failed ({e}); retrying in {delay:.0f}s",
+                                    client_id=reminder.client_id, attempts=reminder.attempts, delay=round(delay, 1),
+                                    error=str(e))
+                        self.submit(reminder, delay)
+                    else:
+                        failed.append(reminder)
+                else:
+                    reminder.error = None
+                    delivered.append(reminder)
+
+            if delivered or failed:
+                try:
+                    self.on_results(delivered, failed)
+                except Exception as e:
+                    log.error('reminder_callback_failed', f"Reminder result callback failed: {e}", error=str(e))
@@ -0,0 +1,555 @@
+# storage.py
+# Armazenamento dos clientes em SQLite (módulo sqlite3 da biblioteca padrão).
+
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from instrumentation import get_logger, stats
+from models import DEFAULT_PLAN, PLANS, Client, normalize_mac
+
+log = get_logger('storage')
+
+
+def _to_iso(value):
+    return value.isoformat() if isinstance(value, datetime.datetime) else None
+
+def _from_iso(value):
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    id TEXT PRIMARY KEY,
+    mac TEXT NOT NULL,
+    senha TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    creation_time TEXT,
+    deadline TEXT,
+    status TEXT NOT NULL DEFAULT 'active',
+    calendar_event_created INTEGER NOT NULL DEFAULT 0,
+    ended_at TEXT,
+    reminder_status TEXT,
+    mac_key TEXT,
+    plan TEXT,
+    duration INTEGER,
+    action_status TEXT
+);
+CREATE TABLE IF NOT EXISTS archived_keys (
+    mac TEXT NOT NULL,
+    senha TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    archive TEXT NOT NULL,
+    PRIMARY KEY (mac, senha)
+);
+"""
+
+# Índices criados depois da atualização do esquema (podem usar colunas adicionadas por ela)
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_clients_status ON clients (status);
+CREATE INDEX IF NOT EXISTS idx_clients_deadline ON clients (deadline);
+CREATE INDEX IF NOT EXISTS idx_clients_key ON clients (mac_key, senha);
+CREATE INDEX IF NOT EXISTS idx_clients_ended ON clients (ended_at);
+CREATE INDEX IF NOT EXISTS idx_clients_actions ON clients (action_status) WHERE action_status = 'pending';
+"""
+
+_COLUMNS = ("id, mac, senha, nome, creation_time, deadline, status, calendar_event_created, ended_at, reminder_status, "
+            "plan, duration")
+# Na gravação entra também o MAC normalizado (chave da verificação de duplicidade no banco)
+_INSERT_COLUMNS = _COLUMNS + ", mac_key"
+_PLACEHOLDERS = ", ".join("?" * len(_INSERT_COLUMNS.split(", ")))
+
+# Versão do esquema gravada em PRAGMA user_version; cada passo atualiza bancos criados por versões anteriores
+SCHEMA_VERSION = 5
+_SCHEMA_UPGRADES = {
+    2: [("reminder_status", "ALTER TABLE clients ADD COLUMN reminder_status TEXT")],
+    3: [("mac_key", "ALTER TABLE clients ADD COLUMN mac_key TEXT")],
+    4: [("plan", "ALTER TABLE clients ADD COLUMN plan TEXT"),
+        ("duration", "ALTER TABLE clients ADD COLUMN duration INTEGER")],
+    # Fila das ações do daemon: quem já tinha vencido antes da v5 fica NULL (nada a disparar)
+    5: [("action_status", "ALTER TABLE clients ADD COLUMN action_status TEXT")],
+}
+
+# Ao gravar o status: a passagem para 'expired' enfileira as ações do daemon ('pending'), regravar 'expired'
+# mantém a situação atual (as ações não disparam duas vezes) e qualquer outro status (reativação) limpa a fila
+_ACTION_STATUS_UPDATE = ("action_status = CASE WHEN ? != 'expired' THEN NULL WHEN status = 'expired' THEN action_status "
+                         "ELSE 'pending' END")
+
+
+class CheckpointWorker(threading.Thread):
+    """Thread em segundo plano que incorpora o journal (WAL) ao arquivo principal do banco.
+
+    Os commits só acrescentam ao WAL; o fsync do banco acontece aqui, em lote, a cada `interval`
+    segundos ou quando `request()` é chamado. Usa uma conexão própria para não tocar na da UI.
+    """
+    def __init__(self, path, interval=30.0):
+        super().__init__(name='wal-checkpoint', daemon=True)
+        self.path = path
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopping = False
+
+    def run(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            while not self._stopping:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+                try:
+                    conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                except sqlite3.Error as e:
+                    log.error('wal_checkpoint_failed', f"WAL checkpoint failed: {e}", error=str(e))
+        finally:
+            conn.close()
+
+    def request(self):
+        """Pede uma compactação imediata (por exemplo, quando o app vai para segundo plano)."""
+        self._wake.set()
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+        self.join()
+
+
+class AutoSaveWorker(threading.Thread):
+    """Thread que faz o commit das alterações fora da thread da UI, agrupando rajadas de mutações.
+
+    Cada mutação já escreveu a sua linha na transação aberta; `request()` só avisa que há algo a
+    gravar. O commit acontece quando passam `delay` segundos sem novos pedidos (ou `max_delay`
+    depois do primeiro, para uma sequência longa não adiar a gravação indefinidamente).
+    `on_saved(pedidos, segundos, erro)` é chamado na thread do worker após cada commit.
+    """
+    def __init__(self, database, on_saved=None, delay=0.5, max_delay=3.0):
+        super().__init__(name='autosave', daemon=True)
+        self.database = database
+        self.on_saved = on_saved
+        self.delay = delay
+        self.max_delay = max_delay
+        self._condition = threading.Condition()
+        self._pending = 0 # Pedidos desde o último commit
+        self._first_request = None
+        self._last_request = None
+        self._stopping = False
+
+    def request(self):
+        """Marca que há alterações a gravar (barato: pode ser chamado a cada clique)."""
+        with self._condition:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_request = now
+            self._pending += 1
+            self._last_request = now
+            self._condition.notify()
+
+    def _take_pending(self):
+        """Espera a rajada de pedidos terminar e retorna quantos foram agrupados (0 se estiver encerrando)."""
+        with self._condition:
+            while not self._pending and not self._stopping:
+                self._condition.wait()
+            while self._pending and not self._stopping:
+                now = time.monotonic()
+                due = min(self._last_request + self.delay, self._first_request + self.max_delay)
+                if now >= due:
+                    break
+                self._condition.wait(due - now)
+            pending = self._pending
+            self._pending = 0
+            return pending
+
+    def run(self):
+        while True:
+            pending = self._take_pending()
+            if pending:
+                self._commit(pending)
+            elif self._stopping:
+                return
+
+    def _commit(self, pending):
+        start = time.perf_counter()
+        error = None
+        try:
+            self.database.commit()
+        except sqlite3.Error as e:
+            # As alterações continuam na transação aberta: o próximo commit tenta de novo
+            error = e
+            log.error('autosave_failed', f"Autosave failed: {e}", pending=pending, error=str(e))
+        seconds = time.perf_counter() - start
+        stats.record('autosave', seconds)
+        stats.increment('autosave_requests', pending)
+        if self.on_saved is not None:
+            try:
+                self.on_saved(pending, seconds, error)
+            except Exception as e:
+                log.error('autosave_callback_failed', f"Autosave result callback failed: {e}", error=str(e))
+
+    def flush(self):
+        """Grava já, na thread que chamou, o que estiver pendente (ex.: o app vai para segundo plano)."""
+        with self._condition:
+            self._pending = 0
+        self.database.commit()
+
+    def stop(self):
+        """Encerra a thread depois de gravar os pedidos pendentes."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self.join()
+
+
+class ClientDatabase:
+    """Banco SQLite com uma linha por cliente (ativos, vencidos e excluídos na mesma tabela).
+
+    Cada alteração escreve apenas a linha do cliente afetado; `commit()` grava a transação.
+    O banco usa journal WAL: um commit é só um append ao journal (seguro se o processo for morto),
+    o fsync é feito em lote pelo CheckpointWorker e, ao abrir, o SQLite reaplica o final do journal.
+    Com `check_same_thread=False` a conexão pode ser usada por outras threads (carga inicial e
+    AutoSaveWorker); `lock` é mantido pelo commit e por cada escrita, que assim nunca se misturam.
+    Quem faz mais de uma escrita que precisa ser gravada junta (ex.: arquivar e remover) faz todas
+    dentro de `with database.lock`, para o commit não cair entre elas.
+    """
+    def __init__(self, path, check_same_thread=True):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+        self.lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # O checkpoint automático rodaria dentro do commit (na thread da UI): fica com o CheckpointWorker
+        self.conn.execute("PRAGMA wal_autocheckpoint=0")
+        self.conn.executescript(_SCHEMA)
+        self._upgrade_schema()
+        self.conn.executescript(_INDEXES)
+        self.conn.commit()
+        self.checkpointer = None
+
+    def _upgrade_schema(self):
+        """Adiciona as colunas que faltam em bancos criados por versões anteriores do app."""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(clients)")}
+        for target_version in range(version + 1, SCHEMA_VERSION + 1):
+            for column, statement in _SCHEMA_UPGRADES.get(target_version, []):
+                if column not in columns:
+                    self.conn.execute(statement)
+        if version < 3:
+            self._backfill_v3()
+        if version < 4:
+            # Antes dos planos todos os clientes tinham a duração única de 23h55
+            self.conn.execute("UPDATE clients SET plan = ?, duration = ? WHERE plan IS NULL",
+                              (DEFAULT_PLAN, int(PLANS[DEFAULT_PLAN].duration.total_seconds())))
+            # A duplicidade é verificada por (mac_key, senha) desde a v3: o índice por (mac, senha) não é mais usado
+            self.conn.execute("DROP INDEX IF EXISTS idx_clients_mac_senha")
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _backfill_v3(self):
+        """Preenche o MAC normalizado e garante `ended_at` em todo cliente fora da lista ativa (ordem das páginas)."""
+        rows = self.conn.execute("SELECT id, mac FROM clients WHERE mac_key IS NULL").fetchall()
+        self.conn.executemany("UPDATE clients SET mac_key = ? WHERE id = ?",
+                              ((normalize_mac(mac), client_id) for client_id, mac in rows))
+        self.conn.execute("UPDATE clients SET ended_at = COALESCE(creation_time, '') "
+                          "WHERE status != 'active' AND ended_at IS NULL")
+
+    def start_background_checkpoints(self, interval=30.0):
+        """Inicia a compactação periódica do journal em segundo plano."""
+        if self.checkpointer is None:
+            self.checkpointer = CheckpointWorker(self.path, interval)
+            self.checkpointer.start()
+
+    def request_checkpoint(self):
+        if self.checkpointer is not None:
+            self.checkpointer.request()
+
+    def close(self):
+        if self.checkpointer is not None:
+            self.checkpointer.stop()
+            self.checkpointer = None
+        with self.lock:
+            if self.conn is not None:
+                self.conn.commit()
+                # Incorpora todo o journal ao banco e zera o arquivo WAL antes de sair
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self.conn.close()
+                self.conn = None
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+
+    def data_version(self):
+        """Muda sempre que OUTRA conexão (ex.: o app e o daemon no mesmo banco) faz um commit."""
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0]
+
+    def count_ended(self):
+        """Quantidade de clientes vencidos/excluídos (histórico ainda no banco)."""
+        return self.conn.execute("SELECT COUNT(*) FROM clients WHERE status != 'active'").fetchone()[0]
+
+    @staticmethod
+    def _row_to_client(row):
+        """Converte uma linha do banco no Client usado pela aplicação."""
+        (client_id, mac, senha, nome, creation_time, deadline, status, calendar_event_created, ended_at, reminder_status,
+         plan, duration) = row
+        return Client(mac, senha, nome,
+                      creation_time=_from_iso(creation_time), deadline=_from_iso(deadline),
+                      status=status, calendar_event_created=bool(calendar_event_created),
+                      ended_at=_from_iso(ended_at), reminder_status=reminder_status, id=client_id,
+                      plan=plan or DEFAULT_PLAN,
+                      duration=datetime.timedelta(seconds=duration) if duration is not None else None)
+
+    def load_active_clients(self):
+        """Retorna os clientes ATIVOS na ordem de cadastro (o histórico de vencidos fica no banco)."""
+        return [self._row_to_client(row) for row in self.conn.execute(
+            f"SELECT {_COLUMNS} FROM clients WHERE status = 'active' ORDER BY rowid")]
+
+    def load_ended_clients(self, reminder_status):
+        """Retorna os vencidos/excluídos com a situação de lembrete informada (ex.: os 'pending' a reenviar)."""
+        return [self._row_to_client(row) for row in self.conn.execute(
+            f"SELECT {_COLUMNS} FROM clients WHERE status != 'active' AND reminder_status = ? ORDER BY ended_at, rowid",
+            (reminder_status,))]
+
+    def iter_ended_search_keys(self, batch_size=5000):
+        """Percorre (id, nome, mac, status, ended_at, rowid) do histórico, do mais antigo ao mais recente, para o índice de busca."""
+        cursor = self.conn.execute("SELECT id, nome, mac, status, ended_at, rowid FROM clients WHERE status != 'active' "
+                                   "ORDER BY ended_at, rowid")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+    def rowids(self, client_ids):
+        """{client.id: rowid} dos clientes informados (o rowid desempata a ordem do histórico)."""
+        client_ids = list(client_ids)
+        found = {}
+        for start in range(0, len(client_ids), 500): # Limite de parâmetros por consulta do SQLite
+            chunk = client_ids[start:start + 500]
+            found.update(self.conn.execute(
+                f"SELECT id, rowid FROM clients WHERE id IN ({', '.join('?' * len(chunk))})", chunk))
+        return found
+
+    def get_clients(self, client_ids):
+        """Carrega os clientes com os ids informados, na mesma ordem (ids inexistentes são ignorados)."""
+        found = {}
+        client_ids = list(client_ids)
+        for start in range(0, len(client_ids), 500): # Limite de parâmetros por consulta do SQLite
+            chunk = client_ids[start:start + 500]
+            query = f"SELECT {_COLUMNS} FROM clients WHERE id IN ({', '.join('?' * len(chunk))})"
+            for row in self.conn.execute(query, chunk):
+                found[row[0]] = self._row_to_client(row)
+        return [found[client_id] for client_id in client_ids if client_id in found]
+
+    def find_ended(self, mac_key, senha):
+        """Retorna o cliente vencido/excluído com este par (MAC normalizado, senha), ou None."""
+        row = self.conn.execute(
+            f"SELECT {_COLUMNS} FROM clients WHERE mac_key = ? AND senha = ? AND status != 'active' LIMIT 1",
+            (mac_key, senha)).fetchone()
+        return self._row_to_client(row) if row is not None else None
+
+    def find_ended_many(self, keys):
+        """Como `find_ended` para vários pares (MAC normalizado, senha): retorna {par: cliente} só dos encontrados.
+
+        Uma consulta por bloco de MACs (em vez de uma por par), usada na importação em lote.
+        """
+        keys = set(keys)
+        mac_keys = sorted({mac_key for mac_key, _ in keys})
+        found = {}
+        for start in range(0, len(mac_keys), 500): # Limite de parâmetros por consulta do SQLite
+            chunk = mac_keys[start:start + 500]
+            query = (f"SELECT mac_key, {_COLUMNS} FROM clients "
+                     f"WHERE mac_key IN ({', '.join('?' * len(chunk))}) AND status != 'active'")
+            for row in self.conn.execute(query, chunk):
+                key = (row[0], row[3])
+                if key in keys and key not in found:
+                    found[key] = self._row_to_client(row[1:])
+        return found
+
+    def page_ended_clients(self, limit, after=None):
+        """Uma página do histórico, do mais recente ao mais antigo, paginada pela chave (ended_at, rowid).
+
+        Retorna (clientes, cursor); passe o cursor em `after` para buscar a página seguinte
+        (None quando não há mais). O custo não depende do tamanho do histórico (usa idx_clients_ended).
+        """
+        if after is None:
+            rows = self.conn.execute(
+                f"SELECT rowid, {_COLUMNS} FROM clients WHERE status != 'active' "
+                "ORDER BY ended_at DESC, rowid DESC LIMIT ?", (limit,)).fetchall()
+        else:
+            rows = self.conn.execute(
+                f"SELECT rowid, {_COLUMNS} FROM clients WHERE status != 'active' AND (ended_at, rowid) < (?, ?) "
+                "ORDER BY ended_at DESC, rowid DESC LIMIT ?", (*after, limit)).fetchall()
+        clients = [self._row_to_client(row[1:]) for row in rows]
+        cursor = (rows[-1][9], rows[-1][0]) if len(rows) == limit else None
+        return clients, cursor
+
+    @staticmethod
+    def _client_params(client):
+        return (client.id, client.mac, client.senha, client.nome,
+                _to_iso(client.creation_time), _to_iso(client.deadline),
+                client.status, int(client.calendar_event_created), _to_iso(client.ended_at),
+                client.reminder_status, client.plan, int(client.duration.total_seconds()),
+                normalize_mac(client.mac))
+
+    def _write(self, statement, params=()):
+        """Executa uma escrita com `lock`: nunca no meio de um commit feito por outra thread (AutoSaveWorker)."""
+        with self.lock:
+            return self.conn.execute(statement, params)
+
+    def _write_many(self, statement, rows):
+        with self.lock:
+            return self.conn.executemany(statement, rows)
+
+    def insert_client(self, client):
+        """Insere a linha de um novo cliente."""
+        self._write(f"INSERT INTO clients ({_INSERT_COLUMNS}) VALUES ({_PLACEHOLDERS})",
+                          self._client_params(client))
+
+    def insert_many(self, clients):
+        """Insere (ou substitui) vários clientes de uma vez."""
+        self._write_many(f"INSERT OR REPLACE INTO clients ({_INSERT_COLUMNS}) VALUES ({_PLACEHOLDERS})",
+                              (self._client_params(client) for client in clients))
+
+    @staticmethod
+    def _status_params(client):
+        return (client.status, client.status, int(client.calendar_event_created), _to_iso(client.ended_at),
+                client.reminder_status, client.id)
+
+    def update_status(self, client):
+        """Grava status, situação do lembrete e o momento em que o cliente saiu da lista ativa; retorna False se a linha não existe.
+
+        Na mesma escrita, a passagem para 'expired' deixa as ações do daemon pendentes (ver `load_pending_actions`).
+        """
+        return self._write(f"UPDATE clients SET {_ACTION_STATUS_UPDATE}, status = ?, calendar_event_created = ?, "
+                           "ended_at = ?, reminder_status = ? WHERE id = ?", self._status_params(client)).rowcount > 0
+
+    def update_status_many(self, clients):
+        """Grava o status de vários clientes com um único executemany (ações em lote)."""
+        self._write_many(f"UPDATE clients SET {_ACTION_STATUS_UPDATE}, status = ?, calendar_event_created = ?, "
+                         "ended_at = ?, reminder_status = ? WHERE id = ?",
+                         (self._status_params(client) for client in clients))
+
+    def load_pending_actions(self):
+        """Vencidos cujas ações do daemon ainda não terminaram, na ordem em que venceram (quem os expirou não importa)."""
+        return [self._row_to_client(row) for row in self.conn.execute(
+            f"SELECT {_COLUMNS} FROM clients WHERE action_status = 'pending' AND status = 'expired' "
+            "ORDER BY ended_at, rowid")]
+
+    def finish_actions(self, clients):
+        """Marca como concluídas as ações dos clientes; quem foi reativado ou apagado nesse meio-tempo fica como está.
+
+        Retorna quantas linhas mudaram.
+        """
+        return self._write_many("UPDATE clients SET action_status = 'done' WHERE id = ? AND action_status = 'pending'",
+                                ((client.id,) for client in clients)).rowcount
+
+    def update_deadline(self, client):
+        """Grava apenas o novo prazo do cliente (renovação/extensão)."""
+        self._write("UPDATE clients SET deadline = ? WHERE id = ?", (_to_iso(client.deadline), client.id))
+
+    def update_reminder_status(self, client_id, reminder_status, calendar_event_created=None):
+        """Grava apenas a situação do lembrete; retorna False se o cliente não existe mais (ou foi reativado)."""
+        if calendar_event_created is None:
+            cursor = self._write("UPDATE clients SET reminder_status = ? WHERE id = ? AND status != 'active'",
+                                       (reminder_status, client_id))
+        else:
+            cursor = self._write("UPDATE clients SET reminder_status = ?, calendar_event_created = ? "
+                                       "WHERE id = ? AND status != 'active'",
+                                       (reminder_status, int(calendar_event_created), client_id))
+        return cursor.rowcount > 0
+
+    def delete_client(self, client):
+        """Remove permanentemente a linha do cliente; retorna False se ela não existia."""
+        return self._write("DELETE FROM clients WHERE id = ?", (client.id,)).rowcount > 0
+
+    def delete_many(self, clients):
+        """Remove permanentemente as linhas de vários clientes de uma vez; retorna quantas existiam."""
+        return self._write_many("DELETE FROM clients WHERE id = ?", ((client.id,) for client in clients)).rowcount
+
+    def delete_ended(self, before=None):
+        """Remove todo o histórico de vencidos/excluídos (ou só quem saiu da lista ativa antes de `before`)."""
+        if before is None:
+            return self._write("DELETE FROM clients WHERE status != 'active'").rowcount
+        return self._write("DELETE FROM clients WHERE status != 'active' AND ended_at < ?",
+                                 (_to_iso(before),)).rowcount
+
+    def iter_ended_clients(self, batch_size=1000):
+        """Percorre os clientes vencidos/excluídos na ordem em que saíram da lista ativa, em blocos (sem montar a lista inteira)."""
+        cursor = self.conn.execute(f"SELECT {_COLUMNS} FROM clients WHERE status != 'active' ORDER BY ended_at, rowid")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield self._row_to_client(row)
+
+    def insert_archived_keys(self, keys, archive):
+        """Guarda os pares (mac normalizado, senha) de clientes arquivados, para a verificação de duplicidade."""
+        self._write_many("INSERT OR REPLACE INTO archived_keys (mac, senha, nome, archive) VALUES (?, ?, ?, ?)",
+                              ((mac, senha, nome, archive) for mac, senha, nome in keys))
+
+    def find_archived(self, mac, senha):
+        """Retorna (nome, arquivo) do cliente arquivado com este par já normalizado, ou None."""
+        return self.conn.execute("SELECT nome, archive FROM archived_keys WHERE mac = ? AND senha = ?",
+                                 (mac, senha)).fetchone()
+
+    def find_archived_many(self, keys):
+        """Como `find_archived` para vários pares já normalizados: retorna {par: (nome, arquivo)} só dos encontrados."""
+        keys = set(keys)
+        macs = sorted({mac for mac, _ in keys})
+        found = {}
+        for start in range(0, len(macs), 500):
+            chunk = macs[start:start + 500]
+            query = f"SELECT mac, senha, nome, archive FROM archived_keys WHERE mac IN ({', '.join('?' * len(chunk))})"
+            for mac, senha, nome, archive in self.conn.execute(query, chunk):
+                if (mac, senha) in keys:
+                    found[(mac, senha)] = (nome, archive)
+        return found
+
+
+# --- Formato JSON dos clientes (antigo client_data.json, lido só na migração) ---
+# O esquema tem um único campo de data: só ele é convertido, os demais ficam como texto
+# (um nome que "parece" uma data continua sendo um nome).
+CLIENT_DATETIME_FIELDS = ('creation_time',)
+
+
+def _parse_datetime(value):
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+def decode_client(json_object):
+    """Converte um objeto JSON de cliente, interpretando como datetime apenas os campos de data do esquema."""
+    for field in CLIENT_DATETIME_FIELDS:
+        if field in json_object:
+            json_object[field] = _parse_datetime(json_object[field])
+    return json_object
+
+
+def read_legacy_json(path):
+    """Lê o antigo client_data.json ({'active': [...], 'expired': [...]}) e retorna (ativos, vencidos) como dicts."""
+    with open(path, 'r') as f:
+        loaded_data = json.load(f)
+
+    if not isinstance(loaded_data, dict):
+        return [], []
+
+    def decode_list(key):
+        items = loaded_data.get(key)
+        if not isinstance(items, list):
+            return []
+        return [decode_client(item) for item in items if isinstance(item, dict)]
+
+    return decode_list('active'), decode_list('expired')
+
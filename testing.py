@@ -0,0 +1,17 @@
+# testing.py
+# Utilitários compartilhados pelos testes (tests/) e benchmarks (benchmarks/).
+# Não importa Kivy: o núcleo (engine, daemon, storage) recebe o relógio por injeção.
+
+import datetime
+
+
+class ManualClock:
+    """Relógio injetável: só avança quando o teste ou o benchmark manda."""
+    def __init__(self, start=None):
+        self.now = start or datetime.datetime(2024, 1, 1, 8, 0, 0)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, **kwargs):
+        self.now += datetime.timedelta(**kwargs)
@@ -0,0 +1,25 @@
+# conftest.py
+# Fixtures comuns: o relógio manual e um banco SQLite temporário.
+# Os testes cobrem só o núcleo sem interface (engine, daemon, storage, importer, archive): não precisam de Kivy.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from storage import ClientDatabase
+from testing import ManualClock
+
+
+@pytest.fixture
+def clock():
+    return ManualClock()
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = ClientDatabase(str(tmp_path / 'client_data.db'))
+    yield database
+    database.close()
@@ -0,0 +1,110 @@
+# test_archive.py
+# Arquivos de arquivamento/exportação (archive.write_archive/read_archive) e a política de retenção.
+
+import datetime
+import os
+
+import pytest
+
+from archive import RetentionPolicy, read_archive, write_archive
+from engine import ClientStore, TimerEngine
+from models import Client
+
+
+def make_client(i, now):
+    return Client(f"AA:BB:CC:00:00:{i:02X}", f"senha{i}", f"Cliente {i}, \"{i}\"",
+                  creation_time=now, deadline=now + datetime.timedelta(days=7), status='expired',
+                  calendar_event_created=i % 2 == 0, ended_at=now + datetime.timedelta(seconds=i),
+                  reminder_status='sent', plan='semanal', duration=datetime.timedelta(days=7))
+
+
+@pytest.mark.parametrize('name', ['expired.jsonl', 'expired.csv', 'expired.jsonl.gz', 'expired.csv.gz'])
+def test_write_then_read_returns_the_same_clients(tmp_path, clock, name):
+    clients = [make_client(i, clock()) for i in range(5)]
+    path = str(tmp_path / name)
+
+    assert write_archive(path, iter(clients)) == len(clients)
+    restored = list(read_archive(path))
+
+    fields = ('id', 'mac', 'senha', 'nome', 'creation_time', 'deadline', 'status',
+              'calendar_event_created', 'ended_at', 'reminder_status', 'plan', 'duration')
+    assert [[getattr(client, field) for field in fields] for client in restored] == \
+           [[getattr(client, field) for field in fields] for client in clients]
+    assert os.listdir(tmp_path) == [name]
+
+
+def test_failed_write_keeps_the_previous_file_and_no_tmp(tmp_path, clock):
+    path = str(tmp_path / 'expired.jsonl')
+    write_archive(path, [make_client(1, clock())])
+
+    def broken():
+        yield make_client(2, clock())
+        raise OSError("disco cheio")
+    with pytest.raises(OSError):
+        write_archive(path, broken())
+
+    assert [client.nome for client in read_archive(path)] == [make_client(1, clock()).nome]
+    assert os.listdir(tmp_path) == ['expired.jsonl']
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        write_archive(str(tmp_path / 'expired.txt'), [])
+
+
+def test_archive_expired_moves_the_oldest_to_a_file(tmp_path, database, clock):
+    store = ClientStore(database, clock=clock)
+    engine = TimerEngine(store)
+    clients = [engine.add_client(f"AA:BB:CC:00:00:{i:02X}", f"senha{i}", f"Cliente {i}") for i in range(4)]
+    for client in clients:
+        engine.delete_manual(client)
+        clock.advance(seconds=1)
+    database.update_reminder_status(clients[0].id, 'pending') # Lembrete pendente nunca é arquivado
+    database.commit()
+    store.load()
+
+    path, count = store.archive_expired(RetentionPolicy(max_count=1, low_water=1.0), str(tmp_path / 'archive'))
+
+    assert count == 2
+    assert [client.nome for client in read_archive(path)] == ['Cliente 1', 'Cliente 2']
+    assert database.count_ended() == 2
+    assert store.ended_count == 2
+    duplicate = store.find_duplicate('aa:bb:cc:00:00:01', 'senha1')
+    assert duplicate is not None and duplicate.status == 'archived'
+
+
+def test_retention_archives_down_to_the_low_water_mark(tmp_path, database, clock):
+    store = ClientStore(database, clock=clock)
+    engine = TimerEngine(store)
+    policy = RetentionPolicy(max_count=10) # Marca baixa: 8
+    archive_dir = str(tmp_path / 'archive')
+    archived = []
+    for i in range(20): # Uma expiração por vez, como no app
+        engine.delete_manual(engine.add_client(f"AA:BB:CC:00:00:{i:02X}", f"senha{i}", f"Cliente {i}"))
+        clock.advance(seconds=1)
+        if policy.exceeds_count(store.ended_count):
+            archived.append(store.archive_expired(policy, archive_dir)[1])
+
+    assert archived == [3, 3, 3, 3] # Cada arquivo junta vários clientes, não um por expiração
+    assert len(os.listdir(archive_dir)) == 4
+    assert store.ended_count == database.count_ended() == 8
+
+
+def test_finish_archive_keeps_clients_changed_after_selection(tmp_path, database, clock):
+    store = ClientStore(database, clock=clock)
+    engine = TimerEngine(store)
+    clients = [engine.add_client(f"AA:BB:CC:00:00:{i:02X}", f"senha{i}", f"Cliente {i}") for i in range(3)]
+    for client in clients:
+        engine.delete_manual(client)
+        clock.advance(seconds=1)
+
+    selected = store.select_for_archive(RetentionPolicy(max_count=0))
+    path = store.new_archive_path(str(tmp_path / 'archive'))
+    write_archive(path, selected) # No app: numa thread, enquanto a interface segue
+    engine.renew(clients[0])
+    engine.purge(clients[1])
+
+    assert store.finish_archive(selected, path) == 1
+    assert clients[0].is_active and store.find_duplicate(clients[0].mac, clients[0].senha) is clients[0]
+    assert database.count_ended() == 0 and store.ended_count == 0
+    assert store.find_duplicate(clients[2].mac, clients[2].senha).status == 'archived'
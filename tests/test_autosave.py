@@ -0,0 +1,120 @@
+# test_autosave.py
+# Commit em segundo plano (storage.AutoSaveWorker) e o lock que separa as escritas do commit.
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from models import Client
+from storage import AutoSaveWorker, ClientDatabase
+
+
+class CountingDatabase:
+    """Só conta os commits (e quando aconteceram)."""
+    def __init__(self):
+        self.commits = []
+
+    def commit(self):
+        self.commits.append(time.monotonic())
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condição não atingida a tempo")
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def worker():
+    workers = []
+
+    def start(database, **kwargs):
+        saved = []
+        autosave = AutoSaveWorker(database, on_saved=lambda pending, seconds, error: saved.append((pending, error)),
+                                  **kwargs)
+        autosave.saved = saved
+        autosave.start()
+        workers.append(autosave)
+        return autosave
+
+    yield start
+    for autosave in workers:
+        if autosave.is_alive():
+            autosave.stop()
+
+
+def test_burst_of_requests_is_one_commit_after_the_quiet_delay(worker):
+    database = CountingDatabase()
+    autosave = worker(database, delay=0.1, max_delay=5.0)
+    first = time.monotonic()
+    for _ in range(5):
+        time.sleep(0.02)
+        last = time.monotonic()
+        autosave.request()
+
+    wait_for(lambda: autosave.saved)
+    assert autosave.saved == [(5, None)]
+    assert database.commits[0] - last >= 0.1 * 0.9
+    assert database.commits[0] - first < 1.0
+
+
+def test_max_delay_bounds_a_long_burst(worker):
+    database = CountingDatabase()
+    autosave = worker(database, delay=0.1, max_delay=0.25)
+    start = time.monotonic()
+    while time.monotonic() - start < 0.6: # Pedidos contínuos: o silêncio de `delay` nunca chega
+        autosave.request()
+        time.sleep(0.02)
+
+    wait_for(lambda: len(database.commits) >= 2)
+    assert 0.2 <= database.commits[0] - start < 0.45
+    assert sum(pending for pending, _ in autosave.saved) <= 31
+
+
+def test_stop_commits_what_is_pending(worker):
+    database = CountingDatabase()
+    autosave = worker(database, delay=10.0, max_delay=10.0)
+    autosave.request()
+    autosave.request()
+    autosave.stop()
+
+    assert not autosave.is_alive()
+    assert autosave.saved == [(2, None)]
+
+
+def test_failed_commit_is_reported_and_retried(worker):
+    class FlakyDatabase(CountingDatabase):
+        def commit(self):
+            if not self.commits:
+                self.commits.append(None)
+                raise sqlite3.OperationalError("database is locked")
+            super().commit()
+
+    database = FlakyDatabase()
+    autosave = worker(database, delay=0.01, max_delay=1.0)
+    autosave.request()
+    wait_for(lambda: autosave.saved)
+    autosave.request()
+    wait_for(lambda: len(autosave.saved) == 2)
+    assert [error is not None for _, error in autosave.saved] == [True, False]
+
+
+def test_writes_wait_for_a_commit_in_progress(tmp_path):
+    database = ClientDatabase(str(tmp_path / 'client_data.db'), check_same_thread=False)
+    try:
+        client = Client('AA:BB:CC:00:00:01', 'senha', 'Ana')
+        done = threading.Event()
+        with database.lock: # Como o AutoSaveWorker durante o commit
+            writer = threading.Thread(target=lambda: (database.insert_client(client), done.set()))
+            writer.start()
+            assert not done.wait(0.1) # A escrita da "thread da UI" espera o commit terminar
+        writer.join(5)
+        assert done.is_set()
+        database.commit()
+        assert database.count() == 1
+    finally:
+        database.close()
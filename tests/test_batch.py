@@ -0,0 +1,72 @@
+# test_batch.py
+# Exclusão e limpeza em lote (delete_manual_many, purge_many, purge_ended): contagens e buscas em dia.
+
+import copy
+import datetime
+
+import pytest
+
+from engine import ClientStore, TimerEngine
+
+
+@pytest.fixture
+def engine(database, clock):
+    return TimerEngine(ClientStore(database, clock=clock))
+
+
+def add_clients(engine, count, name='Cliente'):
+    return [engine.add_client(f'AA:BB:CC:00:00:{n:02X}', 'senha', f'{name} {n}') for n in range(count)]
+
+
+def test_delete_manual_many_moves_only_current_active_clients(engine, database, clock):
+    store = engine.store
+    clients = add_clients(engine, 4)
+    engine.delete_manual(clients[0])
+    stale = copy.copy(clients[1]) # Mesmo id, mas não é o objeto que o ClientStore guarda
+    assert store.search_ended('cliente') == [clients[0].id] # Monta a busca do histórico
+
+    moved = engine.delete_manual_many([clients[0], stale, clients[2], clients[3]])
+
+    assert moved == [clients[2], clients[3]]
+    assert all(client.status == 'deleted_manual' and client.ended_at == clock() for client in moved)
+    assert set(store.active_clients) == {clients[1].id}
+    assert store.ended_count == 3 == database.count_ended()
+    assert store.search_active('cliente') == [clients[1]]
+    assert sorted(store.search_ended('cliente')) == sorted(client.id for client in (clients[0], clients[2], clients[3]))
+    assert engine.next_deadline() == clients[1].deadline # Só o ativo continua na roda
+
+
+def test_purge_many_removes_only_ended_clients(engine, database):
+    store = engine.store
+    clients = add_clients(engine, 3)
+    engine.delete_manual_many(clients[:2])
+    assert len(store.search_ended('cliente')) == 2
+
+    removed = engine.purge_many(clients) # clients[2] ainda está ativo: fica
+
+    assert removed == 2
+    assert store.ended_count == 0 == database.count_ended()
+    assert store.search_ended('cliente') == []
+    assert [client.id for client in database.get_clients([client.id for client in clients])] == [clients[2].id]
+    assert store.search_active('cliente') == [clients[2]]
+
+
+def test_purge_ended_older_than_keeps_recent_history(engine, database, clock):
+    store = engine.store
+    old = add_clients(engine, 2, name='Antigo')
+    engine.delete_manual_many(old)
+    clock.advance(days=10)
+    recent = add_clients(engine, 3, name='Recente')
+    engine.delete_manual_many(recent)
+    assert len(store.search_ended('')) == 5
+
+    assert engine.purge_ended(older_than=datetime.timedelta(days=7)) == 2
+
+    assert store.ended_search is None # A busca do histórico é remontada do banco
+    assert store.ended_count == 3 == database.count_ended()
+    assert sorted(store.search_ended('')) == sorted(client.id for client in recent)
+    assert engine.purge_ended(older_than=datetime.timedelta(days=7)) == 0
+
+    assert engine.purge_ended() == 3
+    assert store.ended_count == 0 == database.count_ended()
+    assert store.search_ended('') == []
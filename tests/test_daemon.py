@@ -0,0 +1,223 @@
+# test_daemon.py
+# Daemon de expiração (daemon.ExpiryDaemon): ações, transação curta, fila de ações no banco e novas tentativas com backoff.
+
+import asyncio
+import datetime
+import json
+import os
+import sqlite3
+
+from daemon import ExpiryAction, ExpiryDaemon, FileDropAction
+from engine import ClientStore, TimerEngine
+from storage import ClientDatabase
+
+
+class RecordingAction(ExpiryAction):
+    """Guarda os payloads recebidos; falha nas primeiras `failures` chamadas e roda `during` antes de terminar."""
+    name = 'recording'
+
+    def __init__(self, failures=0, during=None):
+        self.failures = failures
+        self.during = during
+        self.payloads = []
+
+    async def run(self, client, payload):
+        self.payloads.append(payload)
+        if self.during is not None:
+            self.during(client)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("webhook fora do ar")
+
+
+def make_daemon(database, clock, actions, clients=1):
+    daemon = ExpiryDaemon(database, actions, clock=clock, poll_interval=60.0, action_timeout=1.0)
+    for i in range(clients):
+        daemon.engine.add_client(f"AA:BB:CC:00:00:{i:02X}", f"senha{i}", f"Cliente {i}")
+    database.commit()
+    daemon.reload()
+    return daemon
+
+
+def row_in_database(path, client_id):
+    """(status, action_status, nome) visto por outra conexão (como o app veria)."""
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT status, action_status, nome FROM clients WHERE id = ?", (client_id,)).fetchone()
+    finally:
+        conn.close()
+
+
+class App:
+    """O app com a sua própria conexão ao mesmo banco."""
+
+    def __init__(self, path, clock):
+        self.database = ClientDatabase(path)
+        self.store = ClientStore(self.database, clock=clock)
+        self.engine = TimerEngine(self.store)
+        self.reload()
+
+    def reload(self):
+        self.store.load()
+        self.engine.rebuild()
+
+    def close(self):
+        self.database.close()
+
+
+def test_due_clients_fire_actions_and_are_committed(tmp_path, database, clock):
+    action = RecordingAction()
+    drop_dir = str(tmp_path / 'drop')
+    daemon = make_daemon(database, clock, [action, FileDropAction(drop_dir)], clients=2)
+    client_id = next(iter(daemon.store.active_clients))
+
+    assert asyncio.run(daemon.process_due()) == []
+    clock.advance(days=1)
+    expired = asyncio.run(daemon.process_due())
+
+    assert sorted(client.nome for client in expired) == ['Cliente 0', 'Cliente 1']
+    assert [payload['event'] for payload in action.payloads] == ['expired', 'expired']
+    assert [payload['client']['status'] for payload in action.payloads] == ['expired', 'expired']
+    assert len(os.listdir(drop_dir)) == 2
+    with open(os.path.join(drop_dir, sorted(os.listdir(drop_dir))[0]), encoding='utf-8') as f:
+        assert json.load(f)['client']['mac'].startswith('AA:BB:CC')
+    assert row_in_database(database.path, client_id)[:2] == ('expired', 'done') # Visível para outra conexão
+    assert daemon.store.active_clients == {}
+    assert daemon.next_wakeup() == daemon.poll_interval
+
+    assert asyncio.run(daemon.process_due()) == []
+    assert len(action.payloads) == 2 # Concluídas: não disparam de novo
+
+
+def test_database_stays_writable_while_actions_run(database, clock):
+    def app_writes(client):
+        # Mesmo cenário do app cadastrando um cliente durante uma ação lenta do daemon
+        conn = sqlite3.connect(database.path, timeout=0.1)
+        try:
+            conn.execute("UPDATE clients SET nome = 'Renomeado' WHERE id = ?", (client.id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    daemon = make_daemon(database, clock, [RecordingAction(during=app_writes)])
+    clock.advance(days=1)
+    expired = asyncio.run(daemon.process_due())
+
+    assert len(expired) == 1
+    assert row_in_database(database.path, expired[0].id) == ('expired', 'done', 'Renomeado')
+
+
+def test_failed_action_is_retried_with_backoff(database, clock):
+    action = RecordingAction(failures=2)
+    daemon = make_daemon(database, clock, [action])
+    client_id = next(iter(daemon.store.active_clients))
+    clock.advance(days=1)
+
+    assert [client.id for client in asyncio.run(daemon.process_due())] == [client_id]
+    assert row_in_database(database.path, client_id)[:2] == ('expired', 'pending') # Vence no prazo mesmo assim
+    assert daemon.next_wakeup() == 5
+
+    clock.advance(seconds=4)
+    assert asyncio.run(daemon.drain_actions()) == [] # Ainda esperando a nova tentativa
+    assert len(action.payloads) == 1
+
+    clock.advance(seconds=1)
+    assert asyncio.run(daemon.drain_actions()) == []
+    assert daemon.next_wakeup() == 10
+
+    clock.advance(seconds=10)
+    assert [client.id for client in asyncio.run(daemon.drain_actions())] == [client_id]
+    assert len(action.payloads) == 3
+    assert row_in_database(database.path, client_id)[:2] == ('expired', 'done')
+    assert daemon._retries == {}
+
+
+def test_pending_actions_survive_reload_and_restart(database, clock):
+    daemon = make_daemon(database, clock, [RecordingAction(failures=1)])
+    clock.advance(days=1)
+    asyncio.run(daemon.process_due())
+
+    daemon.reload() # Ex.: o app gravou outra coisa no banco
+    assert daemon.next_wakeup() == 5
+
+    action = RecordingAction()
+    restarted = ExpiryDaemon(database, [action], clock=clock) # O processo morreu antes da nova tentativa
+    restarted.reload()
+    assert len(asyncio.run(restarted.drain_actions())) == 1
+    assert len(action.payloads) == 1
+
+
+def test_client_expired_by_the_app_still_fires_the_actions(database, clock):
+    action = RecordingAction()
+    daemon = make_daemon(database, clock, [action])
+    app = App(database.path, clock)
+    try:
+        clock.advance(days=1)
+        (client,) = app.engine.expire_due() # O app chegou primeiro
+        app.database.commit()
+
+        assert asyncio.run(daemon.process_due()) == []
+        assert [payload['client']['id'] for payload in action.payloads] == [client.id]
+        assert row_in_database(database.path, client.id)[:2] == ('expired', 'done')
+    finally:
+        app.close()
+
+
+def test_retry_is_kept_when_the_app_expires_the_client_during_the_actions(database, clock):
+    app = App(database.path, clock)
+
+    def app_expires(client):
+        # O app ainda tinha o cliente como ativo e também o marca como vencido enquanto a ação falha
+        app.engine.expire_due()
+        app.database.commit()
+
+    action = RecordingAction(failures=1, during=app_expires)
+    daemon = make_daemon(database, clock, [action])
+    try:
+        app.reload()
+        clock.advance(days=1)
+        (client,) = asyncio.run(daemon.process_due())
+        assert row_in_database(database.path, client.id)[:2] == ('expired', 'pending')
+        assert client.id in daemon._retries
+
+        clock.advance(seconds=5)
+        asyncio.run(daemon.process_due()) # Relê o banco alterado pelo app: a nova tentativa continua valendo
+        assert len(action.payloads) == 2
+        assert row_in_database(database.path, client.id)[:2] == ('expired', 'done')
+        assert daemon._retries == {}
+    finally:
+        app.close()
+
+
+def test_retry_is_dropped_when_the_app_renews_the_client(database, clock):
+    app = App(database.path, clock)
+
+    def app_renews(client):
+        app.reload() # O app vê o cliente vencido pelo daemon e o renova
+        (ended,) = app.database.get_clients([client.id])
+        assert app.engine.renew(ended)
+        app.database.commit()
+
+    action = RecordingAction(failures=1, during=app_renews)
+    daemon = make_daemon(database, clock, [action])
+    try:
+        clock.advance(days=1)
+        (client,) = asyncio.run(daemon.process_due())
+        assert row_in_database(database.path, client.id)[:2] == ('active', None)
+
+        clock.advance(seconds=5)
+        assert asyncio.run(daemon.process_due()) == []
+        assert len(action.payloads) == 1
+        assert daemon._retries == {}
+        renewed = daemon.store.active_clients[client.id]
+        assert renewed.deadline == client.ended_at + renewed.duration
+        assert daemon.next_wakeup() == daemon.poll_interval
+    finally:
+        app.close()
+
+
+def test_retry_delay_doubles_up_to_the_limit(database, clock):
+    daemon = ExpiryDaemon(database, [], clock=clock)
+    assert [daemon.retry_delay(attempts).total_seconds() for attempts in (1, 2, 3, 7, 8, 20)] == \
+           [5, 10, 20, 300, 300, 300]
+    assert isinstance(daemon.retry_delay(1), datetime.timedelta)
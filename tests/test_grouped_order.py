@@ -0,0 +1,117 @@
+# test_grouped_order.py
+# Ordem agrupada da lista ATIVA (engine.GroupedOrder): posições na lista achatada, com cabeçalhos.
+
+import random
+
+import pytest
+
+from engine import GroupedOrder
+
+
+class Row:
+    def __init__(self, id, value):
+        self.id = id
+        self.value = value
+
+
+def by_value(row):
+    return row.value
+
+
+def by_tens(row):
+    return row.value // 10
+
+
+def test_ungrouped_order_has_no_headers():
+    rows = [Row('a', 30), Row('b', 10), Row('c', 20)]
+    order = GroupedOrder(by_value, clients=rows)
+    assert list(order.entries()) == [(None, 'b'), (None, 'c'), (None, 'a')]
+    assert order.add(Row('d', 15)) == (1, None)
+    assert order.remove('a') == (3, None)
+    assert order.remove('a') is None
+    assert order.group_at(2) == (None, 3)
+
+
+def test_positions_include_group_headers():
+    order = GroupedOrder(by_value, by_tens, [Row('a', 12), Row('b', 31)])
+    assert list(order.entries()) == [(1, None), (1, 'a'), (3, None), (3, 'b')]
+
+    assert order.add(Row('c', 25)) == (3, 2) # Novo grupo: cabeçalho na 2 e cliente na 3
+    assert order.add(Row('d', 11)) == (1, None)
+    assert list(order.entries()) == [(1, None), (1, 'd'), (1, 'a'), (2, None), (2, 'c'), (3, None), (3, 'b')]
+    assert order.group_at(4) == (2, 3) and order.group_at(6) == (3, 4)
+    with pytest.raises(IndexError):
+        order.group_at(7)
+
+    assert order.remove('c') == (4, 3) # Remove primeiro o cliente, depois o cabeçalho
+    assert order.remove('d') == (1, None)
+    assert list(order.entries()) == [(1, None), (1, 'a'), (3, None), (3, 'b')]
+
+
+def test_changed_detects_a_new_group_or_key():
+    row = Row('a', 12)
+    order = GroupedOrder(by_value, by_tens, [row])
+    assert not order.changed(row)
+    row.value = 15
+    assert order.changed(row)
+    assert not order.changed(Row('outro', 1)) # Fora da ordem
+
+
+def apply_remove(flat, result):
+    index, header_index = result
+    del flat[index]
+    if header_index is not None:
+        del flat[header_index]
+
+
+def apply_add(flat, result, group, client_id):
+    index, header_index = result
+    if header_index is not None:
+        flat.insert(header_index, (group, None))
+    flat.insert(index, (group, client_id))
+
+
+@pytest.mark.parametrize('group_of', [by_tens, None], ids=['agrupada', 'simples'])
+def test_random_updates_keep_the_flat_list_in_sync(group_of):
+    rng = random.Random(3)
+    pool = [Row(f"{i:03d}", rng.randrange(100)) for i in range(60)]
+    shown = rng.sample(pool, 20)
+    order = GroupedOrder(by_value, group_of, shown)
+    flat = list(order.entries())
+
+    def group(row):
+        return group_of(row) if group_of is not None else None
+
+    def expected():
+        result = []
+        for row in sorted(shown, key=lambda row: (group(row) or 0, row.value, row.id)):
+            if group_of is not None and (not result or result[-1][0] != group(row)):
+                result.append((group(row), None))
+            result.append((group(row), row.id))
+        return result
+
+    for _ in range(2000):
+        choice = rng.random()
+        if choice < 0.4:
+            row = rng.choice(pool)
+            if row not in shown:
+                apply_add(flat, order.add(row), group(row), row.id)
+                shown.append(row)
+        elif choice < 0.7 and shown:
+            row = rng.choice(shown)
+            apply_remove(flat, order.remove(row.id))
+            shown.remove(row)
+        elif shown:
+            row = rng.choice(shown)
+            row.value = rng.randrange(100)
+            if order.changed(row):
+                apply_remove(flat, order.remove(row.id))
+                apply_add(flat, order.add(row), group(row), row.id)
+        assert flat == list(order.entries()) == expected()
+        assert len(order) == len(shown)
+
+    number = 0
+    for index, (row_group, client_id) in enumerate(flat):
+        if client_id is not None:
+            number += 1
+            assert order.group_at(index) == (row_group, number)
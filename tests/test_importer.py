@@ -0,0 +1,112 @@
+# test_importer.py
+# Importação em lote (importer.read_import_file + TimerEngine.import_clients).
+
+import json
+
+import pytest
+
+from engine import ClientStore, TimerEngine
+from importer import ImportReport, read_import_file
+
+
+def write_lines(path, lines, encoding='utf-8'):
+    path.write_bytes(''.join(line + '\n' for line in lines).encode(encoding))
+    return str(path)
+
+
+def test_csv_reads_valid_rows_and_reports_invalid_ones(tmp_path):
+    path = write_lines(tmp_path / 'clientes.csv', [
+        '\ufeffMAC,Senha,Nome,Plano', # BOM do Excel e cabeçalho em maiúsculas
+        'AA:BB:CC:00:00:01, s1 ,Ana,semanal',
+        'AA:BB:CC:00:00:02,s2,,',
+        '',
+        'AA:BB:CC:00:00:03,s3,Caio,anual',
+        'AA:BB:CC:00:00:04,s4,Dora,Mensal',
+    ])
+    records, report = read_import_file(path)
+
+    assert [(record['nome'], record['senha'], record.get('plano'), record['_line']) for record in records] == [
+        ('Ana', 's1', 'semanal', 2), ('Dora', 's4', 'mensal', 6)]
+    assert report.rows_read == 4
+    assert [line for line, _ in report.errors] == [3, 5]
+    assert 'nome' in report.errors[0][1]
+    assert 'anual' in report.errors[1][1]
+
+
+def test_csv_without_required_column_is_rejected(tmp_path):
+    path = write_lines(tmp_path / 'clientes.csv', ['mac,nome', 'AA:BB:CC:00:00:01,Ana'])
+    with pytest.raises(ValueError):
+        read_import_file(path)
+
+
+def test_jsonl_reports_bad_lines_and_progress(tmp_path):
+    path = write_lines(tmp_path / 'clientes.jsonl', [
+        json.dumps({'mac': 'AA:BB:CC:00:00:01', 'senha': 's1', 'nome': 'Ana'}),
+        '{quebrado',
+        '[1, 2]',
+        json.dumps({'MAC': 'AA:BB:CC:00:00:02', 'senha': 2, 'nome': 'Bia'}),
+    ])
+    progress = []
+    records, report = read_import_file(path, on_progress=lambda fraction, rows: progress.append((fraction, rows)),
+                                       progress_every=2)
+
+    assert [(record['nome'], record['senha']) for record in records] == [('Ana', 's1'), ('Bia', '2')]
+    assert [line for line, _ in report.errors] == [2, 3]
+    assert progress[-1] == (1.0, 4)
+
+
+def test_non_utf8_file_stops_with_an_error(tmp_path):
+    path = write_lines(tmp_path / 'clientes.csv', ['mac,senha,nome', 'AA:BB:CC:00:00:01,s1,João'], encoding='latin-1')
+    records, report = read_import_file(path)
+    assert records == []
+    assert report.errors and 'UTF-8' in report.errors[0][1]
+
+
+def test_unknown_extension_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        read_import_file(write_lines(tmp_path / 'clientes.txt', ['x']))
+
+
+def test_import_skips_duplicates_in_database_and_file(tmp_path, database, clock):
+    engine = TimerEngine(ClientStore(database, clock=clock))
+    engine.add_client('aa-bb-cc-00-00-01', 's1', 'Já cadastrado')
+    path = write_lines(tmp_path / 'clientes.csv', [
+        'mac,senha,nome,plano',
+        'AA:BB:CC:00:00:01,s1,Ana,',
+        'AA:BB:CC:00:00:02,s2,Bia,semanal',
+        'aabbcc000002,s2,Bia de novo,',
+    ])
+    records, report = read_import_file(path)
+    added = engine.import_clients(records, report)
+    database.commit()
+
+    assert [client.nome for client in added] == ['Bia']
+    assert added[0].deadline == clock() + added[0].duration
+    assert added[0].plan == 'semanal'
+    assert report.imported == 1 and report.duplicates == 2
+    assert engine.next_deadline() is not None
+    assert database.count() == 2
+
+
+def test_import_checks_history_and_archive_with_batched_queries(database, clock):
+    store = ClientStore(database, clock=clock)
+    engine = TimerEngine(store)
+    engine.delete_manual(engine.add_client('AA:BB:CC:00:00:01', 's1', 'Vencido'))
+    database.insert_archived_keys([('AABBCC000002', 's2', 'Arquivado')], 'expired-20240101-080000.jsonl.gz')
+    records = [{'mac': 'aa:bb:cc:00:00:01', 'senha': 's1', 'nome': 'A', '_line': 2},
+               {'mac': 'AA-BB-CC-00-00-02', 'senha': 's2', 'nome': 'B', '_line': 3},
+               {'mac': 'AA:BB:CC:00:00:02', 'senha': 'outra', 'nome': 'C', '_line': 4}]
+    records += [{'mac': f"11:22:{i >> 8:02X}:{i & 255:02X}:00:00", 'senha': 's', 'nome': f"N{i}", '_line': i + 5}
+                for i in range(1500)]
+
+    statements = []
+    database.conn.set_trace_callback(statements.append)
+    report = ImportReport('clientes.csv')
+    added = engine.import_clients(records, report)
+    database.conn.set_trace_callback(None)
+
+    assert len(added) == 1501 and added[0].nome == 'C'
+    assert report.duplicates == 2
+    assert [message.split('(')[-1] for _, message in report.errors] == ['Vencido)', 'Arquivado)']
+    selects = [statement for statement in statements if statement.lstrip().upper().startswith('SELECT')]
+    assert len(selects) <= 8 # Em blocos de 500 MACs, não duas consultas por registro
@@ -0,0 +1,149 @@
+# test_reminders.py
+# Fila de lembretes em segundo plano (reminders.ReminderDispatcher): lotes, novas tentativas e falhas definitivas.
+
+import datetime
+import threading
+import time
+
+import pytest
+
+from reminders import Reminder, ReminderDispatcher
+
+START = datetime.datetime(2024, 1, 1, 8, 0, 0)
+
+
+class FakeCalendar:
+    """Backend de calendário falso: falha `failures[client_id]` vezes (ou sempre, com NotImplementedError)."""
+    def __init__(self, failures=None, unsupported=False):
+        self.failures = dict(failures or {})
+        self.unsupported = unsupported
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def create_event(self, reminder):
+        with self.lock:
+            self.calls.append((reminder.client_id, time.monotonic()))
+            if self.unsupported:
+                raise NotImplementedError("sem calendário nesta plataforma")
+            if self.failures.get(reminder.client_id, 0) > 0:
+                self.failures[reminder.client_id] -= 1
+                raise RuntimeError("calendário ocupado")
+
+
+class Results:
+    """Coleta as chamadas de on_results e avisa quando `expected` lembretes terminaram."""
+    def __init__(self, expected):
+        self.expected = expected
+        self.batches = []
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+    def __call__(self, delivered, failed):
+        with self.lock:
+            self.batches.append((list(delivered), list(failed)))
+            if sum(len(d) + len(f) for d, f in self.batches) >= self.expected:
+                self.done.set()
+
+    @property
+    def delivered(self):
+        return [reminder for delivered, _ in self.batches for reminder in delivered]
+
+    @property
+    def failed(self):
+        return [reminder for _, failed in self.batches for reminder in failed]
+
+
+def reminder(client_id):
+    return Reminder(client_id, f"Cliente {client_id}", "Tempo esgotado", START)
+
+
+@pytest.fixture
+def run_dispatcher():
+    dispatchers = []
+
+    def run(calendar, results, reminders, callback=None, **kwargs):
+        """Roda o dispatcher até `results` receber todos os lembretes; `callback` substitui o coletor no on_results."""
+        dispatcher = ReminderDispatcher(calendar.create_event, callback or results, **kwargs)
+        dispatchers.append(dispatcher)
+        for item in reminders:
+            dispatcher.submit(item)
+        dispatcher.start() # Depois de enfileirar: o primeiro lote já sai completo
+        assert results.done.wait(5), "os lembretes não terminaram"
+        return dispatcher
+
+    yield run
+    for dispatcher in dispatchers:
+        dispatcher.stop()
+
+
+def test_reminders_are_delivered_in_batches(run_dispatcher):
+    calendar = FakeCalendar()
+    results = Results(expected=7)
+    run_dispatcher(calendar, results, [reminder(i) for i in range(7)], batch_size=3)
+
+    assert [len(delivered) for delivered, _ in results.batches] == [3, 3, 1]
+    assert sorted(item.client_id for item in results.delivered) == list(range(7))
+    assert all(item.attempts == 1 and item.error is None for item in results.delivered)
+
+
+def test_failures_are_retried_with_exponential_backoff(run_dispatcher):
+    calendar = FakeCalendar(failures={'a': 2})
+    results = Results(expected=1)
+    dispatcher = run_dispatcher(calendar, results, [reminder('a')], base_delay=0.05, max_attempts=5)
+
+    [delivered] = results.delivered
+    assert delivered.attempts == 3 and delivered.error is None
+    times = [when for _, when in calendar.calls]
+    assert times[1] - times[0] >= 0.05 * 0.8 # 1ª espera: base_delay (com jitter de ±20%)
+    assert times[2] - times[1] >= 0.10 * 0.8 # 2ª espera: o dobro
+    assert len(dispatcher) == 0
+
+
+def test_failure_is_final_after_max_attempts(run_dispatcher):
+    calendar = FakeCalendar(failures={'a': 10})
+    results = Results(expected=1)
+    run_dispatcher(calendar, results, [reminder('a')], base_delay=0.01, max_attempts=3)
+
+    [failed] = results.failed
+    assert failed.attempts == 3 and isinstance(failed.error, RuntimeError)
+    assert len(calendar.calls) == 3
+
+
+def test_not_implemented_is_final_without_retry(run_dispatcher):
+    calendar = FakeCalendar(unsupported=True)
+    results = Results(expected=2)
+    run_dispatcher(calendar, results, [reminder('a'), reminder('b')], base_delay=0.01)
+
+    assert sorted(item.client_id for item in results.failed) == ['a', 'b']
+    assert all(isinstance(item.error, NotImplementedError) and item.attempts == 1 for item in results.failed)
+    assert len(calendar.calls) == 2
+
+
+def test_callback_error_does_not_stop_the_worker(run_dispatcher):
+    calendar = FakeCalendar()
+    results = Results(expected=1)
+    calls = []
+
+    def on_results(delivered, failed):
+        calls.append([item.client_id for item in delivered])
+        if len(calls) == 1:
+            raise RuntimeError("erro na interface")
+        results(delivered, failed)
+
+    run_dispatcher(calendar, results, [reminder('a'), reminder('b')], callback=on_results, batch_size=1)
+
+    assert calls == [['a'], ['b']] # O primeiro lote falhou no callback e o worker seguiu para o segundo
+
+
+def test_backoff_delay_is_capped():
+    dispatcher = ReminderDispatcher(lambda reminder: None, lambda delivered, failed: None,
+                                    base_delay=2.0, max_delay=10.0)
+    assert 1.6 <= dispatcher.backoff_delay(1) <= 2.4
+    assert 6.4 <= dispatcher.backoff_delay(3) <= 9.6
+    assert 8.0 <= dispatcher.backoff_delay(10) <= 12.0
+
+
+def test_summary_reminder_covers_all_clients():
+    summary = Reminder(None, "3 clientes", "...", START, client_ids=['a', 'b', 'c'])
+    assert summary.client_ids == ['a', 'b', 'c']
+    assert reminder('a').client_ids == ['a']
@@ -0,0 +1,93 @@
+# test_renewal.py
+# Renovação, extensão e reativação de clientes (TimerEngine.renew/extend e ClientStore.reactivate).
+
+import datetime
+
+import pytest
+
+from archive import RetentionPolicy
+from engine import ClientStore, TimerEngine
+
+
+@pytest.fixture
+def engine(database, clock):
+    return TimerEngine(ClientStore(database, clock=clock))
+
+
+def deadline_in_database(database, client):
+    return database.get_clients([client.id])[0].deadline
+
+
+def test_renew_restarts_the_plan_from_now(engine, database, clock):
+    client = engine.add_client('AA:BB:CC:00:00:01', 'senha', 'Ana', plan='semanal')
+    clock.advance(days=3)
+
+    assert engine.renew(client)
+    assert client.deadline == clock() + datetime.timedelta(days=7)
+    assert deadline_in_database(database, client) == client.deadline
+    assert engine.next_deadline() == client.deadline
+
+
+def test_extend_counts_from_the_remaining_time(engine, clock):
+    client = engine.add_client('AA:BB:CC:00:00:01', 'senha', 'Ana')
+    original = client.deadline
+    clock.advance(hours=2)
+
+    assert engine.extend(client, datetime.timedelta(hours=1))
+    assert client.deadline == original + datetime.timedelta(hours=1)
+    assert engine.next_deadline() == client.deadline
+
+
+def test_extend_counts_from_now_when_the_deadline_passed(engine, clock):
+    client = engine.add_client('AA:BB:CC:00:00:01', 'senha', 'Ana')
+    clock.advance(days=2)
+    engine.process_due()
+    assert client.status == 'expired'
+
+    assert engine.extend(client, datetime.timedelta(hours=1))
+    assert client.is_active and client.deadline == clock() + datetime.timedelta(hours=1)
+
+
+def test_reactivation_updates_counts_and_search_indexes(engine, database, clock):
+    store = engine.store
+    client = engine.add_client('AA:BB:CC:00:00:01', 'senha', 'Ana')
+    engine.delete_manual(client)
+    assert store.search_ended('ana') == [client.id] # Monta a busca do histórico
+    assert store.ended_count == 1 and store.search_active('ana') == []
+
+    assert engine.renew(client)
+    assert client.is_active and client.ended_at is None and client.reminder_status is None
+    assert store.ended_count == 0 == database.count_ended()
+    assert store.search_ended('ana') == []
+    assert store.search_active('ana') == [client]
+    assert store.find_duplicate('aa-bb-cc-00-00-01', 'senha') is client
+    assert engine.next_deadline() == client.deadline == clock() + client.duration
+
+
+def test_reactivation_is_refused_while_the_same_client_is_active(engine, clock):
+    old = engine.add_client('AA:BB:CC:00:00:01', 'senha', 'Ana')
+    engine.delete_manual(old)
+    new = engine.add_client('aa:bb:cc:00:00:01', 'senha', 'Ana de novo')
+    ended_at = old.ended_at
+
+    assert not engine.renew(old)
+    assert old.status == 'deleted_manual' and old.ended_at == ended_at
+    assert engine.store.find_duplicate('AA:BB:CC:00:00:01', 'senha') is new
+    assert engine.store.ended_count == 1
+
+
+@pytest.mark.parametrize('removal', ['purge', 'archive'])
+def test_reactivation_is_refused_when_the_row_is_gone(engine, database, clock, tmp_path, removal):
+    store = engine.store
+    client = engine.add_client('AA:BB:CC:00:00:01', 'senha', 'Ana')
+    engine.delete_manual(client)
+    stale = database.get_clients([client.id])[0] # Cópia mostrada na tela de vencidos
+    if removal == 'purge':
+        engine.purge(client)
+    else:
+        store.archive_expired(RetentionPolicy(max_count=0), str(tmp_path / 'archive'))
+
+    assert not engine.renew(stale)
+    assert stale.status == 'deleted_manual' and stale.ended_at is not None # Nada mudou no objeto
+    assert store.active_clients == {} and store.ended_count == 0
+    assert engine.next_deadline() is None
@@ -0,0 +1,114 @@
+# test_search_index.py
+# Busca incremental das listas (engine.SearchIndex): prefixo do nome, trecho do MAC e status.
+
+import random
+
+from engine import ClientStore, SearchIndex, TimerEngine
+from models import normalize_mac
+
+
+def build(rows):
+    index = SearchIndex()
+    for order, (client_id, nome, mac, status) in enumerate(rows):
+        index.add(client_id, nome, mac, status, order)
+    return index
+
+
+ROWS = [
+    ('a', 'Ana  Maria', 'AA:BB:CC:00:00:01', 'active'),
+    ('b', 'ANDRÉ', 'AA:BB:CC:00:00:02', 'expired'),
+    ('c', 'Bruno', 'DE:AD:BE:EF:00:03', 'deleted_manual'),
+    ('d', 'ana paula', '11-22-33-44-55-66', 'expired'),
+]
+
+
+def test_name_prefix_ignores_case_and_extra_spaces():
+    index = build(ROWS)
+    assert index.search('an') == ['a', 'b', 'd']
+    assert index.search('  ANA   maria ') == ['a']
+    assert index.search('andré') == ['b']
+
+
+def test_mac_fragment_ignores_separators():
+    index = build(ROWS)
+    assert index.search('dead-be') == ['c']
+    assert index.search('3:44:5') == ['d']
+    assert index.search('00:0') == ['a', 'b', 'c']
+    assert index.search('EF') == ['c'] # Trecho menor que um trigrama
+
+
+def test_status_filter_and_reverse_order():
+    index = build(ROWS)
+    assert index.search('', status='expired') == ['b', 'd']
+    assert index.search('', reverse=True) == ['d', 'c', 'b', 'a']
+    assert index.search('an', status='expired', reverse=True) == ['d', 'b']
+
+
+def test_remove_and_reindex():
+    index = build(ROWS)
+    index.remove('a')
+    index.remove('missing')
+    index.add('d', 'Zeca', 'FF:FF:FF:FF:FF:FF', 'active', 10)
+    assert 'a' not in index and len(index) == 3
+    assert index.search('an') == ['b']
+    assert index.search('zec') == ['d']
+    assert index.search('11-22') == []
+    assert index.matches('d', 'ff:ff') and not index.matches('d', 'ff', status='expired')
+
+
+def test_random_searches_match_a_linear_scan():
+    rng = random.Random(7)
+    syllables = ['an', 'bo', 'ca', 'de', 'lu', 'ma']
+    rows = {}
+    index = SearchIndex()
+    for order in range(600):
+        client_id = f"id{rng.randrange(300)}"
+        if client_id in rows and rng.random() < 0.3:
+            index.remove(client_id)
+            del rows[client_id]
+            continue
+        nome = ''.join(rng.choice(syllables) for _ in range(3))
+        mac = ':'.join(f"{rng.randrange(4):02X}" for _ in range(6))
+        status = rng.choice(['active', 'expired'])
+        rows.pop(client_id, None)
+        rows[client_id] = (nome, mac, status, order)
+        index.add(client_id, nome, mac, status, order)
+
+    for text in ['', 'a', 'an', 'anbo', 'Ma Lu', '00', '01:0', '0203', '03:03:03']:
+        for status in (None, 'expired'):
+            expected = [client_id for client_id, (nome, mac, row_status, _) in rows.items()
+                        if (status is None or row_status == status)
+                        and (not SearchIndex.normalize_name(text)
+                             or nome.startswith(SearchIndex.normalize_name(text))
+                             or normalize_mac(text) and normalize_mac(text) in normalize_mac(mac))]
+            assert index.search(text, status) == expected, (text, status)
+
+
+def test_out_of_order_inserts_still_come_back_sorted():
+    index = SearchIndex()
+    for client_id, order in [('a', 1), ('b', 3), ('c', 2)]: # 'c' chega depois de 'b' (relógio atrasado)
+        index.add(client_id, 'Ana', 'AA:BB:CC:00:00:01', 'expired', order)
+    assert index.search('') == ['a', 'c', 'b']
+    assert index.search('ana') == ['a', 'c', 'b']
+    assert index.search('', status='expired', reverse=True) == ['b', 'c', 'a']
+
+
+def test_history_search_breaks_ended_at_ties_like_the_pages(database, clock):
+    store = ClientStore(database, clock=clock)
+    engine = TimerEngine(store)
+    store.ended_search_index() # Montado antes: os vencidos entram por _index_ended
+    names = ['Zé' if i in (5, 20, 33) else 'Ana' for i in range(40)]
+    clients = [engine.add_client(f"AA:BB:CC:00:00:{i:02X}", f"senha{i}", f"{name} {i}") for i, name in enumerate(names)]
+    engine.delete_manual_many(clients[:4])
+    clock.advance(days=1)
+    engine.process_due() # Os outros 36 expiram juntos, com o mesmo ended_at
+
+    page, _ = store.ended_page(100)
+    paged = [client.id for client in page]
+    assert len(paged) == 40
+    for _ in range(2): # Índice mantido a cada mudança e depois remontado do banco: mesma ordem
+        assert store.search_ended('ana') == [client_id for client_id in paged
+                                             if client_id not in {clients[i].id for i in (5, 20, 33)}] # Resultado grande
+        assert store.search_ended('zé') == [client_id for client_id in paged
+                                            if client_id in {clients[i].id for i in (5, 20, 33)}] # Resultado pequeno
+        store.ended_search = None
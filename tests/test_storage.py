@@ -0,0 +1,135 @@
+# test_storage.py
+# Banco de clientes (storage.ClientDatabase): atualização do esquema e paginação do histórico.
+
+import datetime
+import sqlite3
+
+import pytest
+
+from engine import ClientStore, TimerEngine
+from models import DEFAULT_PLAN, PLANS, Client
+from storage import SCHEMA_VERSION, ClientDatabase
+
+# Banco criado pela primeira versão com SQLite (sem user_version)
+SCHEMA_V1 = """
+CREATE TABLE clients (
+    id TEXT PRIMARY KEY, mac TEXT NOT NULL, senha TEXT NOT NULL, nome TEXT NOT NULL,
+    creation_time TEXT, deadline TEXT, status TEXT NOT NULL DEFAULT 'active',
+    calendar_event_created INTEGER NOT NULL DEFAULT 0, ended_at TEXT
+);
+CREATE INDEX idx_clients_mac_senha ON clients (mac, senha);
+CREATE INDEX idx_clients_status ON clients (status);
+CREATE INDEX idx_clients_deadline ON clients (deadline);
+"""
+
+# Versão 3: MAC normalizado e arquivamento, ainda sem planos
+SCHEMA_V3 = """
+CREATE TABLE clients (
+    id TEXT PRIMARY KEY, mac TEXT NOT NULL, senha TEXT NOT NULL, nome TEXT NOT NULL,
+    creation_time TEXT, deadline TEXT, status TEXT NOT NULL DEFAULT 'active',
+    calendar_event_created INTEGER NOT NULL DEFAULT 0, ended_at TEXT, reminder_status TEXT, mac_key TEXT
+);
+CREATE TABLE archived_keys (
+    mac TEXT NOT NULL, senha TEXT NOT NULL, nome TEXT NOT NULL, archive TEXT NOT NULL, PRIMARY KEY (mac, senha)
+);
+CREATE INDEX idx_clients_mac_senha ON clients (mac, senha);
+CREATE INDEX idx_clients_key ON clients (mac_key, senha);
+CREATE INDEX idx_clients_ended ON clients (ended_at);
+PRAGMA user_version = 3;
+"""
+
+CREATED = datetime.datetime(2024, 1, 1, 8, 0, 0)
+
+
+def create_old_database(path, schema):
+    conn = sqlite3.connect(path)
+    conn.executescript(schema)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(clients)")]
+    rows = [
+        {'id': 'ativo', 'mac': 'aa-bb-cc-00-00-01', 'senha': 's1', 'nome': 'Ana', 'status': 'active',
+         'mac_key': 'AABBCC000001', 'creation_time': CREATED.isoformat(), 'deadline': (CREATED + PLANS[DEFAULT_PLAN].duration).isoformat()},
+        {'id': 'vencido', 'mac': 'AA:BB:CC:00:00:02', 'senha': 's2', 'nome': 'Bia', 'status': 'expired',
+         'creation_time': CREATED.isoformat(), 'deadline': (CREATED + PLANS[DEFAULT_PLAN].duration).isoformat(),
+         'mac_key': 'AABBCC000002', 'ended_at': (CREATED + PLANS[DEFAULT_PLAN].duration).isoformat()},
+    ]
+    for row in rows:
+        row = {column: value for column, value in row.items() if column in columns}
+        conn.execute(f"INSERT INTO clients ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})", list(row.values()))
+    conn.commit()
+    conn.close()
+
+
+def index_names(database):
+    return {row[0] for row in database.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+            if row[0].startswith('idx_')}
+
+
+@pytest.mark.parametrize('schema', [SCHEMA_V1, SCHEMA_V3], ids=['v1', 'v3'])
+def test_old_database_is_upgraded_to_current_schema(tmp_path, clock, schema):
+    path = str(tmp_path / 'client_data.db')
+    create_old_database(path, schema)
+
+    database = ClientDatabase(path)
+    try:
+        assert database.conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert 'idx_clients_mac_senha' not in index_names(database)
+        assert {'idx_clients_key', 'idx_clients_ended', 'idx_clients_status', 'idx_clients_actions'} <= index_names(database)
+        assert database.load_pending_actions() == [] # Quem já tinha vencido não dispara as ações do daemon
+
+        # Clientes antigos ficam no plano padrão, com a duração que tinham
+        active = database.load_active_clients()
+        assert [(client.id, client.plan, client.duration) for client in active] == \
+               [('ativo', DEFAULT_PLAN, PLANS[DEFAULT_PLAN].duration)]
+        assert database.conn.execute("SELECT mac_key FROM clients WHERE id = 'ativo'").fetchone()[0] == 'AABBCC000001'
+
+        # A verificação de duplicidade usa o MAC normalizado, inclusive para os vencidos
+        store = ClientStore(database, clock=clock)
+        store.load()
+        engine = TimerEngine(store)
+        engine.rebuild()
+        assert store.find_duplicate('AA:BB:CC:00:00:01', 's1').id == 'ativo'
+        assert store.find_duplicate('aabbcc000002', 's2').id == 'vencido'
+        assert engine.next_deadline() == CREATED + PLANS[DEFAULT_PLAN].duration
+    finally:
+        database.close()
+
+
+def test_upgrade_runs_once(tmp_path):
+    path = str(tmp_path / 'client_data.db')
+    create_old_database(path, SCHEMA_V3)
+    ClientDatabase(path).close()
+
+    database = ClientDatabase(path)
+    try:
+        database.conn.execute("UPDATE clients SET plan = 'mensal' WHERE id = 'ativo'")
+        database.commit()
+        database._upgrade_schema()
+        assert database.conn.execute("SELECT plan FROM clients WHERE id = 'ativo'").fetchone()[0] == 'mensal'
+    finally:
+        database.close()
+
+
+@pytest.mark.parametrize('limit', [1, 3, 4, 7, 50])
+def test_ended_pages_walk_ties_without_gaps_or_duplicates(database, limit):
+    # Lotes que expiram juntos têm o mesmo ended_at: os empates atravessam as bordas das páginas
+    ended_times = [CREATED + datetime.timedelta(minutes=i % 3) for i in range(20)]
+    clients = [Client(f"AA:BB:CC:00:00:{i:02X}", f"senha{i}", f"Cliente {i}", creation_time=CREATED,
+                      deadline=CREATED, status='expired', ended_at=ended_at)
+               for i, ended_at in enumerate(ended_times)]
+    clients.append(Client('AA:BB:CC:00:01:00', 's', 'Ativo', creation_time=CREATED, deadline=CREATED))
+    database.insert_many(clients)
+    database.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = database.page_ended_clients(limit, cursor)
+        assert len(page) <= limit
+        seen.extend(client.id for client in page)
+        if cursor is None:
+            break
+
+    rowids = dict(database.conn.execute("SELECT id, rowid FROM clients"))
+    expected = sorted((client for client in clients if client.status == 'expired'),
+                      key=lambda client: (client.ended_at, rowids[client.id]), reverse=True)
+    assert seen == [client.id for client in expected]
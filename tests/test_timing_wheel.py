@@ -0,0 +1,143 @@
+# test_timing_wheel.py
+# Roda de tempo hierárquica (engine.TimingWheel) e os avisos antes do prazo no TimerEngine.
+
+import datetime
+import random
+
+import pytest
+
+from engine import ClientStore, TimerEngine, TimingWheel
+
+START = datetime.datetime(2024, 1, 1, 8, 0, 0)
+
+
+def at(**kwargs):
+    return START + datetime.timedelta(**kwargs)
+
+
+def test_advance_returns_due_events_in_time_order():
+    wheel = TimingWheel(START)
+    wheel.schedule('c', at(hours=2), 'C')
+    wheel.schedule('a', at(seconds=1.5), 'A')
+    wheel.schedule('b', at(seconds=1.2), 'B')
+
+    assert wheel.next_time() == at(seconds=1.2)
+    assert wheel.advance(at(seconds=1.3)) == [('b', 'B')] # Mesmo segundo: só o que já passou
+    assert wheel.advance(at(hours=3)) == [('a', 'A'), ('c', 'C')]
+    assert len(wheel) == 0 and wheel.next_time() is None
+
+
+def test_cancel_and_reschedule():
+    wheel = TimingWheel(START)
+    wheel.schedule('a', at(minutes=1), 'A')
+    wheel.schedule('b', at(minutes=2), 'B')
+    assert wheel.cancel('a') == 'A'
+    assert wheel.cancel('a') is None
+    assert wheel.next_time() == at(minutes=2)
+
+    wheel.schedule('b', at(seconds=30), 'B2')
+    assert 'b' in wheel and len(wheel) == 1
+    assert wheel.next_time() == at(seconds=30)
+    assert wheel.advance(at(minutes=5)) == [('b', 'B2')]
+
+
+def test_limit_leaves_the_rest_due():
+    wheel = TimingWheel(START)
+    for i in range(5):
+        wheel.schedule(i, at(seconds=i + 1), i)
+    assert [key for key, _ in wheel.advance(at(minutes=1), limit=2)] == [0, 1]
+    assert wheel.next_time() == at(seconds=3)
+    assert [key for key, _ in wheel.advance(at(minutes=1))] == [2, 3, 4]
+
+
+def test_events_past_the_last_level_and_in_the_past():
+    wheel = TimingWheel(START, slot_bits=2, levels=2) # Cobre só 16 s: o resto vai para o overflow
+    wheel.schedule('longe', at(days=400), 'L')
+    wheel.schedule('atrasado', at(seconds=-10), 'P')
+    assert wheel.next_time() == at(seconds=-10)
+    assert wheel.advance(START) == [('atrasado', 'P')]
+    assert wheel.advance(at(days=399)) == []
+    assert wheel.next_time() == at(days=400)
+    assert wheel.advance(at(days=400)) == [('longe', 'L')]
+
+
+def test_next_time_follows_cancellations_of_the_earliest_entry():
+    wheel = TimingWheel(START)
+    for i in range(1000):
+        wheel.schedule(i, at(seconds=i + 1), i)
+    for i in range(999):
+        assert wheel.next_time() == at(seconds=i + 1)
+        wheel.cancel(i) # Sempre o mais cedo: a posição dele é percorrida de novo
+    for i in range(1000, 1300):
+        wheel.schedule(i, at(days=1, seconds=i), i)
+        wheel.cancel(i)
+    assert wheel.next_time() == at(seconds=1000)
+    wheel.schedule('antes', at(seconds=500), None)
+    assert wheel.next_time() == at(seconds=500)
+    # Nenhum mínimo guardado aponta para uma entrada que já saiu da roda
+    assert all(wheel._entries.get(entry[2]) is entry for entry in wheel._minimum.values())
+
+
+@pytest.mark.parametrize('slot_bits, levels', [(2, 1), (3, 2), (6, 4)])
+def test_random_operations_match_a_sorted_model(slot_bits, levels):
+    rng = random.Random(slot_bits * 10 + levels)
+    now = START
+    wheel = TimingWheel(now, slot_bits=slot_bits, levels=levels)
+    model = {}
+    for _ in range(3000):
+        op = rng.random()
+        if op < 0.5:
+            key = rng.randrange(60)
+            when = now + datetime.timedelta(seconds=rng.choice(
+                [rng.random() * 10, rng.random() * 5000, rng.random() * 1e7, -rng.random() * 5]))
+            wheel.schedule(key, when, key)
+            model[key] = when
+        elif op < 0.6:
+            key = rng.randrange(60)
+            wheel.cancel(key)
+            model.pop(key, None)
+        else:
+            now += datetime.timedelta(seconds=rng.choice(
+                [0, 0.3, rng.random() * 100, rng.random() * 1e5, rng.random() * 3e6]))
+            due = wheel.advance(now)
+            expected = sorted((when, key) for key, when in model.items() if when <= now)
+            assert sorted(key for key, _ in due) == sorted(key for _, key in expected)
+            assert [model[key] for key, _ in due] == [when for when, _ in expected]
+            for _, key in expected:
+                del model[key]
+        assert len(wheel) == len(model)
+        assert wheel.next_time() == (min(model.values()) if model else None)
+
+
+def test_engine_warns_before_the_deadline(database, clock):
+    store = ClientStore(database, clock=clock)
+    engine = TimerEngine(store, warning_offsets=[datetime.timedelta(hours=1), datetime.timedelta(minutes=15)])
+    client = engine.add_client('AA:BB:CC:00:00:01', 'senha', 'Ana')
+    deadline = client.deadline
+
+    assert engine.next_deadline() == deadline - datetime.timedelta(hours=1)
+    clock.now = deadline - datetime.timedelta(minutes=10) # Passou dos dois avisos de uma vez
+    expired, warned = engine.process_due()
+    assert expired == []
+    assert warned == [(client, datetime.timedelta(minutes=15))]
+    assert engine.warnings == {client.id: datetime.timedelta(minutes=15)}
+
+    clock.now = deadline
+    expired, warned = engine.process_due()
+    assert expired == [client] and warned == []
+    assert client.status == 'expired' and engine.warnings == {}
+    assert engine.next_deadline() is None
+
+
+def test_take_due_does_not_write(database, clock):
+    store = ClientStore(database, clock=clock)
+    engine = TimerEngine(store)
+    client = engine.add_client('AA:BB:CC:00:00:01', 'senha', 'Ana')
+    database.commit()
+    clock.advance(days=1)
+
+    expired, _ = engine.take_due()
+    assert expired == [client]
+    assert not database.conn.in_transaction
+    assert client.is_active and client.id in store.active_clients
+    assert engine.next_deadline() is None